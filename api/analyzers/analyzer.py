@@ -1,22 +1,49 @@
+import hashlib
+import inspect
 from pathlib import Path
 from typing import Optional
+from functools import cached_property
 
-from tree_sitter import Language, Node, Parser, Point
-from api.entities.entity import Entity
+from tree_sitter import Language, Node, Parser, Point, Query, QueryCursor
+from api.entities.entity import Entity, Symbol
 from api.entities.file import File
 from abc import ABC, abstractmethod
-from multilspy import SyncLanguageServer
 
 class AbstractAnalyzer(ABC):
-    def __init__(self, language: Language) -> None:
+    # Receivers whose members resolve to the same definition anywhere in a scope
+    scope_receivers: list[str] = []
+
+    # Whether unqualified names resolve to members of the enclosing entities, e.g. Java's this
+    implicit_receiver: bool = False
+
+    # Top level statements importing names into a file
+    import_types: list[str] = []
+
+    def __init__(self, language: Language, symbols_query: str) -> None:
+        """
+        Args:
+            language (Language): The tree-sitter language.
+            symbols_query (str): Query capturing every symbol of interest in a file,
+                capture names are passed to get_symbol_key.
+        """
+
         self.language = language
         self.parser = Parser(language)
+        self.symbols_query = Query(language, symbols_query)
+
+    @cached_property
+    def version(self) -> str:
+        """
+        Version of the analyzer's output, derived from the analyzer's source code
+        so it changes whenever the analyzer does.
+        """
+
+        h = hashlib.sha1()
+        for cls in type(self).__mro__:
+            if issubclass(cls, AbstractAnalyzer):
+                h.update(Path(inspect.getfile(cls)).read_bytes())
+        return h.hexdigest()[:16]
 
-    def find_parent(self, node: Node, parent_types: list) -> Node:
-        while node and node.type not in parent_types:
-            node = node.parent
-        return node
-    
     @abstractmethod
     def is_dependency(self, file_path: str) -> bool:
         """
@@ -30,6 +57,19 @@ class AbstractAnalyzer(ABC):
         """
 
         pass
+
+    def get_dependency_library(self, file_path: str) -> Optional[str]:
+        """
+        Identify the library, and its version, a dependency file belongs to.
+
+        Args:
+            file_path (str): The dependency file's path.
+
+        Returns:
+            Optional[str]: The library, e.g. 'python:requests-2.32.3', None if it can't be identified.
+        """
+
+        return None
     
     @abstractmethod
     def resolve_path(self, file_path: str, path: Path) -> str:
@@ -46,13 +86,6 @@ class AbstractAnalyzer(ABC):
 
         pass
 
-    def resolve(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, node: Node) -> list[tuple[File, Node]]:
-        try:
-            locations = lsp.request_definition(str(file_path), node.start_point.row, node.start_point.column)
-            return [(files[Path(self.resolve_path(location['absolutePath'], path))], files[Path(self.resolve_path(location['absolutePath'], path))].tree.root_node.descendant_for_point_range(Point(location['range']['start']['line'], location['range']['start']['character']), Point(location['range']['end']['line'], location['range']['end']['character']))) for location in locations if location and Path(self.resolve_path(location['absolutePath'], path)) in files]
-        except Exception as e:
-            return []
-        
     @abstractmethod
     def add_dependencies(self, path: Path, files: list[Path]):
         """
@@ -116,30 +149,202 @@ class AbstractAnalyzer(ABC):
         pass
 
     @abstractmethod
-    def add_symbols(self, entity: Entity) -> None:
+    def get_symbol_key(self, capture: str, entity: Entity) -> Optional[str]:
         """
-        Add symbols to the entity.
+        Get the symbol key under which a symbols query capture is added to an entity.
 
         Args:
-            entity (Entity): The entity to add symbols to.
+            capture (str): The capture name.
+            entity (Entity): The innermost entity enclosing the captured node.
+
+        Returns:
+            Optional[str]: The symbol key, None if the entity doesn't own such symbols.
         """
 
         pass
 
+    def add_symbols(self, file: File, entities: dict[Node, Entity],
+                    ranges: Optional[list[tuple[int, int]]] = None) -> None:
+        """
+        Add symbols to the file's entities.
+
+        The symbols query runs once over the whole file, or over each of the
+        given byte ranges, each captured node is attributed only to its
+        innermost enclosing entity.
+
+        Args:
+            file (File): The parsed file.
+            entities (dict[Node, Entity]): The file's entities by declaration node.
+            ranges (list[tuple[int, int]], optional): Byte ranges holding the entities.
+        """
+
+        cursor = QueryCursor(self.symbols_query)
+        if ranges is None:
+            captures = cursor.captures(file.tree.root_node)
+        else:
+            captures = {}
+            for start, end in ranges:
+                cursor.set_byte_range(start, end)
+                for capture, nodes in cursor.captures(file.tree.root_node).items():
+                    captures.setdefault(capture, {}).update(dict.fromkeys(nodes))
+
+        for i in range(self.symbols_query.capture_count):
+            capture = self.symbols_query.capture_name(i)
+            # Nested captures starting together are returned in no stable order
+            for node in sorted(captures.get(capture, []), key=lambda node: (node.start_byte, -node.end_byte)):
+                parent = node.parent
+                while parent is not None and parent not in entities:
+                    parent = parent.parent
+                if parent is None:
+                    continue
+
+                entity = entities[parent]
+                key = self.get_symbol_key(capture, entity)
+                if key is not None:
+                    entity.add_symbol(key, self.create_symbol(key, node))
+
+    def create_symbol(self, key: str, node: Node) -> Symbol:
+        """
+        Describe a captured symbol node with plain values.
+
+        Args:
+            key (str): The symbol key.
+            node (Node): The symbol node.
+
+        Returns:
+            Symbol: The symbol.
+        """
+
+        reference = self.get_reference_node(key, node) or node
+        types = [type_node.text.decode('utf-8', errors='replace') for type_node in
+                 (child.child_by_field_name('type') for child in reference.named_children) if type_node is not None]
+
+        return Symbol(node.start_point.row, node.text.decode('utf-8', errors='replace'),
+                      (reference.start_point.row, reference.start_point.column),
+                      node.text[:reference.end_byte - node.start_byte].decode('utf-8', errors='replace'),
+                      types)
+
+    def get_imports(self, file: File) -> list[str]:
+        """
+        Get the names mentioned by a file's import statements.
+
+        Args:
+            file (File): The parsed file.
+
+        Returns:
+            list[str]: The imported names, including the modules / packages they're imported from.
+        """
+
+        names = set()
+        stack = [node for node in file.tree.root_node.children if node.type in self.import_types]
+        while stack:
+            node = stack.pop()
+            if node.child_count == 0:
+                if node.is_named and 'identifier' in node.type:
+                    names.add(node.text.decode('utf-8', errors='replace'))
+            else:
+                stack.extend(node.children)
+        return sorted(names)
+
+    def resolve(self, files: dict[Path, File], path: Path, locations: list[dict]) -> list[tuple[File, Point]]:
+        """
+        Map definition locations reported by a language server to positions in the analyzed files.
+
+        Args:
+            files (dict[Path, File]): The analyzed files.
+            path (Path): The project's root.
+            locations (list[dict]): LSP locations.
+
+        Returns:
+            list[tuple[File, Point]]: The file and start of each location, locations outside of the analyzed files are dropped.
+        """
+
+        res = []
+        for location in locations:
+            if not location:
+                continue
+            file_path = Path(self.resolve_path(location['absolutePath'], path))
+            if file_path not in files:
+                continue
+            start = location['range']['start']
+            res.append((files[file_path], Point(start['line'], start['character'])))
+        return res
+
     @abstractmethod
-    def resolve_symbol(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, key: str, symbol: Node) -> list[Entity]:
+    def get_reference_node(self, key: str, symbol: Node) -> Node:
         """
-        Resolve a symbol to an entity.
+        Get the node whose position the symbol's definition is requested at.
 
         Args:
-            lsp (SyncLanguageServer): The language server.
-            path (Path): The path to the file.
             key (str): The symbol key.
             symbol (Node): The symbol node.
 
         Returns:
-            list[Entity]: The resolved entities.
+            Node: The node naming the symbol.
         """
 
         pass
 
+    @abstractmethod
+    def resolve_definition(self, key: str, file: File, point: Point) -> Optional[Entity]:
+        """
+        Get the entity declared at a symbol's definition.
+
+        Args:
+            key (str): The symbol key.
+            file (File): The file containing the definition.
+            point (Point): The definition's position.
+
+        Returns:
+            Optional[Entity]: The declared entity, None if it isn't of the symbol's kind.
+        """
+
+        pass
+
+    def get_definition_key(self, file_path: Path, entity: Entity, key: str, symbol: Symbol) -> tuple:
+        """
+        Get the key a symbol's definition lookup is memoized under.
+
+        References spelled the same way within an entity resolve to the same
+        definition when they're a plain name, a member of the scope's receiver
+        (self.log) or a member of a type (String.format), those are keyed by
+        their text. Anything else, e.g. a member of a local variable which may
+        be rebound, is keyed by its exact position.
+
+        Args:
+            file_path (Path): The file containing the symbol.
+            entity (Entity): The entity the symbol belongs to.
+            key (str): The symbol key.
+            symbol (Symbol): The symbol.
+
+        Returns:
+            tuple: The memoization key.
+        """
+
+        parts = symbol.reference.split('.')
+        if all(part.isidentifier() for part in parts) and \
+           (len(parts) == 1 or parts[0] in self.scope_receivers or parts[0][0].isupper()):
+            return (str(file_path), entity.start_byte, symbol.reference)
+
+        return (str(file_path), *symbol.point)
+
+    def resolve_locations(self, files: dict[Path, File], path: Path, key: str, locations: list[dict]) -> list[Entity]:
+        """
+        Resolve the definition locations of a symbol to entities.
+
+        Args:
+            files (dict[Path, File]): The analyzed files.
+            path (Path): The project's root.
+            key (str): The symbol key.
+            locations (list[dict]): LSP locations of the symbol's definitions.
+
+        Returns:
+            list[Entity]: The resolved entities.
+        """
+
+        res = []
+        for file, point in self.resolve(files, path, locations):
+            entity = self.resolve_definition(key, file, point)
+            if entity is not None:
+                res.append(entity)
+        return res
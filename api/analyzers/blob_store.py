@@ -0,0 +1,150 @@
+import os
+import json
+import zlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+def cache_dir() -> Path:
+    """
+    The user's cache directory for code-graph, $XDG_CACHE_HOME/code-graph,
+    ~/.cache/code-graph by default.
+
+    Returns:
+        Path: The directory, not necessarily existing yet.
+    """
+
+    return Path(os.getenv('XDG_CACHE_HOME') or Path.home() / ".cache") / "code-graph"
+
+class BlobStore():
+    """
+    Content addressed on-disk cache of the entity records extracted from files.
+
+    Records are keyed by the git blob OID of the file's content and by the
+    version of the analyzer which produced them, so identical contents are
+    analyzed once no matter which commit, project or fork they come from.
+    The store is bounded in size, least recently used blobs are evicted first.
+    """
+
+    def __init__(self, path: Path, max_size: int) -> None:
+        """
+        Args:
+            path (Path): The store's root directory.
+            max_size (int): Maximum size of the store in bytes.
+        """
+
+        self.path     = path
+        self.max_size = max_size
+        self.size     = None  # computed on first write
+
+    @classmethod
+    def from_env(cls) -> Optional["BlobStore"]:
+        """
+        Create the store shared by all projects in the user's cache directory.
+
+        The location and size are controlled by the CODE_GRAPH_BLOB_STORE
+        and CODE_GRAPH_BLOB_STORE_SIZE (bytes, 1GB by default) environment
+        variables, a size of 0 disables the store.
+
+        Returns:
+            Optional[BlobStore]: The store, None if disabled.
+        """
+
+        max_size = int(os.getenv('CODE_GRAPH_BLOB_STORE_SIZE', 1 << 30))
+        if max_size <= 0:
+            return None
+
+        path = os.getenv('CODE_GRAPH_BLOB_STORE', str(cache_dir() / "blobs"))
+        return cls(Path(path).resolve(), max_size)
+
+    def _blob_path(self, oid: str, version: str) -> Path:
+        return self.path / oid[:2] / f"{oid}-{version}"
+
+    def contains(self, oid: str, version: str) -> bool:
+        return self._blob_path(oid, version).is_file()
+
+    def get(self, oid: str, version: str) -> Optional[list]:
+        """
+        Load cached records.
+
+        Args:
+            oid (str): The blob OID.
+            version (str): The analyzer version.
+
+        Returns:
+            Optional[list]: The records, None if not cached.
+        """
+
+        path = self._blob_path(oid, version)
+        try:
+            data = path.read_bytes()
+            # Track recency through the blob's modification time
+            os.utime(path)
+        except OSError:
+            return None
+
+        return json.loads(zlib.decompress(data))
+
+    def put(self, oid: str, version: str, records: list) -> None:
+        """
+        Cache records.
+
+        Args:
+            oid (str): The blob OID.
+            version (str): The analyzer version.
+            records (list): The records, plain JSON serializable values.
+        """
+
+        path = self._blob_path(oid, version)
+        data = zlib.compress(json.dumps(records, separators=(',', ':')).encode('utf-8'))
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            # Write atomically, the store is shared between processes
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning(f"Failed caching blob {oid}: {e}")
+            return
+
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._blobs())
+        else:
+            self.size += len(data)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def _blobs(self) -> list[tuple[float, int, Path]]:
+        blobs = []
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+        return blobs
+
+    def evict(self) -> None:
+        """
+        Remove least recently used blobs until the store is back under 90% of its size.
+        """
+
+        blobs = sorted(self._blobs())
+        self.size = sum(size for _, size, _ in blobs)
+        target = self.max_size * 0.9
+
+        for _, size, path in blobs:
+            if self.size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            self.size -= size
+
+        logging.info(f"Blob store evicted down to {self.size} bytes")
@@ -0,0 +1,164 @@
+import os
+import warnings
+import threading
+from typing import Optional
+
+from tree_sitter import Parser, Tree
+
+from .analyzer import AbstractAnalyzer
+
+# Markers of generated files, like gofmt and linguist they're only looked up in
+# the comments heading a file, within its first HEADER_SIZE bytes
+GENERATED_MARKERS = [b'@generated', b'do not edit', b'code generated by', b'auto-generated', b'autogenerated']
+HEADER_SIZE = 1024
+
+# Files of at least MINIFIED_MIN_SIZE bytes whose lines average more than
+# MINIFIED_LINE_LENGTH bytes are considered minified
+MINIFIED_MIN_SIZE = 4096
+MINIFIED_LINE_LENGTH = 500
+
+# How files exceeding the budget are handled
+DEGRADED_MODES = ['structural', 'skip']
+
+# Parsers by analyzer type, per thread as parsers can't be shared between threads
+_parsers = threading.local()
+
+def is_generated(source: bytes) -> bool:
+    """
+    Check whether the comments heading a file mark it as generated, markers
+    in docstrings, string literals or comments following code don't count.
+
+    Args:
+        source (bytes): The file's content.
+
+    Returns:
+        bool: True if the file is generated.
+    """
+
+    in_block = False
+    for line in source[:HEADER_SIZE].lower().splitlines():
+        line = line.strip()
+        if in_block:
+            in_block = b'*/' not in line
+        elif line.startswith(b'/*'):
+            in_block = b'*/' not in line[2:]
+        elif len(line) > 0 and not line.startswith((b'#', b'//')):
+            # The file's code starts here
+            return False
+
+        if any(marker in line for marker in GENERATED_MARKERS):
+            return True
+    return False
+
+class FileBudget():
+    """
+    Per file analysis budget, keeps pathological files, e.g. huge generated
+    sources or minified blobs, from dominating an analysis.
+
+    Files detected as oversized, generated or minified are degraded before
+    being parsed, files whose parse exceeds the parse timeout or which define
+    more entities than allowed are degraded once parsed. Degraded files are
+    either indexed structurally, without symbols so they're never resolved,
+    or skipped.
+    """
+
+    def __init__(self, max_size: int, parse_timeout: float, max_entities: int,
+                 lsp_deadline: float, mode: str = 'structural') -> None:
+        """
+        Args:
+            max_size (int): Maximum size of a file in bytes, 0 for unbounded.
+            parse_timeout (float): Maximum parse time of a file in seconds, 0 for unbounded.
+            max_entities (int): Maximum number of entities a file defines, 0 for unbounded.
+            lsp_deadline (float): Time in seconds the definition requests of a file may
+                take in a resolution batch, 0 for unbounded.
+            mode (str): How degraded files are handled, one of DEGRADED_MODES.
+        """
+
+        if mode not in DEGRADED_MODES:
+            raise ValueError(f"Unknown degraded files mode {mode}")
+
+        self.max_size      = max_size
+        self.parse_timeout = parse_timeout
+        self.max_entities  = max_entities
+        self.lsp_deadline  = lsp_deadline
+        self.skip          = mode == 'skip'
+
+    @classmethod
+    def from_env(cls) -> "FileBudget":
+        """
+        Create the budget from the CODE_GRAPH_MAX_FILE_SIZE (bytes, 1MB),
+        CODE_GRAPH_PARSE_TIMEOUT (seconds, 10), CODE_GRAPH_MAX_FILE_ENTITIES (10000),
+        CODE_GRAPH_LSP_FILE_DEADLINE (seconds, 60) and CODE_GRAPH_DEGRADED_FILES
+        ('structural') environment variables.
+
+        Returns:
+            FileBudget: The budget.
+        """
+
+        return cls(max_size=int(os.getenv('CODE_GRAPH_MAX_FILE_SIZE', 1 << 20)),
+                   parse_timeout=float(os.getenv('CODE_GRAPH_PARSE_TIMEOUT', 10)),
+                   max_entities=int(os.getenv('CODE_GRAPH_MAX_FILE_ENTITIES', 10000)),
+                   lsp_deadline=float(os.getenv('CODE_GRAPH_LSP_FILE_DEADLINE', 60)),
+                   mode=os.getenv('CODE_GRAPH_DEGRADED_FILES', 'structural'))
+
+    def inspect(self, source: bytes) -> Optional[str]:
+        """
+        Detect files to degrade before parsing them.
+
+        Args:
+            source (bytes): The file's content.
+
+        Returns:
+            Optional[str]: Why the file is degraded, 'size', 'generated' or 'minified',
+                None if it's within budget.
+        """
+
+        if self.max_size > 0 and len(source) > self.max_size:
+            return 'size'
+
+        if is_generated(source):
+            return 'generated'
+
+        if len(source) >= MINIFIED_MIN_SIZE and len(source) / (source.count(b'\n') + 1) > MINIFIED_LINE_LENGTH:
+            return 'minified'
+
+        return None
+
+    def within_entities(self, records: dict) -> bool:
+        """
+        Check a file's records, as produced by extract_entities, against the entity budget.
+        """
+
+        return self.max_entities <= 0 or len(records["entities"]) <= self.max_entities
+
+    def parse(self, analyzer: AbstractAnalyzer, source: bytes, old_tree: Optional[Tree] = None) -> Optional[Tree]:
+        """
+        Parse a file within the parse timeout.
+
+        Args:
+            analyzer (AbstractAnalyzer): The analyzer of the file's language.
+            source (bytes): The file's content.
+            old_tree (Tree, optional): The tree of the file's previous version, already
+                edited, to reparse incrementally.
+
+        Returns:
+            Optional[Tree]: The file's tree, None if parsing timed out.
+        """
+
+        parsers = _parsers.__dict__.setdefault('parsers', {})
+        parser = parsers.get(type(analyzer))
+        if parser is None:
+            parser = parsers[type(analyzer)] = Parser(analyzer.language)
+
+        # Parse cancellation through progress callbacks needs a read callback,
+        # the timeout is the direct way for in memory sources
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            parser.timeout_micros = int(self.parse_timeout * 1_000_000)
+
+        try:
+            return parser.parse(source) if old_tree is None else parser.parse(source, old_tree)
+        except ValueError:
+            # A timed out parse would otherwise be resumed by the next one
+            parser.reset()
+            return None
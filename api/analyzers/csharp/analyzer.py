@@ -1,27 +1,30 @@
 import subprocess
 from pathlib import Path
 
-from multilspy import SyncLanguageServer
 from ...entities.entity import Entity
 from ...entities.file import File
 from typing import Optional
 from ..analyzer import AbstractAnalyzer
 
 import tree_sitter_c_sharp as tscsharp
-from tree_sitter import Language, Node, QueryCursor
+from tree_sitter import Language, Node, Point
 
 import logging
 logger = logging.getLogger('code_graph')
 
 class CSharpAnalyzer(AbstractAnalyzer):
-    def __init__(self) -> None:
-        super().__init__(Language(tscsharp.language()))
+    scope_receivers = ['this', 'base']
+    implicit_receiver = True
+    import_types = ['using_directive']
 
-    def _captures(self, pattern: str, node: Node) -> dict:
-        """Run a tree-sitter query and return captures dict."""
-        query = self.language.query(pattern)
-        cursor = QueryCursor(query)
-        return cursor.captures(node)
+    def __init__(self) -> None:
+        super().__init__(Language(tscsharp.language()), """
+            (base_list (_) @base_type)
+            (invocation_expression) @call
+            (method_declaration parameters: (parameter_list (parameter type: (_) @parameters)))
+            (constructor_declaration parameters: (parameter_list (parameter type: (_) @parameters)))
+            (method_declaration returns: (_) @return_type)
+        """)
 
     def add_dependencies(self, path: Path, files: list[Path]):
         if Path(f"{path}/temp_deps_cs").is_dir():
@@ -70,40 +73,23 @@ class CSharpAnalyzer(AbstractAnalyzer):
         return ['class_declaration', 'interface_declaration', 'enum_declaration',
                 'struct_declaration', 'method_declaration', 'constructor_declaration']
 
-    def add_symbols(self, entity: Entity) -> None:
-        if entity.node.type in ['class_declaration', 'struct_declaration']:
-            base_list_captures = self._captures("(base_list (_) @base_type)", entity.node)
-            if 'base_type' in base_list_captures:
-                first = True
-                for base_type in base_list_captures['base_type']:
-                    if first and entity.node.type == 'class_declaration':
-                        # NOTE: Without semantic analysis, we cannot distinguish a base
-                        # class from an interface in C# base_list. By convention, the
-                        # base class is listed first; if a class only implements
-                        # interfaces, this will produce a spurious base_class edge that
-                        # the LSP resolution in second_pass can correct.
-                        entity.add_symbol("base_class", base_type)
-                        first = False
-                    else:
-                        entity.add_symbol("implement_interface", base_type)
-        elif entity.node.type == 'interface_declaration':
-            base_list_captures = self._captures("(base_list (_) @base_type)", entity.node)
-            if 'base_type' in base_list_captures:
-                for base_type in base_list_captures['base_type']:
-                    entity.add_symbol("extend_interface", base_type)
-        elif entity.node.type in ['method_declaration', 'constructor_declaration']:
-            captures = self._captures("(invocation_expression) @reference.call", entity.node)
-            if 'reference.call' in captures:
-                for caller in captures['reference.call']:
-                    entity.add_symbol("call", caller)
-            captures = self._captures("(parameter_list (parameter type: (_) @parameter))", entity.node)
-            if 'parameter' in captures:
-                for parameter in captures['parameter']:
-                    entity.add_symbol("parameters", parameter)
-            if entity.node.type == 'method_declaration':
-                return_type = entity.node.child_by_field_name('type')
-                if return_type:
-                    entity.add_symbol("return_type", return_type)
+    def get_symbol_key(self, capture: str, entity: Entity) -> Optional[str]:
+        if capture == 'base_type':
+            if entity.type == 'class_declaration':
+                # NOTE: Without semantic analysis, we cannot distinguish a base
+                # class from an interface in C# base_list. By convention, the
+                # base class is listed first; if a class only implements
+                # interfaces, this will produce a spurious base_class edge that
+                # the LSP resolution in second_pass can correct.
+                if 'base_class' not in entity.symbols and 'implement_interface' not in entity.symbols:
+                    return 'base_class'
+                return 'implement_interface'
+            elif entity.type == 'struct_declaration':
+                return 'implement_interface'
+            elif entity.type == 'interface_declaration':
+                return 'extend_interface'
+        elif entity.type in ['method_declaration', 'constructor_declaration']:
+            return capture
 
     def is_dependency(self, file_path: str) -> bool:
         return "temp_deps_cs" in file_path
@@ -111,34 +97,28 @@ class CSharpAnalyzer(AbstractAnalyzer):
     def resolve_path(self, file_path: str, path: Path) -> str:
         return file_path
 
-    def resolve_type(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, node: Node) -> list[Entity]:
-        res = []
-        for file, resolved_node in self.resolve(files, lsp, file_path, path, node):
-            type_dec = self.find_parent(resolved_node, ['class_declaration', 'interface_declaration', 'enum_declaration', 'struct_declaration'])
-            if type_dec in file.entities:
-                res.append(file.entities[type_dec])
-        return res
-
-    def resolve_method(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, node: Node) -> list[Entity]:
-        res = []
-        if node.type == 'invocation_expression':
-            func_node = node.child_by_field_name('function')
+    def get_reference_node(self, key: str, symbol: Node) -> Node:
+        if symbol.type == 'invocation_expression':
+            func_node = symbol.child_by_field_name('function')
             if func_node and func_node.type == 'member_access_expression':
                 func_node = func_node.child_by_field_name('name')
             if func_node:
-                node = func_node
-        for file, resolved_node in self.resolve(files, lsp, file_path, path, node):
-            method_dec = self.find_parent(resolved_node, ['method_declaration', 'constructor_declaration', 'class_declaration', 'interface_declaration', 'enum_declaration', 'struct_declaration'])
-            if method_dec and method_dec.type in ['class_declaration', 'interface_declaration', 'enum_declaration', 'struct_declaration']:
-                continue
-            if method_dec in file.entities:
-                res.append(file.entities[method_dec])
-        return res
-
-    def resolve_symbol(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, key: str, symbol: Node) -> list[Entity]:
+                symbol = func_node
+        return symbol
+
+    def resolve_type(self, file: File, point: Point) -> Optional[Entity]:
+        return file.index.find_entity(point, ['class_declaration', 'interface_declaration', 'enum_declaration', 'struct_declaration'])
+
+    def resolve_method(self, file: File, point: Point) -> Optional[Entity]:
+        method_dec = file.index.find_entity(point, ['method_declaration', 'constructor_declaration', 'class_declaration', 'interface_declaration', 'enum_declaration', 'struct_declaration'])
+        if method_dec is not None and method_dec.type in ['class_declaration', 'interface_declaration', 'enum_declaration', 'struct_declaration']:
+            return None
+        return method_dec
+
+    def resolve_definition(self, key: str, file: File, point: Point) -> Optional[Entity]:
         if key in ["implement_interface", "base_class", "extend_interface", "parameters", "return_type"]:
-            return self.resolve_type(files, lsp, file_path, path, symbol)
+            return self.resolve_type(file, point)
         elif key in ["call"]:
-            return self.resolve_method(files, lsp, file_path, path, symbol)
+            return self.resolve_method(file, point)
         else:
             raise ValueError(f"Unknown key {key}")
@@ -0,0 +1,199 @@
+import logging
+from pathlib import Path
+from typing import Any, Optional
+
+from api.entities.entity import Entity
+from api.entities.file import File
+
+from ..graph import GraphWriter, library_graph_name
+from .analyzer import AbstractAnalyzer
+from .blob_store import BlobStore
+from .budget import FileBudget
+from .records import LazyFiles, content_hash, extract_entities, load_entities, records_version
+
+class Stub():
+    """
+    A project graph node standing for an entity of a shared library graph.
+    """
+
+    __slots__ = ('id',)
+
+    def __init__(self) -> None:
+        self.id: Optional[int] = None
+
+class DependencyLoader():
+    """
+    Dependency files handled apart from the project's own files.
+
+    Lazy dependencies are only parsed once a symbol resolves into them, and
+    only the referenced entities, along with the entities enclosing them and
+    their files, are added to the graph. Shared dependency libraries are
+    indexed once per version into graphs shared by all projects, the project's
+    graph only holds stubs of the library entities it references.
+    """
+
+    def __init__(self, analyzers: dict[str, AbstractAnalyzer], files: LazyFiles, store: Optional[BlobStore],
+                 budget: FileBudget, degraded: dict[Path, str], lazy: bool = False, shared: bool = False) -> None:
+        """
+        Args:
+            analyzers (dict[str, AbstractAnalyzer]): Analyzers by extension.
+            files (LazyFiles): The analysis' files, lazy dependencies are deferred into it.
+            store (BlobStore, optional): Cache of extracted entity records.
+            budget (FileBudget): Per file budget.
+            degraded (dict[Path, str]): Files exceeding the budget, and why.
+            lazy (bool): Only parse dependency files once a symbol resolves into them.
+            shared (bool): Index dependency libraries into graphs shared by all projects.
+        """
+
+        self.analyzers = analyzers
+        self.files     = files
+        self.store     = store
+        self.budget    = budget
+        self.degraded  = degraded
+        self.lazy      = lazy
+        self.shared    = shared
+
+        # Dependency files awaiting a reference, and what's been added to the graph of them
+        self.deferred: set[Path] = set()
+        self.docs: dict[Entity, Optional[str]] = {}
+        self.materialized_files: dict[Path, File] = {}
+        self.materialized_entities: set[Entity] = set()
+
+        # Dependency files by shared library, libraries awaiting indexing and the stubs of library entities
+        self.file_libraries: dict[Path, str] = {}
+        self.libraries: dict[str, list[Path]] = {}
+        self.stubs: dict[Entity, Stub] = {}
+
+    def collect(self, file_path: Path) -> bool:
+        """
+        Take over a collected file if it's a dependency handled apart.
+
+        Args:
+            file_path (Path): The file.
+
+        Returns:
+            bool: True if the file isn't to be indexed with the project's files.
+        """
+
+        analyzer = self.analyzers[file_path.suffix]
+        if not analyzer.is_dependency(str(file_path)):
+            return False
+
+        # Dependency libraries are indexed into their own shared graphs
+        if self.shared:
+            library = analyzer.get_dependency_library(str(file_path))
+            if library is not None:
+                self.file_libraries[file_path] = library
+                self.libraries.setdefault(library, []).append(file_path)
+                return True
+
+        # Dependencies are only parsed once a symbol resolves into them
+        if self.lazy:
+            self.deferred.add(file_path)
+            self.files.defer(file_path, self.load)
+            return True
+
+        return False
+
+    def load(self, file_path: Path) -> File:
+        """
+        Parse a dependency file a symbol resolved into, its entities
+        are only added to the graph once referenced.
+
+        Args:
+            file_path (Path): The dependency file's path.
+
+        Returns:
+            File: The file.
+        """
+
+        analyzer = self.analyzers[file_path.suffix]
+        source = file_path.read_bytes()
+        file = File(file_path, None)
+        file.hash = content_hash(source)
+
+        version = records_version(analyzer, file_path)
+        records = self.store.get(file.hash, version) if self.store is not None else None
+        if records is not None:
+            load_entities(file, records, symbols=False)
+        else:
+            file.tree = self.budget.parse(analyzer, source)
+            records = extract_entities(analyzer, file, symbols=False) if file.tree is not None else None
+            if records is None or not self.budget.within_entities(records):
+                # Exceeds the budget, resolutions into it are dropped
+                self.degraded[file_path] = 'parse timeout' if records is None else 'entities'
+                empty = File(file_path, None)
+                empty.hash = file.hash
+                return empty
+            if self.store is not None:
+                self.store.put(file.hash, version, records)
+
+        for entity, record in zip(file.entities, records["entities"]):
+            self.docs[entity] = record[10]
+
+        logging.info(f"Loaded referenced dependency {file_path}")
+        return file
+
+    def graph_node(self, entity: Entity, writer: GraphWriter) -> Any:
+        """
+        Get the graph node an edge into a resolved entity connects to,
+        referenced lazy dependencies are added to the graph and entities
+        of shared libraries are represented by stubs.
+
+        Args:
+            entity (Entity): The resolved entity.
+            writer (GraphWriter): The graph writer.
+
+        Returns:
+            Any: The entity, or its stub.
+        """
+
+        if entity in self.materialized_entities:
+            return entity
+        if entity in self.docs:
+            self.materialize(entity, writer)
+            return entity
+
+        file = entity.parent
+        while not isinstance(file, File):
+            file = file.parent
+
+        library = self.file_libraries.get(file.path)
+        if library is None:
+            return entity
+
+        if entity not in self.stubs:
+            self.stubs[entity] = Stub()
+            writer.add_entity(self.stubs[entity], f"{entity.label}:Stub", entity.name, None, str(file.path),
+                              entity.start_point[0], entity.end_point[0],
+                              {'library': library_graph_name(library), 'ref_id': entity.id})
+        return self.stubs[entity]
+
+    def materialize(self, entity: Entity, writer: GraphWriter) -> None:
+        """
+        Add a referenced dependency entity, the entities enclosing
+        it and its file to the graph.
+
+        Args:
+            entity (Entity): The referenced entity.
+            writer (GraphWriter): The graph writer.
+        """
+
+        chain = []
+        while isinstance(entity, Entity) and entity not in self.materialized_entities:
+            chain.append(entity)
+            entity = entity.parent
+
+        file = chain[-1].parent
+        while not isinstance(file, File):
+            file = file.parent
+        # A reloaded file is a new object, its node is merged with the existing one
+        if self.materialized_files.get(file.path) is not file:
+            self.materialized_files[file.path] = file
+            writer.add_file(file)
+
+        for entity in reversed(chain):
+            self.materialized_entities.add(entity)
+            writer.add_entity(entity, entity.label, entity.name, self.docs.pop(entity), str(file.path),
+                              entity.start_point[0], entity.end_point[0], {})
+            writer.connect_entities("DEFINES", entity.parent, entity)
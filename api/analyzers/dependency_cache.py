@@ -0,0 +1,175 @@
+import os
+import fcntl
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+from .blob_store import cache_dir
+
+# Marks a fully built entry, holds the entry's size, its modification time tracks recency
+COMPLETE = ".complete"
+
+def hash_files(files: list[Path], extra: str = "") -> str:
+    """
+    Hash the content of the files which pin a project's dependencies, e.g. lockfiles.
+
+    Args:
+        files (list[Path]): The files, missing files are skipped.
+        extra (str): Additional key material, e.g. an interpreter version.
+
+    Returns:
+        str: The hash.
+    """
+
+    h = hashlib.sha1(extra.encode('utf-8'))
+    for file_path in files:
+        if file_path.is_file():
+            h.update(file_path.name.encode('utf-8'))
+            h.update(file_path.read_bytes())
+    return h.hexdigest()
+
+def _dir_size(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return size
+
+def link(target: Path, link_path: Path) -> None:
+    """
+    Point link_path at a cache entry, replacing a previous link.
+
+    Args:
+        target (Path): The cache entry.
+        link_path (Path): The link, within the analyzed project.
+    """
+
+    if link_path.is_symlink():
+        link_path.unlink()
+    link_path.parent.mkdir(parents=True, exist_ok=True)
+    link_path.symlink_to(target, target_is_directory=True)
+
+class DependencyCache():
+    """
+    Local cache of resolved dependency environments shared by all projects,
+    e.g. a Python venv keyed by the hash of the project's lockfiles or the
+    extracted sources of a Maven artifact keyed by its coordinates.
+
+    Entries are built once, under a lock so concurrent analyses don't build
+    the same entry twice, and projects link to them. The cache is bounded in
+    size, least recently used entries are evicted first.
+    """
+
+    def __init__(self, path: Path, max_size: int) -> None:
+        """
+        Args:
+            path (Path): The cache's root directory.
+            max_size (int): Maximum size of the cache in bytes.
+        """
+
+        self.path     = path
+        self.max_size = max_size
+
+    @classmethod
+    def from_env(cls) -> Optional["DependencyCache"]:
+        """
+        Create the cache shared by all projects in the user's cache directory.
+
+        The location and size are controlled by the CODE_GRAPH_DEPENDENCY_CACHE
+        and CODE_GRAPH_DEPENDENCY_CACHE_SIZE (bytes, 10GB by default) environment
+        variables, a size of 0 disables the cache.
+
+        Returns:
+            Optional[DependencyCache]: The cache, None if disabled.
+        """
+
+        max_size = int(os.getenv('CODE_GRAPH_DEPENDENCY_CACHE_SIZE', 10 << 30))
+        if max_size <= 0:
+            return None
+
+        path = os.getenv('CODE_GRAPH_DEPENDENCY_CACHE', str(cache_dir() / "deps"))
+        return cls(Path(path).resolve(), max_size)
+
+    def entry(self, kind: str, key: str, build: Callable[[Path], None]) -> Optional[Path]:
+        """
+        Get a cache entry, building it if missing.
+
+        Args:
+            kind (str): The kind of entry, e.g. 'python'.
+            key (str): The entry's key within its kind, a single path component.
+            build (Callable[[Path], None]): Populates the entry's directory, entries are
+                built in place as environments such as venvs can't be relocated.
+
+        Returns:
+            Optional[Path]: The entry's directory, None if building it failed.
+        """
+
+        path = self.path / kind / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(path.with_name(path.name + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            complete = path / COMPLETE
+            if complete.is_file():
+                # Track recency through the marker's modification time
+                os.utime(complete)
+                return path
+
+            # Leftovers of an interrupted build
+            shutil.rmtree(path, ignore_errors=True)
+            path.mkdir(parents=True)
+
+            logging.info(f"Building {kind} dependency cache entry {key}")
+            try:
+                build(path)
+            except Exception as e:
+                logging.warning(f"Failed building {kind} dependency cache entry {key}: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+
+            complete.write_text(str(_dir_size(path)))
+
+        self.evict()
+        return path
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for complete in self.path.glob(f"*/*/{COMPLETE}"):
+            try:
+                entries.append((complete.stat().st_mtime, int(complete.read_text()), complete.parent))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries while the cache exceeds its size,
+        down to 90% of it, entries being built are skipped.
+        """
+
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        if size <= self.max_size:
+            return
+
+        target = self.max_size * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            with open(path.with_name(path.name + ".lock"), "w") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                # Drop the marker first, a partially removed entry is rebuilt
+                (path / COMPLETE).unlink(missing_ok=True)
+                shutil.rmtree(path, ignore_errors=True)
+            size -= entry_size
+
+        logging.info(f"Dependency cache evicted down to {size} bytes")
@@ -0,0 +1,166 @@
+import os
+import logging
+from pathlib import Path
+from typing import Optional
+
+from pygit2 import discover_repository
+from pygit2.repository import Repository
+
+# Directories holding vendored or tooling files rather than the project's sources,
+# dependencies are introduced separately by each analyzer's add_dependencies.
+# Build outputs (build/, target/, obj/, ...) are left to .gitignore, as those
+# names are also used by source packages.
+SKIPPED_DIRS = {
+    '.git', '.hg', '.svn', '.idea', '.vs', '.vscode',
+    'node_modules', 'bower_components', 'vendor', 'third_party',
+    'venv', '.venv', 'site-packages', '__pycache__', '.tox', '.nox', '.mypy_cache', '.pytest_cache',
+    'temp_deps', '.gradle',
+}
+
+def _is_skipped_dir(entry: os.DirEntry) -> bool:
+    if entry.name in SKIPPED_DIRS or entry.name.endswith('.egg-info'):
+        return True
+    # Virtual environments under any name
+    return os.path.isfile(os.path.join(entry.path, 'pyvenv.cfg'))
+
+def open_repository(path: Path) -> Optional[Repository]:
+    """
+    Open the git repository whose work tree is the project's root, its
+    ignore rules apply to the project. A repository enclosing the project,
+    e.g. when analyzing a sub directory, describes a different tree.
+
+    Args:
+        path (Path): The project's root.
+
+    Returns:
+        Optional[Repository]: The repository, None if the project isn't one's work tree.
+    """
+
+    path = path.resolve()
+    try:
+        repo_path = discover_repository(str(path))
+        if repo_path is None:
+            return None
+        repo = Repository(repo_path)
+    except Exception as e:
+        logging.warning(f"Failed opening git repository of {path}: {e}")
+        return None
+
+    if not repo.workdir or Path(repo.workdir).resolve() != path:
+        return None
+    return repo
+
+def discover_files(path: Path, exts: list[str], ignore: list[str] = []) -> dict[str, list[Path]]:
+    """
+    Find the source files of a project in a single walk.
+
+    Ignored, git ignored and vendored directories are pruned before
+    descending into them.
+
+    Args:
+        path (Path): The project's root.
+        exts (list[str]): The extensions of interest.
+        ignore (list[str]): Paths to skip, either relative to the root
+            (e.g. './build') or parts of absolute paths.
+
+    Returns:
+        dict[str, list[Path]]: The files by extension.
+    """
+
+    path = path.resolve()
+    res: dict[str, list[Path]] = {ext: [] for ext in exts}
+
+    # Ignore entries relative to the project's root, e.g. './build' or 'build/'
+    relative_ignore = [i.removeprefix('./').strip('/') for i in ignore if not os.path.isabs(i)]
+    relative_ignore = [i for i in relative_ignore if i]
+
+    repo = open_repository(path)
+
+    def is_ignored(entry: os.DirEntry, relative: str, is_dir: bool) -> bool:
+        if any(i in (entry.path + '/' if is_dir else entry.path) for i in ignore):
+            return True
+        if any(relative == i or relative.startswith(i + '/') for i in relative_ignore):
+            return True
+        if repo is not None:
+            try:
+                return repo.path_is_ignored(relative + '/' if is_dir else relative)
+            except Exception:
+                return False
+        return False
+
+    stack = [(str(path), '')]
+    while stack:
+        directory, relative_dir = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError as e:
+            logging.warning(f"Failed listing {directory}: {e}")
+            continue
+
+        dirs = []
+        for entry in entries:
+            relative = f"{relative_dir}{entry.name}"
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not _is_skipped_dir(entry) and not is_ignored(entry, relative, True):
+                        dirs.append((entry.path, relative + '/'))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            ext = os.path.splitext(entry.name)[1]
+            if ext in res and not is_ignored(entry, relative, False):
+                res[ext].append(Path(entry.path))
+
+        # Visit sub directories in name order
+        stack.extend(reversed(dirs))
+
+    return res
+
+def is_source_file(path: Path, repo: Optional[Repository], file_path: Path, exts: list[str], ignore: list[str] = []) -> bool:
+    """
+    Check whether discover_files would report a file, e.g. a file reported
+    changed by a filesystem watch, the file may no longer exist.
+
+    Args:
+        path (Path): The project's root.
+        repo (Optional[Repository]): The project's repository, see open_repository.
+        file_path (Path): The file, within the project.
+        exts (list[str]): The extensions of interest.
+        ignore (list[str]): Paths to skip, as passed to discover_files.
+
+    Returns:
+        bool: True if the file is one of the project's sources.
+    """
+
+    path = path.resolve()
+    if file_path.suffix not in exts:
+        return False
+
+    try:
+        relative = file_path.relative_to(path)
+    except ValueError:
+        return False
+
+    # Vendored or tooling directories along the way
+    directory = path
+    for part in relative.parts[:-1]:
+        directory = directory / part
+        if part in SKIPPED_DIRS or part.endswith('.egg-info') or (directory / 'pyvenv.cfg').is_file():
+            return False
+
+    relative_ignore = [i.removeprefix('./').strip('/') for i in ignore if not os.path.isabs(i)]
+    relative_ignore = [i for i in relative_ignore if i]
+    if any(i in str(file_path) for i in ignore):
+        return False
+    if any(relative.as_posix() == i or relative.as_posix().startswith(i + '/') for i in relative_ignore):
+        return False
+
+    if repo is not None:
+        try:
+            return not repo.path_is_ignored(relative.as_posix())
+        except Exception:
+            return True
+    return True
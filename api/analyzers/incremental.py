@@ -0,0 +1,204 @@
+import os
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from pygit2 import Patch
+from tree_sitter import Node, Point, Tree
+
+# An edit of whole lines: (start byte, old end byte, new end byte, start point,
+# old end point, new end point), in the coordinates of the source as edited by
+# the preceding edits, points are (row, column)
+Edit = tuple[int, int, int, tuple[int, int], tuple[int, int], tuple[int, int]]
+
+_NEWLINE = re.compile(b'\n')
+
+def line_starts(source: bytes) -> list[int]:
+    """
+    Offsets of the lines of source, followed by the source's length.
+    """
+
+    starts = [0] + [match.end() for match in _NEWLINE.finditer(source)]
+    if starts[-1] != len(source):
+        starts.append(len(source))
+    return starts
+
+def _boundary(source: bytes, starts: list[int], line: int) -> tuple[int, tuple[int, int]]:
+    # Offset and point of a line's start, the end of a source lacking
+    # a final newline is on its last line
+    line = min(line, len(starts) - 1)
+    if line > 0 and line == len(starts) - 1 and not source.endswith(b'\n'):
+        return starts[line], (line - 1, starts[line] - starts[line - 1])
+    return starts[line], (line, 0)
+
+def diff_edits(old: bytes, new: bytes) -> Optional[list[Edit]]:
+    """
+    Describe the changes between two versions of a file as the line
+    edits of their git diff.
+
+    Args:
+        old (bytes): The previous content.
+        new (bytes): The current content.
+
+    Returns:
+        Optional[list[Edit]]: The edits in file order, None if the content is binary.
+    """
+
+    patch = Patch.create_from(old, new, context_lines=0)
+    if patch.delta.is_binary:
+        return None
+
+    old_starts = line_starts(old)
+    new_starts = line_starts(new)
+
+    edits = []
+    for hunk in patch.hunks:
+        # Hunks without lines start at the line preceding them
+        old_line = hunk.old_start - 1 if hunk.old_lines > 0 else hunk.old_start
+        new_line = hunk.new_start - 1 if hunk.new_lines > 0 else hunk.new_start
+
+        old_start, old_start_point = _boundary(old, old_starts, old_line)
+        old_end, old_end_point = _boundary(old, old_starts, old_line + hunk.old_lines)
+        start, start_point = _boundary(new, new_starts, new_line)
+        new_end, new_end_point = _boundary(new, new_starts, new_line + hunk.new_lines)
+
+        # Content preceding the hunk is laid out as in the new version
+        rows = start_point[0] - old_start_point[0]
+        edits.append((start, start + old_end - old_start, new_end, start_point,
+                      (old_end_point[0] + rows, old_end_point[1]), new_end_point))
+    return edits
+
+def apply_edits(tree: Tree, edits: list[Edit]) -> None:
+    """
+    Apply edits to a tree, so it can be reparsed incrementally.
+    """
+
+    for start, old_end, new_end, start_point, old_end_point, new_end_point in edits:
+        tree.edit(start_byte=start, old_end_byte=old_end, new_end_byte=new_end,
+                  start_point=Point(*start_point), old_end_point=Point(*old_end_point),
+                  new_end_point=Point(*new_end_point))
+
+class EntityReuse():
+    """
+    Entity records of a file's previous version which an incremental
+    reparse left untouched.
+
+    Edits cover whole lines, so a top level entity outside of every edited
+    and re-structured range keeps its records, shifted by the bytes and
+    rows the edits preceding it added or removed.
+    """
+
+    def __init__(self, records: dict, edits: list[Edit], dirty: list[tuple[int, int]]) -> None:
+        """
+        Args:
+            records (dict): The previous version's records, as produced by extract_entities.
+            edits (list[Edit]): The edits from the previous version.
+            dirty (list[tuple[int, int]]): Byte ranges of the current version whose syntax changed.
+        """
+
+        self.records = records["entities"]
+        self.dirty = dirty + [(start, new_end) for start, _, new_end, _, _, _ in edits]
+
+        # Top level entities of the previous version by start byte
+        self.top: dict[int, int] = {}
+        for i, record in enumerate(self.records):
+            if record[7] == -1:
+                self.top[record[1]] = i
+
+        # Shift of the content following each edit
+        self.ends: list[int] = []
+        self.shifts: list[tuple[int, int]] = []
+        byte_shift = row_shift = 0
+        for _, old_end, new_end, _, old_end_point, new_end_point in edits:
+            byte_shift += new_end - old_end
+            row_shift += new_end_point[0] - old_end_point[0]
+            self.ends.append(new_end)
+            self.shifts.append((byte_shift, row_shift))
+
+    def _is_dirty(self, start: int, end: int) -> bool:
+        return any(start < dirty_end and dirty_start < end or start < dirty_start < end
+                   for dirty_start, dirty_end in self.dirty)
+
+    def entity_records(self, node: Node) -> Optional[list[list]]:
+        """
+        Get the records of a top level entity and its descendants, if unchanged.
+
+        Args:
+            node (Node): The entity's node, in the current tree.
+
+        Returns:
+            Optional[list[list]]: Copies of the records, positioned in the current
+                version, the entity's parent index is -1 and its descendants' parent
+                indices are relative to it. None if the entity has to be extracted.
+        """
+
+        if self._is_dirty(node.start_byte, node.end_byte):
+            return None
+
+        i = bisect_right(self.ends, node.start_byte) - 1
+        byte_shift, row_shift = self.shifts[i] if i >= 0 else (0, 0)
+
+        index = self.top.get(node.start_byte - byte_shift)
+        if index is None:
+            return None
+        record = self.records[index]
+        if record[0] != node.type or record[2] + byte_shift != node.end_byte:
+            return None
+
+        # Descendants follow the entity, up to the first record outside of it
+        end = index + 1
+        while end < len(self.records) and self.records[end][7] >= index:
+            end += 1
+
+        res = []
+        for record in self.records[index:end]:
+            symbols = [[key, line + row_shift, text, row + row_shift, column, reference, types]
+                       for key, line, text, row, column, reference, types in record[11]]
+            res.append([record[0], record[1] + byte_shift, record[2] + byte_shift,
+                        record[3] + row_shift, record[4], record[5] + row_shift, record[6],
+                        record[7] - index if record[7] != -1 else -1, record[8], record[9], record[10], symbols])
+        return res
+
+class TreeCache():
+    """
+    Trees of recently re-analyzed files along with the content and the
+    records they were extracted from, so a file modified again is reparsed
+    incrementally. The least recently used trees are dropped first.
+    """
+
+    def __init__(self, size: Optional[int] = None) -> None:
+        """
+        Args:
+            size (int, optional): Maximum number of trees kept, defaults to the
+                CODE_GRAPH_TREE_CACHE environment variable (64), 0 disables the cache.
+        """
+
+        self.size = size if size is not None else int(os.getenv('CODE_GRAPH_TREE_CACHE', 64))
+        self.entries: OrderedDict[Path, tuple[bytes, Tree, dict]] = OrderedDict()
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.entries
+
+    def pop(self, path: Path) -> Optional[tuple[bytes, Tree, dict]]:
+        """
+        Take a file's entry out of the cache.
+
+        Returns:
+            Optional[tuple[bytes, Tree, dict]]: The content, tree and records, None if missing.
+        """
+
+        return self.entries.pop(path, None)
+
+    def put(self, path: Path, source: bytes, tree: Tree, records: dict) -> None:
+        """
+        Keep a file's tree, evicting the least recently used ones beyond the cache's size.
+        """
+
+        if self.size <= 0:
+            return
+        self.entries[path] = (source, tree, records)
+        self.entries.move_to_end(path)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
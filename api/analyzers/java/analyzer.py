@@ -1,41 +1,99 @@
-import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import subprocess
 from ...entities import *
 from typing import Optional
 from ..analyzer import AbstractAnalyzer
+from ..dependency_cache import DependencyCache, link
 
-from multilspy import SyncLanguageServer
 
 import tree_sitter_java as tsjava
-from tree_sitter import Language, Node
+from tree_sitter import Language, Node, Point
 
 from xml.etree import ElementTree
 
 import logging
 logger = logging.getLogger('code_graph')
 
+# Number of dependency jars extracted concurrently
+EXTRACT_WORKERS = 8
+
 class JavaAnalyzer(AbstractAnalyzer):
+    scope_receivers = ['this', 'super']
+    implicit_receiver = True
+    import_types = ['import_declaration']
+
     def __init__(self) -> None:
-        super().__init__(Language(tsjava.language()))
+        super().__init__(Language(tsjava.language()), """
+            (class_declaration (super_interfaces (type_list (type_identifier) @implement_interface)))
+            (class_declaration (superclass (type_identifier) @base_class))
+            (interface_declaration (extends_interfaces (type_list (type_identifier) @extend_interface)))
+            (method_invocation) @call
+            (method_declaration (formal_parameters (formal_parameter type: (_) @parameters)))
+            (method_declaration type: (_) @return_type)
+        """)
 
     def add_dependencies(self, path: Path, files: list[Path]):
         # if not Path("java-decompiler-engine-243.23654.153.jar").is_file():
         #     subprocess.run(["wget", "https://www.jetbrains.com/intellij-repository/releases/com/jetbrains/intellij/java/java-decompiler-engine/243.23654.153/java-decompiler-engine-243.23654.153.jar"])
-        subprocess.run(["rm", "-rf", f"{path}/temp_deps"])
+        shutil.rmtree(f"{path}/temp_deps", ignore_errors=True)
         pom = ElementTree.parse(str(path) + '/pom.xml')
+        dependencies = []
         for dependency in pom.findall('.//{http://maven.apache.org/POM/4.0.0}dependency'):
-            groupId = dependency.find('{http://maven.apache.org/POM/4.0.0}groupId').text.replace('.', '/')
+            groupId = dependency.find('{http://maven.apache.org/POM/4.0.0}groupId').text
             artifactId = dependency.find('{http://maven.apache.org/POM/4.0.0}artifactId').text
             version = dependency.find('{http://maven.apache.org/POM/4.0.0}version').text
-            # jar_path = f"{Path.home()}/.m2/repository/{groupId}/{artifactId}/{version}/{artifactId}-{version}.jar"
-            jar_path = f"{Path.home()}/.m2/repository/{groupId}/{artifactId}/{version}/{artifactId}-{version}-sources.jar"
+            dependencies.append((groupId, artifactId, version))
+
+        # Sources jars are extracted concurrently, once per artifact version
+        # when the dependency cache is enabled
+        cache = DependencyCache.from_env()
+        with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+            targets = list(executor.map(lambda dependency: self.add_dependency(path, cache, *dependency), dependencies))
+
+        # Cached dependencies are linked, search each from its own root
+        for target in targets:
+            if target is not None:
+                files.extend(target.rglob("*.java"))
+
+    def add_dependency(self, path: Path, cache: Optional[DependencyCache], groupId: str, artifactId: str, version: str) -> Optional[Path]:
+        """
+        Extract the sources of a Maven dependency under the project's temp_deps.
+
+        Args:
+            path (Path): The project's root.
+            cache (DependencyCache, optional): The shared dependency cache.
+            groupId (str): The dependency's group.
+            artifactId (str): The dependency's artifact.
+            version (str): The dependency's version.
+
+        Returns:
+            Optional[Path]: The extracted sources, None if the sources jar isn't available.
+        """
+
+        # jar_path = f"{Path.home()}/.m2/repository/{groupId.replace('.', '/')}/{artifactId}/{version}/{artifactId}-{version}.jar"
+        jar_path = f"{Path.home()}/.m2/repository/{groupId.replace('.', '/')}/{artifactId}/{version}/{artifactId}-{version}-sources.jar"
+        # Artifacts of different groups may share a name and version
+        target = Path(f"{path}/temp_deps/{groupId}/{artifactId}-{version}")
+
+        def extract(dest: Path) -> None:
+            with zipfile.ZipFile(jar_path) as jar:
+                jar.extractall(dest)
 
-            os.makedirs(f"{path}/temp_deps/{artifactId}-{version}", exist_ok=True)
-            # subprocess.run(["java", "-jar", "java-decompiler-engine-243.23654.153.jar", "-hdc=0 -iib=1 -rsy=1 -rbr=1 -dgs=1 -din=1 -den=1 -asc=1 -bsm=1", jar_path, f"{path}/temp_deps/{artifactId}-{version}"])
-            subprocess.run(["cp", jar_path, f"{artifactId}-{version}.jar"], cwd=f"{path}/temp_deps/{artifactId}-{version}")
-            subprocess.run(["unzip", f"{artifactId}-{version}.jar"], cwd=f"{path}/temp_deps/{artifactId}-{version}")
-        files.extend(Path(f"{path}/temp_deps").rglob("*.java"))
+        if cache is None:
+            try:
+                extract(target)
+            except (OSError, zipfile.BadZipFile) as e:
+                logging.warning(f"Failed extracting {jar_path}: {e}")
+                return None
+            return target
+
+        entry = cache.entry("maven", f"{groupId}-{artifactId}-{version}", extract)
+        if entry is None:
+            return None
+        link(entry, target)
+        return target
 
     def get_entity_label(self, node: Node) -> str:
         if node.type == 'class_declaration':
@@ -65,70 +123,55 @@ class JavaAnalyzer(AbstractAnalyzer):
     def get_entity_types(self) -> list[str]:
         return ['class_declaration', 'interface_declaration', 'enum_declaration', 'method_declaration', 'constructor_declaration']
     
-    def add_symbols(self, entity: Entity) -> None:
-        if entity.node.type == 'class_declaration':
-            interfaces_query = self.language.query("(super_interfaces (type_list (type_identifier) @interface))")
-            interfaces_captures = interfaces_query.captures(entity.node)
-            if 'interface' in interfaces_captures:
-                for interface in interfaces_captures['interface']:
-                    entity.add_symbol("implement_interface", interface)
-            base_class_query = self.language.query("(superclass (type_identifier) @base_class)")
-            base_class_captures = base_class_query.captures(entity.node)
-            if 'base_class' in base_class_captures:
-                base_class = base_class_captures['base_class'][0]
-                entity.add_symbol("base_class", base_class)
-        elif entity.node.type == 'interface_declaration':
-            query = self.language.query("(extends_interfaces (type_list (type_identifier) @type))?")
-            extends_captures = query.captures(entity.node)
-            if 'type' in extends_captures:
-                for interface in extends_captures['type']:
-                    entity.add_symbol("extend_interface", interface)
-        elif entity.node.type in ['method_declaration', 'constructor_declaration']:
-            query = self.language.query("(method_invocation) @reference.call")
-            captures = query.captures(entity.node)
-            if 'reference.call' in captures:
-                for caller in captures['reference.call']:
-                    entity.add_symbol("call", caller)
-            if entity.node.type == 'method_declaration':
-                query = self.language.query("(formal_parameters (formal_parameter type: (_) @parameter))")
-                captures = query.captures(entity.node)
-                if 'parameter' in captures:
-                    for parameter in captures['parameter']:
-                        entity.add_symbol("parameters", parameter)
-                entity.add_symbol("return_type", entity.node.child_by_field_name('type'))
+    def get_symbol_key(self, capture: str, entity: Entity) -> Optional[str]:
+        if entity.type == 'class_declaration':
+            return capture if capture in ['implement_interface', 'base_class'] else None
+        elif entity.type == 'interface_declaration':
+            return capture if capture == 'extend_interface' else None
+        elif entity.type == 'method_declaration':
+            return capture if capture in ['call', 'parameters', 'return_type'] else None
+        elif entity.type == 'constructor_declaration':
+            return capture if capture == 'call' else None
 
     def is_dependency(self, file_path: str) -> bool:
-        return ".jar" in file_path
+        return ".jar" in file_path or "temp_deps" in file_path
+
+    def get_dependency_library(self, file_path: str) -> Optional[str]:
+        # Sources are extracted to temp_deps/{groupId}/{artifactId}-{version}
+        parts = Path(file_path).parts
+        if "temp_deps" not in parts or parts.index("temp_deps") + 3 >= len(parts):
+            return None
+        i = parts.index("temp_deps")
+        return f"java:{parts[i + 1]}:{parts[i + 2]}"
 
     def resolve_path(self, file_path: str, path: Path) -> str:
         if ".jar" in file_path:
             args = file_path.replace(".jar", "").replace(".class", ".java").split("/")
             targs = "/".join(["/".join(arg.split(".")) for arg in args[2:-1]])
-            return f"{path}/temp_deps/{args[1]}/{targs}/{args[-1]}"
+            # The location only names the jar, look its sources up in every group
+            targets = sorted(Path(f"{path}/temp_deps").glob(f"*/{args[1]}"))
+            target = targets[0] if len(targets) > 0 else Path(f"{path}/temp_deps/{args[1]}")
+            return f"{target}/{targs}/{args[-1]}"
         return file_path
 
-    def resolve_type(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, node: Node) -> list[Entity]:
-        res = []
-        for file, resolved_node in self.resolve(files, lsp, file_path, path, node):
-            type_dec = self.find_parent(resolved_node, ['class_declaration', 'interface_declaration', 'enum_declaration'])
-            if type_dec in file.entities:
-                res.append(file.entities[type_dec])
-        return res
-
-    def resolve_method(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, node: Node) -> list[Entity]:
-        res = []
-        for file, resolved_node in self.resolve(files, lsp, file_path, path, node.child_by_field_name('name')):
-            method_dec = self.find_parent(resolved_node, ['method_declaration', 'constructor_declaration', 'class_declaration', 'interface_declaration', 'enum_declaration'])
-            if method_dec and method_dec.type in ['class_declaration', 'interface_declaration', 'enum_declaration']:
-                continue
-            if method_dec in file.entities:
-                res.append(file.entities[method_dec])
-        return res
-    
-    def resolve_symbol(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, key: str, symbol: Node) -> list[Entity]:
+    def get_reference_node(self, key: str, symbol: Node) -> Node:
+        if key == 'call':
+            return symbol.child_by_field_name('name')
+        return symbol
+
+    def resolve_type(self, file: File, point: Point) -> Optional[Entity]:
+        return file.index.find_entity(point, ['class_declaration', 'interface_declaration', 'enum_declaration'])
+
+    def resolve_method(self, file: File, point: Point) -> Optional[Entity]:
+        method_dec = file.index.find_entity(point, ['method_declaration', 'constructor_declaration', 'class_declaration', 'interface_declaration', 'enum_declaration'])
+        if method_dec is not None and method_dec.type in ['class_declaration', 'interface_declaration', 'enum_declaration']:
+            return None
+        return method_dec
+
+    def resolve_definition(self, key: str, file: File, point: Point) -> Optional[Entity]:
         if key in ["implement_interface", "base_class", "extend_interface", "parameters", "return_type"]:
-            return self.resolve_type(files, lsp, file_path, path, symbol)
+            return self.resolve_type(file, point)
         elif key in ["call"]:
-            return self.resolve_method(files, lsp, file_path, path, symbol)
+            return self.resolve_method(file, point)
         else:
             raise ValueError(f"Unknown key {key}")
@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import atexit
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import Future
+from typing import Iterator, Optional
+from contextlib import contextmanager
+
+from multilspy import SyncLanguageServer
+from multilspy.multilspy_config import MultilspyConfig
+from multilspy.multilspy_logger import MultilspyLogger
+from multilspy.lsp_protocol_handler.lsp_types import FileChangeType
+
+# Time in seconds a restarted server is given to shut down
+RESTART_STOP_TIMEOUT = 10
+
+class PooledLanguageServer():
+    """
+    A started language server along with its bookkeeping.
+    """
+
+    def __init__(self, server: SyncLanguageServer) -> None:
+        self.server    = server
+        self.ctx       = server.start_server()
+        self.users     = 0
+        self.last_used = time.monotonic()
+
+        self.ctx.__enter__()
+
+    def stop(self) -> None:
+        self.ctx.__exit__(None, None, None)
+
+def _server_config(path: Path, ext: str) -> dict:
+    if ext == ".java":
+        return {"code_language": "java"}
+    elif ext == ".py":
+        return {"code_language": "python", "environment_path": f"{path}/venv"}
+    elif ext == ".cs":
+        return {"code_language": "csharp"}
+    raise ValueError(f"Unsupported language server extension {ext}")
+
+def _persist_workspace(server: SyncLanguageServer, path: Path, replica: int) -> None:
+    # multilspy creates a random jdtls workspace (index and build state)
+    # for every server, point the server at a workspace derived from the
+    # project path instead so the index survives restarts, replicas can't
+    # share a workspace so each gets its own. The workspace isn't
+    # configurable, it's read off the launch command of the pinned multilspy
+    launch = server.language_server.server.process_launch_info
+    match  = re.search(r"-data (\S+)/data_dir", launch.cmd)
+    if match is None:
+        raise RuntimeError(f"Unexpected jdtls launch command, can't locate its workspace: {launch.cmd}")
+
+    workspace = Path(match.group(1))
+    project   = workspace.parent / hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:16]
+    if replica > 0:
+        project = project.with_name(f"{project.name}-{replica}")
+    if not project.exists():
+        shutil.copytree(workspace, project)
+    shutil.rmtree(workspace, ignore_errors=True)
+
+    launch.cmd = launch.cmd.replace(str(workspace), str(project))
+
+class LanguageServerPool():
+    """
+    Long-lived language servers keyed by (project path, language, replica).
+
+    Servers are started on first use, kept warm between analyses of the
+    same project, notified of file changes and shut down once they've been
+    idle for longer than idle_timeout seconds. Each language runs `replicas`
+    servers so definition requests can be spread over several processes.
+    """
+
+    def __init__(self, idle_timeout: float, replicas: int = 1) -> None:
+        self.idle_timeout = idle_timeout
+        self.replicas = max(1, replicas)
+        self.servers: dict[tuple[str, str, int], PooledLanguageServer] = {}
+        # Servers being started, outside of the lock, by key
+        self.pending: dict[tuple[str, str, int], Future] = {}
+        self.lock = threading.Lock()
+        self.reaper: Optional[threading.Timer] = None
+
+    def _start(self, path: Path, ext: str, replica: int) -> PooledLanguageServer:
+        logger = MultilspyLogger()
+        logger.logger.setLevel(logging.ERROR)
+
+        # Bounds the server's synchronous requests, definition requests are
+        # bounded per request by the resolver
+        timeout = float(os.getenv('CODE_GRAPH_LSP_REQUEST_TIMEOUT', 30))
+
+        config = MultilspyConfig.from_dict(_server_config(path, ext))
+        server = SyncLanguageServer.create(config, logger, str(path), timeout=int(timeout) if timeout > 0 else None)
+        if ext == ".java":
+            _persist_workspace(server, path, replica)
+
+        logging.info(f"Starting {ext} language server #{replica} for {path}")
+        return PooledLanguageServer(server)
+
+    def _started(self, key: tuple[str, str, int], pending: Future, users: int) -> PooledLanguageServer:
+        """
+        Start the server of a key claimed in pending, callers waiting on the
+        pending start are handed the server once it's up.
+
+        Args:
+            key (tuple[str, str, int]): The server's key, claimed by the caller.
+            pending (Future): The key's entry in pending.
+            users (int): The server's initial users.
+
+        Returns:
+            PooledLanguageServer: The started server.
+        """
+
+        root, ext, replica = key
+        try:
+            pooled = self._start(Path(root), ext, replica)
+        except Exception as e:
+            with self.lock:
+                del self.pending[key]
+            pending.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.pending[key]
+            pooled.users = users
+            self.servers[key] = pooled
+        pending.set_result(pooled)
+        return pooled
+
+    def _get(self, path: Path, ext: str, replica: int) -> PooledLanguageServer:
+        """
+        Get a server, starting it if needed, and count the caller as its user.
+        Servers are started outside of the lock so other projects' servers
+        aren't held up, concurrent callers wait on the same start.
+        """
+
+        key = (str(path), ext, replica)
+        while True:
+            with self.lock:
+                pooled = self.servers.get(key)
+                if pooled is not None:
+                    pooled.users += 1
+                    return pooled
+                pending = self.pending.get(key)
+                if pending is None:
+                    pending = self.pending[key] = Future()
+                    break
+            # Started by another caller, look it up again as it may be
+            # restarted or reaped meanwhile
+            pending.result()
+
+        return self._started(key, pending, 1)
+
+    @contextmanager
+    def acquire(self, path: Path, exts: list[str]) -> Iterator[dict[str, list[SyncLanguageServer]]]:
+        """
+        Get started language servers for a project.
+
+        Args:
+            path (Path): The project's root.
+            exts (list[str]): Extensions of the languages in use.
+
+        Yields:
+            dict[str, list[SyncLanguageServer]]: Server replicas by extension.
+        """
+
+        acquired: dict[str, list[PooledLanguageServer]] = {}
+        try:
+            for ext in exts:
+                acquired[ext] = []
+                for replica in range(self.replicas):
+                    acquired[ext].append(self._get(path, ext, replica))
+
+            yield {ext: [pooled.server for pooled in replicas] for ext, replicas in acquired.items()}
+        finally:
+            with self.lock:
+                for ext, replicas in acquired.items():
+                    for replica in range(len(replicas)):
+                        # Look servers up again, they may have been restarted meanwhile
+                        pooled = self.servers.get((str(path), ext, replica))
+                        if pooled is None:
+                            continue
+                        pooled.users -= 1
+                        pooled.last_used = time.monotonic()
+            self._schedule_reaper()
+
+    def restart(self, server: SyncLanguageServer) -> SyncLanguageServer:
+        """
+        Replace an unresponsive server with a newly started one.
+
+        Args:
+            server (SyncLanguageServer): The server, as yielded by acquire.
+
+        Returns:
+            SyncLanguageServer: The replacement, taking over the server's users.
+        """
+
+        with self.lock:
+            key = next((key for key, pooled in self.servers.items() if pooled.server is server), None)
+            if key is None:
+                raise ValueError("Unknown language server")
+            pooled = self.servers.pop(key)
+            pending = self.pending[key] = Future()
+
+        # A hung server may never acknowledge its shutdown, don't wait on it
+        # for long, its replacement reuses the workspace once it's released
+        stopping = threading.Thread(target=self._stop, args=(pooled,), daemon=True)
+        stopping.start()
+        stopping.join(RESTART_STOP_TIMEOUT)
+
+        root, ext, replica = key
+        logging.info(f"Restarting {ext} language server #{replica} for {root}")
+        return self._started(key, pending, pooled.users).server
+
+    def notify(self, path: Path, changed: list[Path] = [], deleted: list[Path] = []) -> None:
+        """
+        Notify the project's running servers of changed files.
+
+        Args:
+            path (Path): The project's root.
+            changed (list[Path]): Created or modified files.
+            deleted (list[Path]): Removed files.
+        """
+
+        changes = [(file_path, FileChangeType.Changed) for file_path in changed]
+        changes += [(file_path, FileChangeType.Deleted) for file_path in deleted]
+
+        with self.lock:
+            for (root, ext, _), pooled in self.servers.items():
+                if root != str(path):
+                    continue
+                events = [{'uri': file_path.resolve().as_uri(), 'type': change}
+                          for file_path, change in changes if file_path.suffix == ext]
+                if len(events) == 0:
+                    continue
+                try:
+                    pooled.server.language_server.server.notify.did_change_watched_files({'changes': events})
+                except Exception as e:
+                    logging.warning(f"Failed notifying {ext} language server for {root}: {e}")
+
+    def _schedule_reaper(self) -> None:
+        with self.lock:
+            if self.reaper is not None or len(self.servers) == 0:
+                return
+            self.reaper = threading.Timer(min(self.idle_timeout, 60), self._reap)
+            self.reaper.daemon = True
+            self.reaper.start()
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        with self.lock:
+            self.reaper = None
+            idle = [key for key, pooled in self.servers.items()
+                    if pooled.users == 0 and now - pooled.last_used >= self.idle_timeout]
+            stopped = [self.servers.pop(key) for key in idle]
+
+        for (root, ext, replica), pooled in zip(idle, stopped):
+            logging.info(f"Stopping idle {ext} language server #{replica} for {root}")
+            self._stop(pooled)
+
+        self._schedule_reaper()
+
+    def _stop(self, pooled: PooledLanguageServer) -> None:
+        try:
+            pooled.stop()
+        except Exception as e:
+            logging.warning(f"Failed stopping language server: {e}")
+
+    def shutdown(self, path: Optional[Path] = None) -> None:
+        """
+        Stop the servers of a project, or every server if no path is given.
+        """
+
+        with self.lock:
+            keys = [key for key in self.servers if path is None or key[0] == str(path)]
+            stopped = [self.servers.pop(key) for key in keys]
+
+        for pooled in stopped:
+            self._stop(pooled)
+
+# Language servers shared by all analyses in this process
+lsp_pool = LanguageServerPool(float(os.getenv('CODE_GRAPH_LSP_IDLE_TIMEOUT', 600)),
+                              int(os.getenv('CODE_GRAPH_LSP_REPLICAS', 1)))
+atexit.register(lsp_pool.shutdown)
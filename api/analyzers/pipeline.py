@@ -0,0 +1,236 @@
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from api.entities.file import File
+
+from ..graph import Graph, GraphWriter
+from ..info import pop_prioritized_files, set_repo_status
+from .symbol_resolution import RESOLVE_CHUNK
+
+if TYPE_CHECKING:
+    from .source_analyzer import SourceAnalyzer
+
+class PipelinedAnalysis():
+    """
+    Analysis of a repository with its stages overlapping, instead of one after the other.
+
+    - The main thread parses files and queues their entities for writing.
+    - A writer thread writes to the graph.
+    - A resolution thread starts the language servers while files are being
+      parsed, then resolves the symbols of each chunk of RESOLVE_CHUNK files
+      as soon as the chunk is queued for writing. Resolutions into files which
+      aren't indexed yet wait for them. Static and hybrid resolution need the
+      complete symbol table and only start once every file is indexed.
+
+    The graph is the same as the one produced by first_pass followed by second_pass.
+    """
+
+    def __init__(self, analyzer: "SourceAnalyzer") -> None:
+        """
+        Args:
+            analyzer (SourceAnalyzer): The analyzer whose stages are overlapped.
+        """
+
+        self.analyzer = analyzer
+
+        # Progress of the first pass
+        self.indexing = threading.Condition()
+        self.active = False
+
+    def await_indexed(self, file_path: Path) -> File:
+        """
+        Loader of files queued for indexing, waits for the file to be indexed.
+
+        Args:
+            file_path (Path): The file's path.
+
+        Returns:
+            File: The indexed file.
+        """
+
+        files = self.analyzer.files
+        with self.indexing:
+            self.indexing.wait_for(lambda: dict.__contains__(files, file_path) or not self.active)
+        if not dict.__contains__(files, file_path):
+            raise KeyError(f"{file_path} wasn't indexed")
+        return dict.__getitem__(files, file_path)
+
+    def run(self, path: Path, files: list[Path], ignore: list[str], graph: Graph) -> None:
+        """
+        Analyze a repository.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to analyze.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The graph to populate.
+        """
+
+        analyzer = self.analyzer
+        resolution = analyzer.symbol_resolution
+
+        files = analyzer.collect_files(path, files, ignore)
+        analyzer.index_libraries()
+
+        # Files are resolution targets before they're indexed, looking one up waits for it
+        for file_path in files:
+            analyzer.files.defer(file_path, self.await_indexed)
+
+        chunks: queue.Queue[Optional[list[Path]]] = queue.Queue()
+        errors: list[Exception] = []
+
+        def resolve(writer: GraphWriter) -> None:
+            try:
+                with resolution.language_servers(path, files) as lsps:
+                    if resolution.mode == 'lsp':
+                        while (chunk := chunks.get()) is not None:
+                            analyzer.resolve_files(chunk, path, lsps, None, writer)
+                    else:
+                        indexed = []
+                        while (chunk := chunks.get()) is not None:
+                            indexed += chunk
+                        analyzer.resolve_files(indexed, path, lsps, resolution.symbol_table(), writer)
+            except Exception as e:
+                logging.error(f"Failed resolving symbols: {e}")
+                errors.append(e)
+
+        chunk = []
+        def indexed(file_path: Path) -> None:
+            nonlocal chunk
+            analyzer.files.deferred.pop(file_path, None)
+            with self.indexing:
+                self.indexing.notify_all()
+            chunk.append(file_path)
+            if len(chunk) == RESOLVE_CHUNK:
+                chunks.put(chunk)
+                chunk = []
+
+        with graph.writer(background=True) as writer:
+            resolver = threading.Thread(target=resolve, args=(writer,), name="resolver", daemon=True)
+            self.active = True
+            resolver.start()
+            try:
+                analyzer.index_files(files, graph, writer, indexed)
+                if len(chunk) > 0:
+                    chunks.put(chunk)
+            finally:
+                chunks.put(None)
+                with self.indexing:
+                    self.active = False
+                    self.indexing.notify_all()
+                resolver.join()
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        resolution.log_stats()
+
+class ProgressiveAnalysis():
+    """
+    Analysis publishing the repository's skeleton, its files and the entities
+    they define, first and resolving symbols in a background thread.
+
+    Symbols are resolved chunk by chunk, each chunk's edges and the progress
+    are published in the repository's info. Files recently requested through
+    prioritize_files, e.g. by get_neighbors, are resolved first.
+    """
+
+    def __init__(self, analyzer: "SourceAnalyzer") -> None:
+        """
+        Args:
+            analyzer (SourceAnalyzer): The analyzer running the analysis.
+        """
+
+        self.analyzer = analyzer
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None
+
+    def start(self, path: Path, files: list[Path], ignore: list[str], graph: Graph) -> None:
+        """
+        Publish the repository's skeleton and start resolving its symbols, see wait.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to analyze.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The graph to populate.
+        """
+
+        files = self.analyzer.first_pass(path, files, ignore, graph)
+        set_repo_status(graph.name, 'skeleton', 0, len(files))
+
+        def resolve() -> None:
+            try:
+                self.resolve(graph, files, path)
+            except Exception as e:
+                logging.error(f"Failed resolving symbols of {graph.name}: {e}")
+                self.error = e
+
+        self.thread = threading.Thread(target=resolve, name=f"resolve-{graph.name}", daemon=True)
+        self.thread.start()
+
+    def resolve(self, graph: Graph, files: list[Path], path: Path) -> None:
+        """
+        Resolve the symbols of the indexed repository chunk by chunk.
+
+        Args:
+            graph (Graph): The graph to populate.
+            files (list[Path]): The indexed files.
+            path (Path): The root of the analyzed folder.
+        """
+
+        analyzer = self.analyzer
+        resolution = analyzer.symbol_resolution
+
+        total = len(files)
+        set_repo_status(graph.name, 'resolving', 0, total)
+
+        try:
+            symbol_table = resolution.symbol_table()
+            pending = dict.fromkeys(files)
+            prioritized: list[Path] = []
+
+            with resolution.language_servers(path, files) as lsps, graph.writer() as writer:
+                while len(pending) > 0:
+                    requested = [Path(file_path) for file_path in pop_prioritized_files(graph.name)]
+                    prioritized = [file_path for file_path in dict.fromkeys(requested + prioritized) if file_path in pending]
+
+                    chunk = prioritized[:RESOLVE_CHUNK]
+                    prioritized = prioritized[RESOLVE_CHUNK:]
+                    for file_path in pending:
+                        if len(chunk) == RESOLVE_CHUNK:
+                            break
+                        if file_path not in chunk:
+                            chunk.append(file_path)
+                    for file_path in chunk:
+                        del pending[file_path]
+
+                    analyzer.resolve_files(chunk, path, lsps, symbol_table, writer)
+
+                    # Publish the chunk's edges before reporting progress
+                    writer.flush()
+                    set_repo_status(graph.name, 'resolving', total - len(pending), total)
+
+        except Exception:
+            set_repo_status(graph.name, 'failed')
+            raise
+
+        set_repo_status(graph.name, 'complete', total, total)
+        resolution.log_stats()
+
+    def wait(self) -> None:
+        """
+        Wait for the background resolution to complete.
+
+        Raises:
+            Exception: The error the background resolution failed with.
+        """
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            raise self.error
@@ -1,40 +1,85 @@
 import os
+import platform
 import subprocess
-from multilspy import SyncLanguageServer
 from pathlib import Path
 
 import toml
 from ...entities import *
 from typing import Optional
 from ..analyzer import AbstractAnalyzer
+from ..dependency_cache import DependencyCache, hash_files, link
 
 import tree_sitter_python as tspython
-from tree_sitter import Language, Node
+from tree_sitter import Language, Node, Point
 
 import logging
 logger = logging.getLogger('code_graph')
 
 class PythonAnalyzer(AbstractAnalyzer):
+    scope_receivers = ['self', 'cls']
+    import_types = ['import_statement', 'import_from_statement']
+
     def __init__(self) -> None:
-        super().__init__(Language(tspython.language()))
+        super().__init__(Language(tspython.language()), """
+            (class_definition superclasses: (argument_list (_) @base_class))
+            (call) @call
+            (typed_parameter type: (_) @parameters)
+            (function_definition return_type: (_) @return_type)
+        """)
+        # Installed distributions by site-packages directory
+        self.distributions: dict[Path, dict[str, str]] = {}
     
+    def create_venv(self, path: Path, venv: Path) -> None:
+        """
+        Create a venv holding a project's dependencies.
+
+        Args:
+            path (Path): The project's root.
+            venv (Path): Where to create the venv.
+        """
+
+        env = {"VIRTUAL_ENV": str(venv), "PATH": f"{venv}/bin:{os.environ['PATH']}"}
+        subprocess.run(["python3", "-m", "venv", str(venv)], cwd=str(path), check=True)
+        if Path(f"{path}/pyproject.toml").is_file():
+            subprocess.run(["pip", "install", "poetry"], cwd=str(path), env=env)
+            # The project itself is analyzed from its sources
+            subprocess.run(["poetry", "install", "--no-root"], cwd=str(path), env=env)
+        elif Path(f"{path}/requirements.txt").is_file():
+            subprocess.run(["pip", "install", "-r", "requirements.txt"], cwd=str(path), env=env)
+
     def add_dependencies(self, path: Path, files: list[Path]):
-        if Path(f"{path}/venv").is_dir():
+        venv = Path(f"{path}/venv")
+        if venv.is_dir() and not venv.is_symlink():
             return
-        subprocess.run(["python3", "-m", "venv", "venv"], cwd=str(path))
+
+        cache = DependencyCache.from_env()
+        if cache is None:
+            try:
+                self.create_venv(path, venv)
+            except (OSError, subprocess.CalledProcessError) as e:
+                logging.warning(f"Failed creating venv for {path}, skipping dependencies: {e}")
+                return
+        else:
+            # Projects pinning the same dependencies share a venv
+            lockfiles = [Path(f"{path}/{name}") for name in ["poetry.lock", "pyproject.toml", "requirements.txt"]]
+            key = hash_files(lockfiles, platform.python_version())
+            entry = cache.entry("python", key, lambda entry: self.create_venv(path, entry / "venv"))
+            if entry is None:
+                return
+            link(entry / "venv", venv)
+
+        # Language servers report the venv's real location, list its files the same way
+        lib = venv.resolve() / "lib"
         if Path(f"{path}/pyproject.toml").is_file():
-            subprocess.run(["pip", "install", "poetry"], cwd=str(path), env={"VIRTUAL_ENV": f"{path}/venv", "PATH": f"{path}/venv/bin:{os.environ['PATH']}"})
-            subprocess.run(["poetry", "install"], cwd=str(path), env={"VIRTUAL_ENV": f"{path}/venv", "PATH": f"{path}/venv/bin:{os.environ['PATH']}"})
             with open(f"{path}/pyproject.toml", 'r') as file:
                 pyproject_data = toml.load(file)
                 for requirement in pyproject_data.get("tool").get("poetry").get("dependencies"):
-                    files.extend(Path(f"{path}/venv/lib").rglob(f"**/site-packages/{requirement}/*.py"))
+                    files.extend(lib.rglob(f"**/site-packages/{requirement}/*.py"))
         elif Path(f"{path}/requirements.txt").is_file():
-            subprocess.run(["pip", "install", "-r", "requirements.txt"], cwd=str(path), env={"VIRTUAL_ENV": f"{path}/venv", "PATH": f"{path}/venv/bin:{os.environ['PATH']}"})
             with open(f"{path}/requirements.txt", 'r') as file:
                 requirements = [line.strip().split("==") for line in file if line.strip()]
                 for requirement in requirements:
-                    files.extend(Path(f"{path}/venv/lib/").rglob(f"**/site-packages/{requirement}/*.py"))
+                    files.extend(lib.rglob(f"**/site-packages/{requirement}/*.py"))
 
     def get_entity_label(self, node: Node) -> str:
         if node.type == 'class_definition':
@@ -60,64 +105,74 @@ class PythonAnalyzer(AbstractAnalyzer):
     def get_entity_types(self) -> list[str]:
         return ['class_definition', 'function_definition']
     
-    def add_symbols(self, entity: Entity) -> None:
-        if entity.node.type == 'class_definition':
-            superclasses = entity.node.child_by_field_name("superclasses")
-            if superclasses:
-                base_classes_query = self.language.query("(argument_list (_) @base_class)")
-                base_classes_captures = base_classes_query.captures(superclasses)
-                if 'base_class' in base_classes_captures:
-                    for base_class in base_classes_captures['base_class']:
-                        entity.add_symbol("base_class", base_class)
-        elif entity.node.type == 'function_definition':
-            query = self.language.query("(call) @reference.call")
-            captures = query.captures(entity.node)
-            if 'reference.call' in captures:
-                for caller in captures['reference.call']:
-                    entity.add_symbol("call", caller)
-            query = self.language.query("(typed_parameter type: (_) @parameter)")
-            captures = query.captures(entity.node)
-            if 'parameter' in captures:
-                for parameter in captures['parameter']:
-                    entity.add_symbol("parameters", parameter)
-            return_type = entity.node.child_by_field_name('return_type')
-            if return_type:
-                entity.add_symbol("return_type", return_type)
+    def get_symbol_key(self, capture: str, entity: Entity) -> Optional[str]:
+        if entity.type == 'class_definition':
+            return capture if capture == 'base_class' else None
+        elif entity.type == 'function_definition':
+            return capture if capture in ['call', 'parameters', 'return_type'] else None
 
     def is_dependency(self, file_path: str) -> bool:
         return "venv" in file_path
 
-    def resolve_path(self, file_path: str, path: Path) -> str:
-        return file_path
+    def get_dependency_library(self, file_path: str) -> Optional[str]:
+        parts = Path(file_path).parts
+        if "site-packages" not in parts:
+            return None
+        i = parts.index("site-packages")
+        if i + 1 >= len(parts):
+            return None
 
-    def resolve_type(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path, node: Node) -> list[Entity]:
-        res = []
-        if node.type == 'attribute':
-            node = node.child_by_field_name('attribute')
-        for file, resolved_node in self.resolve(files, lsp, file_path, path, node):
-            type_dec = self.find_parent(resolved_node, ['class_definition'])
-            if type_dec in file.entities:
-                res.append(file.entities[type_dec])
-        return res
+        site_packages = Path(*parts[:i + 1])
+        if site_packages not in self.distributions:
+            self.distributions[site_packages] = self.find_distributions(site_packages)
+        return self.distributions[site_packages].get(parts[i + 1])
+
+    def find_distributions(self, site_packages: Path) -> dict[str, str]:
+        """
+        Map the top level packages and modules of a site-packages directory
+        to the distribution, and version, installing them.
+
+        Args:
+            site_packages (Path): The site-packages directory.
 
-    def resolve_method(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, node: Node) -> list[Entity]:
-        res = []
-        if node.type == 'call':
-            node = node.child_by_field_name('function')
-            if node.type == 'attribute':
-                node = node.child_by_field_name('attribute')
-        for file, resolved_node in self.resolve(files, lsp, file_path, path, node):
-            method_dec = self.find_parent(resolved_node, ['function_definition', 'class_definition'])
-            if not method_dec:
+        Returns:
+            dict[str, str]: Libraries, e.g. 'python:requests-2.32.3', by top level name.
+        """
+
+        res = {}
+        for record in site_packages.glob("*.dist-info/RECORD"):
+            distribution = record.parent.name.removesuffix(".dist-info")
+            try:
+                lines = record.read_text().splitlines()
+            except OSError:
                 continue
-            if method_dec in file.entities:
-                res.append(file.entities[method_dec])
+            for line in lines:
+                top = line.split(",")[0].split("/")[0]
+                if top.endswith(".dist-info") or top.startswith("..") or top == "":
+                    continue
+                res.setdefault(top, f"python:{distribution}")
         return res
-    
-    def resolve_symbol(self, files: dict[Path, File], lsp: SyncLanguageServer, file_path: Path, path: Path, key: str, symbol: Node) -> list[Entity]:
+
+    def resolve_path(self, file_path: str, path: Path) -> str:
+        return file_path
+
+    def get_reference_node(self, key: str, symbol: Node) -> Node:
+        if key == 'call':
+            symbol = symbol.child_by_field_name('function')
+        if symbol.type == 'attribute':
+            symbol = symbol.child_by_field_name('attribute')
+        return symbol
+
+    def resolve_type(self, file: File, point: Point) -> Optional[Entity]:
+        return file.index.find_entity(point, ['class_definition'])
+
+    def resolve_method(self, file: File, point: Point) -> Optional[Entity]:
+        return file.index.find_entity(point, ['function_definition', 'class_definition'])
+
+    def resolve_definition(self, key: str, file: File, point: Point) -> Optional[Entity]:
         if key in ["base_class", "parameters", "return_type"]:
-            return self.resolve_type(files, lsp, file_path, path, symbol)
+            return self.resolve_type(file, point)
         elif key in ["call"]:
-            return self.resolve_method(files, lsp, file_path, path, symbol)
+            return self.resolve_method(file, point)
         else:
             raise ValueError(f"Unknown key {key}")
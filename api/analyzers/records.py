@@ -0,0 +1,228 @@
+import hashlib
+from pathlib import Path
+from typing import Callable, Optional
+
+from api.entities.entity import Entity, Symbol
+from api.entities.file import File
+from tree_sitter import Node
+
+from .analyzer import AbstractAnalyzer
+from .incremental import EntityReuse
+
+def extract_entities(analyzer: AbstractAnalyzer, file: File, symbols: bool = True,
+                     reuse: Optional[EntityReuse] = None) -> dict:
+    """
+    Walk a file's AST, register its entities and symbols on the file and
+    describe them as plain records, the file's tree is released afterwards.
+
+    When the tree was reparsed incrementally, the records of top level
+    entities the edits left untouched are reused instead of walking them.
+
+    Records are a dict of the file's imported names ("imports") and its
+    entities ("entities"), listed in the order they're discovered, each
+    entity is a list:
+    [node type, start byte, end byte, start row, start column, end row, end column,
+     parent record index or -1 for the file, label, name, docstring,
+     [[symbol key, line, text, reference row, reference column, reference, types], ...]]
+
+    Args:
+        analyzer (AbstractAnalyzer): The analyzer for the file's language.
+        file (File): The parsed file.
+        symbols (bool): Extract symbols, dependencies never have symbols.
+        reuse (EntityReuse, optional): Records of the file's previous version.
+
+    Returns:
+        dict: The file's records.
+    """
+
+    types = analyzer.get_entity_types()
+    nodes: dict[Node, Entity] = {}
+    records = []
+
+    # Byte ranges of the extracted top level entities, the reused ones have their symbols
+    extracted: list[tuple[int, int]] = []
+    extracted_records: list[tuple[Entity, list]] = []
+
+    def add_records(entity_records: list[list]) -> None:
+        base = len(records)
+        for record in entity_records:
+            node_type, start_byte, end_byte, start_row, start_column, end_row, end_column, parent, label, name, _, entity_symbols = record
+            entity = Entity(node_type, label, name, start_byte, end_byte, (start_row, start_column), (end_row, end_column))
+            file.add_entity(entity)
+            if parent != -1:
+                record[7] = parent + base
+                file.entities[record[7]].add_child(entity)
+            for key, line, text, row, column, reference, symbol_types in entity_symbols:
+                entity.add_symbol(key, Symbol(line, text, (row, column), reference, symbol_types))
+            records.append(record)
+
+    def walk(children: list[Node], parent: Optional[Entity], parent_index: int) -> None:
+        stack = list(children)
+        while stack:
+            node = stack.pop()
+            if node.type in types:
+                if parent is None and reuse is not None:
+                    entity_records = reuse.entity_records(node)
+                    if entity_records is not None:
+                        # Docstrings may precede the entity
+                        entity_records[0][10] = analyzer.get_entity_docstring(node)
+                        add_records(entity_records)
+                        continue
+                    extracted.append((node.start_byte, node.end_byte))
+
+                entity = Entity(node.type, analyzer.get_entity_label(node), analyzer.get_entity_name(node),
+                                node.start_byte, node.end_byte, tuple(node.start_point), tuple(node.end_point))
+                file.add_entity(entity)
+                if parent is not None:
+                    parent.add_child(entity)
+                nodes[node] = entity
+                records.append([entity.type, entity.start_byte, entity.end_byte, *entity.start_point,
+                                *entity.end_point, parent_index, entity.label, entity.name,
+                                analyzer.get_entity_docstring(node), []])
+                extracted_records.append((entity, records[-1]))
+                walk(node.children, entity, len(records) - 1)
+            else:
+                stack.extend(node.children)
+
+    walk([file.tree.root_node], None, -1)
+    file.index_entities()
+    file.imports = analyzer.get_imports(file)
+
+    if symbols and not analyzer.is_dependency(str(file.path)):
+        analyzer.add_symbols(file, nodes, extracted if reuse is not None else None)
+        for entity, record in extracted_records:
+            record[-1] = [[key, symbol.line, symbol.text, *symbol.point, symbol.reference, symbol.types]
+                          for key, symbols in entity.symbols.items() for symbol in symbols]
+
+    # Only plain values are kept from here on
+    file.tree = None
+
+    return {"imports": file.imports, "entities": records}
+
+def load_entities(file: File, records: dict, symbols: bool = True) -> None:
+    """
+    Register on a file the entities and symbols described by records
+    produced by extract_entities, without parsing the file.
+
+    Args:
+        file (File): The file.
+        records (dict): The file's records.
+        symbols (bool): Load the entities' symbols.
+    """
+
+    file.imports = records["imports"]
+    entities = file.entities
+    for node_type, start_byte, end_byte, start_row, start_column, end_row, end_column, parent, label, name, _, _ in records["entities"]:
+        entity = Entity(node_type, label, name, start_byte, end_byte, (start_row, start_column), (end_row, end_column))
+        file.add_entity(entity)
+        if parent != -1:
+            entities[parent].add_child(entity)
+
+    file.index_entities()
+
+    if symbols:
+        load_symbols(file, records)
+
+def load_symbols(file: File, records: dict) -> None:
+    """
+    Add the symbols described by records to a file's already loaded entities.
+
+    Args:
+        file (File): The file, loaded from the same records.
+        records (dict): The file's records.
+    """
+
+    for entity, record in zip(file.entities, records["entities"]):
+        for key, line, text, row, column, reference, types in record[-1]:
+            entity.add_symbol(key, Symbol(line, text, (row, column), reference, types))
+
+def file_records(file: File) -> dict:
+    """
+    Describe a file's entities and symbols as records, the inverse of
+    load_entities, docstrings aren't kept.
+
+    Args:
+        file (File): The file.
+
+    Returns:
+        dict: The file's records.
+    """
+
+    positions = {id(entity): i for i, entity in enumerate(file.entities)}
+    records = []
+    for entity in file.entities:
+        symbols = [[key, symbol.line, symbol.text, *symbol.point, symbol.reference, symbol.types]
+                   for key, entity_symbols in entity.symbols.items() for symbol in entity_symbols]
+        records.append([entity.type, entity.start_byte, entity.end_byte, *entity.start_point, *entity.end_point,
+                        positions.get(id(entity.parent), -1), entity.label, entity.name, None, symbols])
+
+    return {"imports": file.imports, "entities": records}
+
+# Bump whenever the layout of entity records changes
+RECORDS_VERSION = 3
+
+def records_version(analyzer: AbstractAnalyzer, file_path: Path) -> str:
+    """
+    Version under which a file's entity records are cached.
+    """
+
+    symbols = "" if analyzer.is_dependency(str(file_path)) else "s"
+    return f"{RECORDS_VERSION}{symbols}-{analyzer.version}"
+
+def entity_signature(entity: Entity) -> str:
+    """
+    An entity's signature, the declared types of its parameters.
+    """
+
+    return ', '.join(symbol.text for symbol in entity.symbols.get('parameters', []))
+
+def entity_key(entity: Entity) -> tuple[str, tuple[str, ...], str]:
+    """
+    Key identifying an entity across versions of its file:
+    its label, qualified name and signature.
+    """
+
+    names = []
+    parent = entity
+    while isinstance(parent, Entity):
+        names.append(parent.name)
+        parent = parent.parent
+    return entity.label, tuple(reversed(names)), entity_signature(entity)
+
+def content_hash(source: bytes) -> str:
+    """
+    Hash a file's content, the hash equals the git blob OID of the content.
+    """
+
+    return hashlib.sha1(b"blob %d\0" % len(source) + source).hexdigest()
+
+class LazyFiles(dict):
+    """
+    Files by path, files registered through defer are only loaded
+    when first looked up.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.deferred: dict[Path, Callable[[Path], File]] = {}
+
+    def defer(self, path: Path, loader: Callable[[Path], File]) -> None:
+        self.deferred[path] = loader
+
+    def __contains__(self, path) -> bool:
+        return super().__contains__(path) or path in self.deferred
+
+    def __missing__(self, path: Path) -> File:
+        file = self.deferred.pop(path)(path)
+        self[path] = file
+        return file
+
+    def load_all(self, exclude: set[Path] = set()) -> None:
+        for path in list(self.deferred):
+            if path not in exclude:
+                self[path]
+
+    def unload(self, path: Path, loader: Callable[[Path], File]) -> None:
+        # Release a loaded file, it's loaded again when next looked up
+        self.pop(path, None)
+        self.defer(path, loader)
@@ -0,0 +1,254 @@
+import os
+import zlib
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+from multilspy import SyncLanguageServer
+from multilspy.language_server import LanguageServer
+from multilspy.lsp_protocol_handler.server import Error as ResponseError
+
+# A definition request: (file path, line, column)
+Request = tuple[str, int, int]
+
+class CircuitBreaker():
+    """
+    Consecutive failed requests of a language server, the circuit opens
+    once they reach the threshold and requests fail fast from then on.
+
+    The circuit of a restarted server starts half open, its first failure
+    opens it again while its first success closes it.
+    """
+
+    def __init__(self, threshold: int, restarts: int = 0) -> None:
+        """
+        Args:
+            threshold (int): Number of consecutive failures opening the circuit.
+            restarts (int): Number of times the server was restarted so far.
+        """
+
+        self.threshold = max(1, threshold)
+        self.restarts  = restarts
+        self.failures  = 0
+        self.trial     = restarts > 0
+
+    @property
+    def open(self) -> bool:
+        return self.failures >= self.threshold or (self.trial and self.failures > 0)
+
+    @property
+    def half_open(self) -> bool:
+        return self.trial and self.failures == 0
+
+    def success(self) -> None:
+        self.failures = 0
+        self.trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+
+async def _request_definitions(resolver: "DefinitionResolver", server: LanguageServer, breaker: CircuitBreaker,
+                               requests: list[Request]) -> list[Optional[list[dict]]]:
+    # Runs on the server's event loop, keeping up to window requests in flight,
+    # the requests of a file share a deadline starting with its first request
+    semaphore = asyncio.Semaphore(resolver.window)
+    loop = asyncio.get_running_loop()
+    deadlines: dict[str, float] = {}
+
+    async def request(file_path: str, line: int, column: int) -> Optional[list[dict]]:
+        async with semaphore:
+            if breaker.open:
+                return None
+
+            timeout = resolver.timeout if resolver.timeout > 0 else None
+            expiring = False
+            if resolver.deadline > 0:
+                remaining = deadlines.setdefault(file_path, loop.time() + resolver.deadline) - loop.time()
+                if remaining <= 0:
+                    resolver.expired.add(file_path)
+                    return []
+                if timeout is None or remaining < timeout:
+                    timeout, expiring = remaining, True
+
+            try:
+                locations = await asyncio.wait_for(server.request_definition(file_path, line, column), timeout)
+                breaker.success()
+                return locations or []
+            except asyncio.TimeoutError:
+                # Running out of the file's budget isn't the server's failure
+                if expiring:
+                    resolver.expired.add(file_path)
+                    return []
+                logging.debug(f"Definition request timed out at {file_path}:{line}:{column}")
+                resolver.timeouts += 1
+            except (ResponseError, AssertionError) as e:
+                # The server answered, with an error or a response multilspy doesn't expect
+                logging.debug(f"Definition request failed at {file_path}:{line}:{column}: {e}")
+                breaker.success()
+                return []
+            except Exception as e:
+                logging.debug(f"Definition request failed at {file_path}:{line}:{column}: {e}")
+                resolver.failures += 1
+            breaker.failure()
+            return None
+
+    return await asyncio.gather(*[request(*r) for r in requests])
+
+class DefinitionResolver():
+    """
+    Issues definition requests to language servers concurrently.
+
+    Instead of waiting for each response before sending the next request,
+    up to `window` requests are kept in flight per server. When a language
+    has several server replicas, requests are sharded by file across them so
+    each replica only opens its own share of the files.
+
+    The requests of a file in a batch can be bounded by a deadline, requests
+    left once it passes resolve to nothing and the file is added to expired.
+
+    Each request is bounded by a timeout. A server whose requests keep
+    failing or timing out is restarted, and again as soon as its replacement
+    fails. Once it was restarted max_restarts times its requests are reported
+    as failed so callers can fall back to static resolution.
+    """
+
+    def __init__(self, window: int = None, deadline: float = 0, timeout: Optional[float] = None,
+                 failure_threshold: Optional[int] = None, max_restarts: Optional[int] = None,
+                 restart: Optional[Callable[[SyncLanguageServer], SyncLanguageServer]] = None) -> None:
+        """
+        Args:
+            window (int): Maximum number of in flight requests per server,
+                defaults to the CODE_GRAPH_LSP_CONCURRENCY environment variable.
+            deadline (float): Time in seconds the requests of a file may take, 0 for unbounded.
+            timeout (float, optional): Time in seconds a request may take, 0 for unbounded, defaults
+                to the CODE_GRAPH_LSP_REQUEST_TIMEOUT environment variable (30).
+            failure_threshold (int, optional): Consecutive failed requests after which a server is
+                restarted, defaults to the CODE_GRAPH_LSP_FAILURE_THRESHOLD environment variable (5).
+            max_restarts (int, optional): Number of times a server is restarted before giving up on it,
+                defaults to the CODE_GRAPH_LSP_MAX_RESTARTS environment variable (2).
+            restart (Callable[[SyncLanguageServer], SyncLanguageServer], optional): Restarts a server,
+                returning its replacement, servers are never restarted without it.
+        """
+
+        if window is None:
+            window = int(os.getenv('CODE_GRAPH_LSP_CONCURRENCY', 16))
+        if timeout is None:
+            timeout = float(os.getenv('CODE_GRAPH_LSP_REQUEST_TIMEOUT', 30))
+        if failure_threshold is None:
+            failure_threshold = int(os.getenv('CODE_GRAPH_LSP_FAILURE_THRESHOLD', 5))
+        if max_restarts is None:
+            max_restarts = int(os.getenv('CODE_GRAPH_LSP_MAX_RESTARTS', 2))
+
+        self.window = max(1, window)
+        self.deadline = deadline
+        self.expired: set[str] = set()
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.max_restarts = max_restarts
+        self.restart = restart
+        self.breakers: dict[int, CircuitBreaker] = {}
+
+        # Counters
+        self.timeouts = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def _breaker(self, server: SyncLanguageServer) -> CircuitBreaker:
+        if id(server) not in self.breakers:
+            self.breakers[id(server)] = CircuitBreaker(self.failure_threshold)
+        return self.breakers[id(server)]
+
+    def _restart(self, servers: list[SyncLanguageServer], replica: int) -> bool:
+        # Replace a server whose circuit opened, False once given up on
+        breaker = self.breakers[id(servers[replica])]
+        if self.restart is None or breaker.restarts >= self.max_restarts:
+            return False
+
+        logging.warning(f"Restarting language server after {breaker.failures} consecutive failures")
+        try:
+            server = self.restart(servers[replica])
+        except Exception as e:
+            logging.error(f"Failed restarting language server: {e}")
+            return False
+
+        self.restarts += 1
+        servers[replica] = server
+        self.breakers[id(server)] = CircuitBreaker(self.failure_threshold, breaker.restarts + 1)
+        return True
+
+    def request_definitions(self, servers: list[SyncLanguageServer], requests: list[Request]) -> list[Optional[list[dict]]]:
+        """
+        Request the definitions at a batch of positions.
+
+        Args:
+            servers (list[SyncLanguageServer]): Started replicas of a language's server,
+                restarted replicas are replaced in place.
+            requests (list[Request]): The positions, as (file path, line, column).
+
+        Returns:
+            list[Optional[list[dict]]]: The LSP locations for each request, in request order,
+                None for requests which failed.
+        """
+
+        res: list[Optional[list[dict]]] = [None for _ in requests]
+        pending = list(range(len(requests)))
+        while len(pending) > 0:
+            # Shard by file, keeping every request of a file on the same replica
+            shards = [[] for _ in servers]
+            for i in pending:
+                shards[zlib.crc32(requests[i][0].encode('utf-8')) % len(servers)].append(i)
+
+            futures = []
+            for replica, (server, shard) in enumerate(zip(servers, shards)):
+                breaker = self._breaker(server)
+                if len(shard) == 0 or breaker.open:
+                    continue
+                coro = _request_definitions(self, server.language_server, breaker, [requests[i] for i in shard])
+                futures.append((replica, shard, asyncio.run_coroutine_threadsafe(coro, server.loop)))
+
+            # Requests failed by a server whose circuit opened are retried once it's restarted
+            pending = []
+            for replica, shard, future in futures:
+                for i, locations in zip(shard, future.result()):
+                    res[i] = locations
+                if self._breaker(servers[replica]).open and self._restart(servers, replica):
+                    pending += [i for i in shard if res[i] is None]
+
+        return res
+
+class DefinitionCache():
+    """
+    Memoized definition lookups, LSP locations keyed by
+    AbstractAnalyzer.get_definition_key.
+    """
+
+    def __init__(self) -> None:
+        self.locations: dict[tuple, list[dict]] = {}
+        self.hits   = 0
+        self.misses = 0
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.locations
+
+    def __getitem__(self, key: tuple) -> list[dict]:
+        return self.locations[key]
+
+    def __setitem__(self, key: tuple, locations: list[dict]) -> None:
+        self.locations[key] = locations
+
+    def clear(self) -> None:
+        self.locations = {}
+
+    def invalidate(self, files: list[Path]) -> None:
+        """
+        Drop the lookups made from or resolved into files which are being re-analyzed.
+
+        Args:
+            files (list[Path]): The re-analyzed files.
+        """
+
+        paths = {str(file_path) for file_path in files}
+        self.locations = {key: locations for key, locations in self.locations.items()
+                          if key[0] not in paths and
+                          not any(location and location['absolutePath'] in paths for location in locations)}
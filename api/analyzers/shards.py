@@ -0,0 +1,147 @@
+import os
+import json
+import zlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+# Approximate memory held by the analysis per byte of source, the first
+# pass model takes ~0.85 bytes, the rest covers second pass resolutions
+MODEL_BYTES_PER_SOURCE_BYTE = 2
+
+def estimate_memory(files: list[Path]) -> int:
+    """
+    Estimate the memory the analysis of files holds.
+
+    Args:
+        files (list[Path]): The files.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+
+    size = 0
+    for file_path in files:
+        try:
+            size += file_path.stat().st_size
+        except OSError:
+            continue
+    return size * MODEL_BYTES_PER_SOURCE_BYTE
+
+def plan_shards(files: list[Path], budget: int) -> list[list[Path]]:
+    """
+    Split files into directory based shards, each estimated to fit the memory budget.
+
+    Files of a directory are kept in the same shard, sibling directories are
+    packed together while they fit, directories which don't fit on their own
+    are split by their sub directories and, as a last resort, into runs of files.
+
+    Args:
+        files (list[Path]): The files, in discovery order.
+        budget (int): Memory budget of a shard in bytes.
+
+    Returns:
+        list[list[Path]]: The shards, files keep their relative order.
+    """
+
+    sizes = {file_path: estimate_memory([file_path]) for file_path in files}
+    shards: list[list[Path]] = []
+    current: list[Path] = []
+    current_size = 0
+
+    def add(group: list[Path], size: int) -> None:
+        nonlocal current, current_size
+        if current_size + size > budget and len(current) > 0:
+            shards.append(current)
+            current, current_size = [], 0
+        current += group
+        current_size += size
+
+    def split(group: list[Path], depth: int) -> None:
+        size = sum(sizes[file_path] for file_path in group)
+        if size <= budget:
+            add(group, size)
+            return
+
+        # Files directly under this directory, then one group per sub directory
+        subgroups: OrderedDict[str, list[Path]] = OrderedDict()
+        direct = []
+        for file_path in group:
+            parts = file_path.parts
+            if len(parts) - 1 > depth:
+                subgroups.setdefault(parts[depth], []).append(file_path)
+            else:
+                direct.append(file_path)
+
+        for file_path in direct:
+            add([file_path], sizes[file_path])
+        for subgroup in subgroups.values():
+            split(subgroup, depth + 1)
+
+    # Start below the common root of all files
+    root = os.path.commonpath([str(file_path.parent) for file_path in files]) if len(files) > 0 else ''
+    split(files, len(Path(root).parts))
+
+    if len(current) > 0:
+        shards.append(current)
+    return shards
+
+class ShardStore():
+    """
+    On-disk symbol tables of a sharded analysis.
+
+    Each shard's table maps a file path to the file's compact records and the
+    graph IDs of its entities, tables are loaded back on demand and the most
+    recently used ones are kept decoded in memory.
+    """
+
+    def __init__(self, path: Path, cached: int = 2) -> None:
+        """
+        Args:
+            path (Path): Directory holding the tables.
+            cached (int): Number of decoded tables kept in memory.
+        """
+
+        self.path   = path
+        self.cached = max(1, cached)
+        self.tables: OrderedDict[int, dict] = OrderedDict()
+
+    def _table_path(self, shard: int) -> Path:
+        return self.path / f"{shard}.json.z"
+
+    def put(self, shard: int, table: dict[str, dict]) -> None:
+        """
+        Persist a shard's table.
+
+        Args:
+            shard (int): The shard's index.
+            table (dict[str, dict]): The table, plain JSON serializable values by file path.
+        """
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        data = zlib.compress(json.dumps(table, separators=(',', ':')).encode('utf-8'))
+        self._table_path(shard).write_bytes(data)
+        self.tables.pop(shard, None)
+
+        logging.info(f"Persisted shard {shard} table of {len(table)} files ({len(data)} bytes)")
+
+    def get(self, shard: int, file_path: Path) -> dict:
+        """
+        Look a file up in a shard's table.
+
+        Args:
+            shard (int): The shard's index.
+            file_path (Path): The file's path.
+
+        Returns:
+            dict: The file's entry.
+        """
+
+        if shard in self.tables:
+            self.tables.move_to_end(shard)
+        else:
+            self.tables[shard] = json.loads(zlib.decompress(self._table_path(shard).read_bytes()))
+            if len(self.tables) > self.cached:
+                self.tables.popitem(last=False)
+
+        return self.tables[shard][str(file_path)]
@@ -1,20 +1,37 @@
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from api.entities.entity import Entity
 from api.entities.file import File
+from multilspy import SyncLanguageServer
 
-from ..graph import Graph
+from ..graph import LIBRARY_PREFIX, Graph, GraphWriter, library_graph_name
+from ..info import (get_checkpoints, get_ingestion, get_queued_dependents, is_library_indexed,
+                    queue_dependents, remove_queued_dependents, set_library_indexed)
 from .analyzer import AbstractAnalyzer
+from .blob_store import BlobStore
+from .budget import FileBudget
+from .dependencies import DependencyLoader
+from .discovery import discover_files
+from .incremental import EntityReuse, TreeCache, apply_edits, diff_edits
+from .pipeline import PipelinedAnalysis, ProgressiveAnalysis
+from .records import (LazyFiles, content_hash, entity_key, entity_signature, extract_entities,
+                      file_records, load_entities, load_symbols, records_version)
 # from .c.analyzer import CAnalyzer
 from .java.analyzer import JavaAnalyzer
 from .python.analyzer import PythonAnalyzer
 from .csharp.analyzer import CSharpAnalyzer
 
-from multilspy import SyncLanguageServer
-from multilspy.multilspy_config import MultilspyConfig
-from multilspy.multilspy_logger import MultilspyLogger
+from .lsp_pool import lsp_pool
+from .shards import ShardStore, estimate_memory, plan_shards
+from .static_resolver import SymbolTable
+from .symbol_resolution import RESOLUTION_MODES, RESOLVE_CHUNK, RESOLVED_RELATIONS, SymbolResolution
 
 import logging
 # Configure logging
@@ -28,67 +45,210 @@ analyzers: dict[str, AbstractAnalyzer] = {
     '.java': JavaAnalyzer(),
     '.cs': CSharpAnalyzer()}
 
-class NullLanguageServer:
-    def start_server(self):
-        return nullcontext()
+# Per process analyzers used by first pass workers
+_worker_analyzers: dict[str, AbstractAnalyzer] = {}
+
+def _init_worker() -> None:
+    # Each worker owns its parsers
+    for ext, analyzer in analyzers.items():
+        _worker_analyzers[ext] = type(analyzer)()
+
+def _extract_file(budget: FileBudget, file_path: Path) -> Optional[dict]:
+    analyzer = _worker_analyzers[file_path.suffix]
+    tree = budget.parse(analyzer, file_path.read_bytes())
+    if tree is None:
+        return None
+    return extract_entities(analyzer, File(file_path, tree))
 
 class SourceAnalyzer():
-    def __init__(self) -> None:
-        self.files: dict[Path, File] = {}
+    def __init__(self, workers: Optional[int] = None, store: Optional[BlobStore] = None,
+                 resolution: Optional[str] = None, memory_budget: Optional[int] = None,
+                 lazy_dependencies: Optional[bool] = None, shared_dependencies: Optional[bool] = None,
+                 checkpoint: bool = False, budget: Optional[FileBudget] = None,
+                 pipelined: Optional[bool] = None) -> None:
+        """
+        Args:
+            workers (int, optional): Number of first pass worker processes,
+                defaults to the CODE_GRAPH_WORKERS environment variable (1).
+            store (BlobStore, optional): Cache of extracted entity records,
+                defaults to the store shared by all projects.
+            resolution (str, optional): Symbol resolution mode, one of RESOLUTION_MODES,
+                defaults to the CODE_GRAPH_RESOLUTION environment variable (lsp).
+            memory_budget (int, optional): Memory budget of an analysis in bytes, repositories
+                estimated to exceed it are analyzed in directory based shards, defaults to the
+                CODE_GRAPH_MEMORY_BUDGET environment variable (0, unbounded).
+            lazy_dependencies (bool, optional): Only parse dependency files once a symbol resolves
+                into them, and only add the referenced entities to the graph, defaults to the
+                CODE_GRAPH_LAZY_DEPENDENCIES environment variable (false).
+            shared_dependencies (bool, optional): Index dependency libraries once per version into
+                graphs shared by all projects, project graphs only hold stubs of the referenced
+                library entities, defaults to the CODE_GRAPH_SHARED_DEPENDENCIES environment variable (false).
+            checkpoint (bool): Record indexed and resolved files as checkpoints of the repository's
+                ingestion job, a resumed job only re-analyzes files missing from them.
+            budget (FileBudget, optional): Per file budget, defaults to the budget set by
+                the environment, see FileBudget.from_env.
+            pipelined (bool, optional): Overlap parsing, writing and symbol resolution, see
+                PipelinedAnalysis, instead of resolving once every file is indexed, defaults
+                to the CODE_GRAPH_PIPELINED environment variable (false).
+        """
+
+        self.resolution = resolution if resolution is not None else os.getenv('CODE_GRAPH_RESOLUTION', 'lsp')
+        if self.resolution not in RESOLUTION_MODES:
+            raise ValueError(f"Unknown resolution mode {self.resolution}")
+
+        self.files: LazyFiles = LazyFiles()
+        self.workers = workers if workers is not None else int(os.getenv('CODE_GRAPH_WORKERS', 1))
+        self.store = store if store is not None else BlobStore.from_env()
+        self.budget = budget if budget is not None else FileBudget.from_env()
+        self.trees = TreeCache()
+        self.memory_budget = memory_budget if memory_budget is not None else int(os.getenv('CODE_GRAPH_MEMORY_BUDGET', 0))
+
+        self.checkpoint = checkpoint
+
+        if pipelined is None:
+            pipelined = os.getenv('CODE_GRAPH_PIPELINED', 'false').lower() == 'true'
+        self.pipelined = pipelined
+
+        # Files exceeding the budget, and why
+        self.degraded: dict[Path, str] = {}
+
+        if lazy_dependencies is None:
+            lazy_dependencies = os.getenv('CODE_GRAPH_LAZY_DEPENDENCIES', 'false').lower() == 'true'
+        if shared_dependencies is None:
+            shared_dependencies = os.getenv('CODE_GRAPH_SHARED_DEPENDENCIES', 'false').lower() == 'true'
+        self.dependencies = DependencyLoader(analyzers, self.files, self.store, self.budget, self.degraded,
+                                             lazy=lazy_dependencies, shared=shared_dependencies)
+
+        self.symbol_resolution = SymbolResolution(analyzers, self.files, self.resolution, self.budget.lsp_deadline,
+                                                  self.degraded, self.dependencies.deferred)
+
+        # Background resolution of a progressive analysis
+        self.progressive: Optional[ProgressiveAnalysis] = None
 
     def supported_types(self) -> list[str]:
         """
         """
         return list(analyzers.keys())
 
-    def create_entity_hierarchy(self, entity: Entity, file: File, analyzer: AbstractAnalyzer, graph: Graph):
-        types = analyzer.get_entity_types()
-        stack = list(entity.node.children)
-        while stack:
-            node = stack.pop()
-            if node.type in types:
-                child = Entity(node)
-                child.id = graph.add_entity(analyzer.get_entity_label(node), analyzer.get_entity_name(node), analyzer.get_entity_docstring(node), str(file.path), node.start_point.row, node.end_point.row, {})
-                if not analyzer.is_dependency(str(file.path)):
-                    analyzer.add_symbols(child)
-                file.add_entity(child)
-                entity.add_child(child)
-                graph.connect_entities("DEFINES", entity.id, child.id)
-                self.create_entity_hierarchy(child, file, analyzer, graph)
-            else:
-                stack.extend(node.children)
-
-    def create_hierarchy(self, file: File, analyzer: AbstractAnalyzer, graph: Graph):
-        types = analyzer.get_entity_types()
-        stack = [file.tree.root_node]
-        while stack:
-            node = stack.pop()
-            if node.type in types:
-                entity = Entity(node)
-                entity.id = graph.add_entity(analyzer.get_entity_label(node), analyzer.get_entity_name(node), analyzer.get_entity_docstring(node), str(file.path), node.start_point.row, node.end_point.row, {})
-                if not analyzer.is_dependency(str(file.path)):
-                    analyzer.add_symbols(entity)
-                file.add_entity(entity)
-                graph.connect_entities("DEFINES", file.id, entity.id)
-                self.create_entity_hierarchy(entity, file, analyzer, graph)
-            else:
-                stack.extend(node.children)
+    def create_hierarchy(self, file: File, records: dict, writer: GraphWriter) -> None:
+        """
+        Add a file and the entities it defines to the graph.
+
+        Args:
+            file (File): The file, with its entities already registered.
+            records (dict): The file's records, as produced by extract_entities.
+            writer (GraphWriter): The graph writer.
+        """
+
+        writer.add_file(file)
+        for entity, record in zip(file.entities, records["entities"]):
+            doc = record[10]
+            writer.add_entity(entity, entity.label, entity.name, doc, str(file.path),
+                              entity.start_point[0], entity.end_point[0],
+                              {'signature': entity_signature(entity)})
+            writer.connect_entities("DEFINES", entity.parent, entity)
 
-    def first_pass(self, path: Path, files: list[Path], ignore: list[str], graph: Graph) -> None:
+    def update_hierarchy(self, graph: Graph, file: File, records: dict, writer: GraphWriter) -> None:
         """
-        Perform the first pass analysis on source files in the given directory tree.
+        Bring the entities a file defines in the graph up to date with the file's new version.
+
+        Entities are matched against the ones already in the graph by their
+        label, qualified name and signature, see entity_key, duplicates are
+        matched in order. Nodes of matched entities are kept, along with the
+        edges into them, and only updated where their position or docstring
+        changed. Entities missing from the new version are deleted and new
+        ones are created. The outgoing edges of kept entities are deleted,
+        the file's resolution re-creates them.
+
+        Files whose symbols resolved to deleted entities, or to entities sharing
+        their qualified name with created or deleted ones, e.g. overloads, are
+        queued for re-resolution, see load_dependents.
 
         Args:
+            graph (Graph): The graph.
+            file (File): The file, with its entities already registered.
+            records (dict): The file's records, as produced by extract_entities.
+            writer (GraphWriter): The graph writer.
+        """
+
+        previous: dict[tuple, list[tuple[int, int, int, Optional[str], Optional[str]]]] = {}
+        for id, label, names, signature, src_start, src_end, doc in graph.get_file_definitions(str(file.path)):
+            previous.setdefault((label, tuple(names), signature), []).append((id, src_start, src_end, doc, signature))
+
+        docs = {entity: record[10] for entity, record in zip(file.entities, records["entities"])}
+        entities = sorted(file.entities, key=lambda entity: (entity.start_byte, -entity.end_byte))
+
+        keys = {entity: entity_key(entity) for entity in entities}
+        kept: set[Entity] = set()
+        updated = []
+        for entity in entities:
+            label, names, signature = keys[entity]
+            matches = previous.get((label, names, signature))
+            if not matches:
+                # Nodes written before signatures were recorded are matched by name
+                matches = previous.get((label, names, None))
+                if not matches:
+                    continue
+
+            id, src_start, src_end, doc, old_signature = matches.pop(0)
+            entity.id = id
+            kept.add(entity)
+            if (src_start, src_end, doc, old_signature) != (entity.start_point[0], entity.end_point[0], docs[entity], signature):
+                updated.append({'id': id, 'src_start': entity.start_point[0], 'src_end': entity.end_point[0],
+                                'doc': docs[entity], 'signature': signature})
+
+        deleted = [match[0] for matches in previous.values() for match in matches]
+
+        # Found through the edges into the entities, ahead of their deletion
+        changed = {key[:2] for key, matches in previous.items() if len(matches) > 0}
+        changed |= {keys[entity][:2] for entity in entities if entity not in kept}
+        affected = deleted + [entity.id for entity in kept if keys[entity][:2] in changed]
+        if len(affected) > 0:
+            dependents = graph.get_dependent_files(affected, RESOLVED_RELATIONS)
+            queue_dependents(graph.name, [p for p in dependents if p != str(file.path)])
+
+        # Applied ahead of the creations, which could otherwise
+        # merge into the nodes of deleted or moved entities
+        if len(deleted) > 0:
+            graph.delete_entities(deleted)
+        if len(updated) > 0:
+            graph.update_entities(updated)
+        if len(kept) > 0:
+            graph.disconnect_entities([entity.id for entity in kept], RESOLVED_RELATIONS)
+
+        writer.add_file(file)
+        for entity in entities:
+            if entity not in kept:
+                writer.add_entity(entity, entity.label, entity.name, docs[entity], str(file.path),
+                                  entity.start_point[0], entity.end_point[0],
+                                  {'signature': entity_signature(entity)})
+            # Kept entities of kept parents are still defined by them
+            if entity not in kept or isinstance(entity.parent, Entity) and entity.parent not in kept:
+                writer.connect_entities("DEFINES", entity.parent, entity)
+
+    def collect_files(self, path: Path, files: list[Path], ignore: list[str],
+                      dependencies: bool = True) -> list[Path]:
+        """
+        Add dependencies and drop unsupported or ignored files.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The candidate files.
             ignore (list(str)): List of paths to ignore
-            executor (concurrent.futures.Executor): The executor to run tasks concurrently.
+            dependencies (bool): Add the folder's dependencies, False when they
+                were already added by a previous analysis of the folder.
+
+        Returns:
+            list[Path]: The files to analyze.
         """
 
-        supoorted_types = self.supported_types()
-        for ext in set([file.suffix for file in files if file.suffix in supoorted_types]):
-            analyzers[ext].add_dependencies(path, files)
-        
-        files_len = len(files)
-        for i, file_path in enumerate(files):
+        if dependencies:
+            supoorted_types = self.supported_types()
+            for ext in set([file.suffix for file in files if file.suffix in supoorted_types]):
+                analyzers[ext].add_dependencies(path, files)
+
+        res = []
+        for file_path in files:
             # Skip none supported files
             if file_path.suffix not in analyzers:
                 logging.info(f"Skipping none supported file {file_path}")
@@ -99,101 +259,732 @@ class SourceAnalyzer():
                 logging.info(f"Skipping ignored file {file_path}")
                 continue
 
-            logging.info(f'Processing file ({i + 1}/{files_len}): {file_path}')
+            # Lazy and shared dependencies are loaded apart
+            if self.dependencies.collect(file_path):
+                continue
+
+            res.append(file_path)
 
-            analyzer = analyzers[file_path.suffix]
+        if self.dependencies.lazy:
+            logging.info(f"Deferring {len(self.dependencies.deferred)} dependency files")
 
-            # Parse file
-            source_code = file_path.read_bytes()
-            tree = analyzer.parser.parse(source_code)
+        return res
 
-            # Create file entity
-            file = File(file_path, tree)
-            self.files[file_path] = file
+    def first_pass(self, path: Path, files: list[Path], ignore: list[str], graph: Graph,
+                   keep_trees: bool = False, diff: bool = False, dependencies: bool = True) -> list[Path]:
+        """
+        Perform the first pass analysis on source files in the given directory tree.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to analyze.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The graph to populate.
+            keep_trees (bool): Keep the files' trees so they're reparsed incrementally
+                when modified again.
+            diff (bool): Diff the files' entities against the graph, see update_hierarchy.
+            dependencies (bool): Add the folder's dependencies, see collect_files.
+
+        Returns:
+            list[Path]: The analyzed files.
+        """
 
-            # Walk thought the AST
-            graph.add_file(file)
-            self.create_hierarchy(file, analyzer, graph)
+        files = self.collect_files(path, files, ignore, dependencies=dependencies)
+        self.index_files(files, graph, keep_trees=keep_trees, diff=diff)
+        self.index_libraries()
+        return files
 
-    def second_pass(self, graph: Graph, files: list[Path], path: Path) -> None:
+    def index_libraries(self) -> None:
+        """
+        Index the collected dependency libraries into their shared graphs,
+        libraries already indexed by any project are reused as is. Library
+        files are only loaded once a symbol resolves into them.
+        """
+
+        for library, files in self.dependencies.libraries.items():
+            name = library_graph_name(library)
+            graph = Graph(name)
+            if not is_library_indexed(name):
+                logging.info(f"Indexing library {library} ({len(files)} files)")
+                self.index_files(files, graph)
+                set_library_indexed(name)
+
+            for file_path in files:
+                self.files.unload(file_path, partial(self.load_file, graph))
+
+        self.dependencies.libraries = {}
+
+    def index_files(self, files: list[Path], graph: Graph, writer: Optional[GraphWriter] = None,
+                    on_indexed: Optional[Callable[[Path], None]] = None, keep_trees: bool = False,
+                    diff: bool = False) -> None:
         """
-        Recursively analyze the contents of a directory.
+        Parse files and add them with the entities they define to the graph.
+
+        When more than one worker is configured files are parsed and walked by
+        a pool of worker processes, the results are merged back in input order
+        so the graph is identical to the one produced by the serial path.
 
         Args:
-            base (str): The base directory for analysis.
-            root (str): The current directory being analyzed.
-            executor (concurrent.futures.Executor): The executor to run tasks concurrently.
+            files (list[Path]): The files to index.
+            graph (Graph): The graph to populate.
+            writer (GraphWriter, optional): The graph writer to use, by default the
+                files are written, and flushed, by a writer of their own.
+            on_indexed (Callable[[Path], None], optional): Called with each file once
+                its entities are queued for writing and it's registered in self.files.
+            keep_trees (bool): Keep the trees of parsed files, files whose previous
+                tree was kept are reparsed incrementally.
+            diff (bool): Diff the entities of files already in the graph against their
+                new versions, instead of adding them, see update_hierarchy.
         """
 
-        logger = MultilspyLogger()
-        logger.logger.setLevel(logging.ERROR)
-        lsps = {}
-        if any(path.rglob('*.java')):
-            config = MultilspyConfig.from_dict({"code_language": "java"})
-            lsps[".java"] = SyncLanguageServer.create(config, logger, str(path))
-        else:
-            lsps[".java"] = NullLanguageServer()
-        if any(path.rglob('*.py')):
-            config = MultilspyConfig.from_dict({"code_language": "python", "environment_path": f"{path}/venv"})
-            lsps[".py"] = SyncLanguageServer.create(config, logger, str(path))
-        else:
-            lsps[".py"] = NullLanguageServer()
-        if any(path.rglob('*.cs')):
-            config = MultilspyConfig.from_dict({"code_language": "csharp"})
-            lsps[".cs"] = SyncLanguageServer.create(config, logger, str(path))
+        # Oversized and generated files are degraded before they're parsed
+        hashes = []
+        reasons = []
+        for file_path in files:
+            source = file_path.read_bytes()
+            hashes.append(content_hash(source))
+            reasons.append(self.budget.inspect(source))
+
+        # Contents seen before, in any commit or project, are loaded from the store
+        cached = [reason is None and self.store is not None and
+                  self.store.contains(h, records_version(analyzers[file_path.suffix], file_path))
+                  for file_path, h, reason in zip(files, hashes, reasons)]
+
+        # Files with a previous tree are reparsed incrementally, in process
+        parallel = [not hit and reason is None and not (keep_trees and file_path in self.trees)
+                    for file_path, hit, reason in zip(files, cached, reasons)]
+        misses = [file_path for file_path, miss in zip(files, parallel) if miss]
+        if self.workers > 1 and len(misses) > 1:
+            # Workers don't inherit the parent's threads, locks and connections
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                           mp_context=multiprocessing.get_context('forkserver'))
+            results = executor.map(partial(_extract_file, self.budget), misses, chunksize=16)
         else:
-            lsps[".cs"] = NullLanguageServer()
-        with lsps[".java"].start_server(), lsps[".py"].start_server(), lsps[".cs"].start_server():
-            files_len = len(self.files)
-            for i, file_path in enumerate(files):
-                file = self.files[file_path]
-                logging.info(f'Processing file ({i + 1}/{files_len}): {file_path}')
-                for _, entity in file.entities.items():
-                    entity.resolved_symbol(lambda key, symbol: analyzers[file_path.suffix].resolve_symbol(self.files, lsps[file_path.suffix], file_path, path, key, symbol))
-                    for key, symbols in entity.symbols.items():
-                        for symbol in symbols:
-                            if len(symbol.resolved_symbol) == 0:
-                                continue
-                            resolved_symbol = next(iter(symbol.resolved_symbol))
-                            if key == "base_class":
-                                graph.connect_entities("EXTENDS", entity.id, resolved_symbol.id)
-                            elif key == "implement_interface":
-                                graph.connect_entities("IMPLEMENTS", entity.id, resolved_symbol.id)
-                            elif key == "extend_interface":
-                                graph.connect_entities("EXTENDS", entity.id, resolved_symbol.id)
-                            elif key == "call":
-                                graph.connect_entities("CALLS", entity.id, resolved_symbol.id, {"line": symbol.symbol.start_point.row, "text": symbol.symbol.text.decode("utf-8")})
-                            elif key == "return_type":
-                                graph.connect_entities("RETURNS", entity.id, resolved_symbol.id)
-                            elif key == "parameters":
-                                graph.connect_entities("PARAMETERS", entity.id, resolved_symbol.id)
+            executor = None
+            results = None
+
+        # Library graphs aren't part of the repository's ingestion job
+        checkpoint = self.checkpoint and not graph.name.startswith(LIBRARY_PREFIX)
+
+        try:
+            with graph.writer() if writer is None else nullcontext(writer) as writer:
+                files_len = len(files)
+                for i, file_path in enumerate(files):
+                    logging.info(f'Processing file ({i + 1}/{files_len}): {file_path}')
+
+                    analyzer = analyzers[file_path.suffix]
+                    version = records_version(analyzer, file_path)
+
+                    # Create file entity
+                    file = File(file_path, None)
+                    file.hash = hashes[i]
+
+                    reason = reasons[i]
+                    records = None
+                    if reason is None:
+                        records = self.store.get(file.hash, version) if cached[i] else None
+                        if records is not None:
+                            load_entities(file, records)
+                        else:
+                            if results is not None and parallel[i]:
+                                records = next(results)
+                                if records is not None:
+                                    load_entities(file, records)
+                            else:
+                                # Parse file and walk thought the AST
+                                records = self.parse_file(analyzer, file, keep_tree=keep_trees)
+
+                            if records is None:
+                                reason = 'parse timeout'
+                            elif self.store is not None:
+                                self.store.put(file.hash, version, records)
+
+                        if records is not None and not self.budget.within_entities(records):
+                            reason = 'entities'
+                    elif not self.budget.skip:
+                        # Indexed without symbols, so it's never resolved
+                        records = self.parse_file(analyzer, file, symbols=False)
+                        if records is not None and not self.budget.within_entities(records):
+                            records = None
+
+                    if reason is not None:
+                        logging.warning(f"Degrading {file_path}, exceeds the file budget: {reason}")
+                        self.degraded[file_path] = reason
+                        if records is None or reasons[i] is None:
+                            # Only the file node is kept
+                            file = File(file_path, None)
+                            file.hash = hashes[i]
+                            records = {"imports": [], "entities": []}
+
+                    if reason is None or not self.budget.skip:
+                        if diff:
+                            self.update_hierarchy(graph, file, records, writer)
+                        else:
+                            self.create_hierarchy(file, records, writer)
+                        if checkpoint:
+                            writer.add_checkpoint('indexed', str(file_path))
+                    elif diff:
+                        # Skipped, the previous version is removed
+                        graph.delete_files([file_path])
+
+                    # Registered once queued for writing, as resolutions
+                    # may refer to the file's entities from here on
+                    self.files[file_path] = file
+                    if on_indexed is not None:
+                        on_indexed(file_path)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def parse_file(self, analyzer: AbstractAnalyzer, file: File, symbols: bool = True,
+                   keep_tree: bool = False) -> Optional[dict]:
+        """
+        Parse a file within the parse timeout and register its entities on it.
+
+        A file whose previous tree was kept is reparsed incrementally, the
+        edits are derived from the git diff between the previous content and
+        the current one, and only the entities they touch are extracted again.
+
+        Args:
+            analyzer (AbstractAnalyzer): The analyzer of the file's language.
+            file (File): The file.
+            symbols (bool): Extract symbols.
+            keep_tree (bool): Keep the file's tree, for its next reparse.
+
+        Returns:
+            Optional[dict]: The file's records, None if parsing timed out.
+        """
+
+        source = file.path.read_bytes()
+
+        old_tree = None
+        previous = self.trees.pop(file.path) if keep_tree else None
+        if previous is not None and symbols:
+            old_source, old_tree, old_records = previous
+            edits = diff_edits(old_source, source)
+            if edits is None:
+                old_tree = None
+            else:
+                apply_edits(old_tree, edits)
+
+        file.tree = self.budget.parse(analyzer, source, old_tree)
+        if file.tree is None:
+            return None
+
+        tree = file.tree
+        reuse = None
+        if old_tree is not None:
+            dirty = [(r.start_byte, r.end_byte) for r in old_tree.changed_ranges(tree)]
+            reuse = EntityReuse(old_records, edits, dirty)
+
+        records = extract_entities(analyzer, file, symbols, reuse)
+        if keep_tree and symbols and not analyzer.is_dependency(str(file.path)):
+            self.trees.put(file.path, source, tree, records)
+        return records
+
+    def summary(self) -> dict:
+        """
+        Summarize the files which exceeded the file budget.
+
+        Returns:
+            dict: Why each file was indexed structurally ('degraded') or skipped ('skipped'),
+                by path. Files whose definition requests exceeded their deadline were
+                indexed, and only partly resolved. 'language_servers' counts timed out
+                and failed definition requests, server restarts and symbols resolved
+                statically as their requests failed.
+        """
+
+        skipped = {str(file_path): reason for file_path, reason in self.degraded.items()
+                   if self.budget.skip and reason != 'lsp deadline'}
+        degraded = {str(file_path): reason for file_path, reason in self.degraded.items()
+                    if str(file_path) not in skipped}
+        resolver = self.symbol_resolution.resolver
+        language_servers = {'timeouts': resolver.timeouts, 'failures': resolver.failures,
+                            'restarts': resolver.restarts, 'fallbacks': self.symbol_resolution.fallbacks}
+        return {'degraded': degraded, 'skipped': skipped, 'language_servers': language_servers}
+
+    def second_pass(self, graph: Graph, files: list[Path], path: Path) -> None:
+        """
+        Resolve the symbols of indexed files and connect their entities.
+
+        Args:
+            graph (Graph): The graph the edges are written to.
+            files (list[Path]): The files to resolve.
+            path (Path): The project's root directory.
+        """
+
+        resolution = self.symbol_resolution
+        symbol_table = resolution.symbol_table()
+        with resolution.language_servers(path, files) as lsps, graph.writer() as writer:
+            self.resolve_files(files, path, lsps, symbol_table, writer)
+
+        resolution.log_stats()
+
+    def resolve_files(self, files: list[Path], path: Path, lsps: dict[str, list[SyncLanguageServer]],
+                      symbol_table: Optional[SymbolTable], writer: GraphWriter) -> None:
+        """
+        Resolve the symbols of files in chunks and connect them in the graph.
+
+        Args:
+            files (list[Path]): The files to resolve.
+            path (Path): The root of the analyzed folder.
+            lsps (dict[str, list[SyncLanguageServer]]): Language server replicas by extension.
+            symbol_table (SymbolTable, optional): The repository's symbol table, for static and hybrid resolution.
+            writer (GraphWriter): The graph writer.
+        """
+
+        files_len = len(files)
+        for i in range(0, files_len, RESOLVE_CHUNK):
+            chunk = files[i:i + RESOLVE_CHUNK]
+            logging.info(f'Resolving files ({i + 1}-{i + len(chunk)}/{files_len})')
+            self.symbol_resolution.resolve_symbols(chunk, path, lsps, symbol_table)
+            for file_path in chunk:
+                self.connect_symbols(self.files[file_path], writer)
+                if self.checkpoint:
+                    writer.add_checkpoint('resolved', str(file_path))
+
+    def connect_symbols(self, file: File, writer: GraphWriter) -> None:
+        """
+        Connect a file's entities to the entities their symbols resolved to.
+
+        Args:
+            file (File): The resolved file.
+            writer (GraphWriter): The graph writer.
+        """
+
+        for entity in file.entities:
+            for key, symbols in entity.symbols.items():
+                for symbol in symbols:
+                    # Statically resolved edges carry how confident the lookup was
+                    props = {} if symbol.confidence is None else {"confidence": symbol.confidence}
+                    for resolved_symbol in symbol.resolved_symbol:
+                        node = self.dependencies.graph_node(resolved_symbol, writer)
+                        if key == "base_class":
+                            writer.connect_entities("EXTENDS", entity, node, props)
+                        elif key == "implement_interface":
+                            writer.connect_entities("IMPLEMENTS", entity, node, props)
+                        elif key == "extend_interface":
+                            writer.connect_entities("EXTENDS", entity, node, props)
+                        elif key == "call":
+                            writer.connect_entities("CALLS", entity, node, {"line": symbol.line, "text": symbol.text, **props})
+                        elif key == "return_type":
+                            writer.connect_entities("RETURNS", entity, node, props)
+                        elif key == "parameters":
+                            writer.connect_entities("PARAMETERS", entity, node, props)
+
+    def delete_files(self, files: list[Path], path: Path, graph: Graph) -> None:
+        """
+        Remove files, and every entity they define, from the graph.
+
+        Args:
+            files (list[Path]): The files to remove.
+            path (Path): The root of the analyzed folder.
+            graph (Graph): The graph.
+        """
+
+        # Files whose symbols resolved into the removed ones are resolved again
+        ids = [id for file_path in files for id in graph.get_file_entities(str(file_path)).values()]
+        if len(ids) > 0:
+            removed = {str(file_path) for file_path in files}
+            dependents = graph.get_dependent_files(ids, RESOLVED_RELATIONS)
+            queue_dependents(graph.name, [p for p in dependents if p not in removed])
+
+        graph.delete_files(files)
+        self.forget_files(files)
+        for file_path in files:
+            if not file_path.exists():
+                self.trees.pop(file_path)
+
+        # Modified files are re-introduced by a following analysis
+        lsp_pool.notify(path, deleted=[file_path for file_path in files if not file_path.exists()])
+
+    def forget_files(self, files: list[Path]) -> None:
+        """
+        Drop what was loaded and resolved of files, e.g. once modified.
+
+        Args:
+            files (list[Path]): The files.
+        """
+
+        for file_path in files:
+            self.files.pop(file_path, None)
+        self.symbol_resolution.invalidate(files)
+
+    def reload_files(self, graph: Graph, files: list[Path]) -> None:
+        """
+        Reload files the graph was changed for by someone else, e.g. by an
+        interrupted job, they're loaded from the graph when next looked up.
+        Files which no longer exist are forgotten.
+
+        Args:
+            graph (Graph): The graph.
+            files (list[Path]): The files.
+        """
+
+        self.forget_files(files)
+        for file_path in files:
+            self.trees.pop(file_path)
+            if file_path.exists():
+                self.files.defer(file_path, partial(self.load_file, graph))
+            else:
+                self.files.deferred.pop(file_path, None)
+
+    def load_dependents(self, graph: Graph, files: list[Path]) -> list[Path]:
+        """
+        Load the files queued for re-resolution as their symbols resolved to
+        entities which changed, see update_hierarchy and delete_files. Their
+        outgoing resolution edges are deleted, resolving them re-creates the edges.
+
+        Args:
+            graph (Graph): The graph.
+            files (list[Path]): Files resolved anyway.
+
+        Returns:
+            list[Path]: The other queued files, to be removed from the queue once resolved.
+        """
+
+        queued = get_queued_dependents(graph.name)
+        exclude = {str(file_path) for file_path in files}
+        dependents = [Path(p) for p in sorted(queued) if p not in exclude and Path(p).is_file()]
+
+        # Files removed since they were queued have nothing to resolve
+        remove_queued_dependents(graph.name, [p for p in queued if p not in exclude and not Path(p).is_file()])
+        if len(dependents) == 0:
+            return []
+
+        logging.info(f"Resolving {len(dependents)} files depending on changed entities")
+        self.forget_files(dependents)
+        for file_path in dependents:
+            file = self.load_file(graph, file_path, symbols=True)
+            self.files[file_path] = file
+            ids = [entity.id for entity in file.entities if entity.id is not None]
+            if len(ids) > 0:
+                graph.disconnect_entities(ids, RESOLVED_RELATIONS)
+
+        return dependents
 
     def analyze_files(self, files: list[Path], path: Path, graph: Graph) -> None:
-        self.first_pass(path, files, [], graph)
-        self.second_pass(graph, files, path)
+        """
+        Analyze added and modified files of an analyzed folder, modified
+        files are diffed against their entities in the graph, see update_hierarchy.
+        Files queued for re-resolution are resolved along with them.
 
-    def analyze_sources(self, path: Path, ignore: list[str], graph: Graph) -> None:
-        path = path.resolve()
-        files = list(path.rglob("*.java")) + list(path.rglob("*.py")) + list(path.rglob("*.cs"))
-        # First pass analysis of the source code
-        self.first_pass(path, files, ignore, graph)
+        Args:
+            files (list[Path]): The added and modified files.
+            path (Path): The root of the analyzed folder.
+            graph (Graph): The folder's graph.
+        """
+
+        self.forget_files(files)
+        # Files re-analyzed this way are likely modified again, keep their trees.
+        # The folder's dependencies, and the libraries they're indexed into,
+        # were loaded by its analysis
+        files = self.first_pass(path, files, [], graph, keep_trees=True, diff=True, dependencies=False)
+        dependents = self.load_dependents(graph, files)
+        if len(files + dependents) > 0:
+            self.second_pass(graph, files + dependents, path)
+            remove_queued_dependents(graph.name, [str(file_path) for file_path in files + dependents])
+
+    def analyze_changes(self, path: Path, files: list[Path], ignore: list[str], graph: Graph, manifest: dict[str, Optional[str]],
+                        dependencies: bool = True) -> None:
+        """
+        Re-analyze a previously analyzed folder, only files whose content
+        differs from the graph's manifest are parsed and resolved.
+
+        When resuming an interrupted ingestion job files which weren't checkpointed
+        as indexed are re-analyzed too, and those which weren't checkpointed as
+        resolved are resolved.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files currently in the folder.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The previously populated graph.
+            manifest (dict[str, Optional[str]]): Content hash of every file in the graph.
+            dependencies (bool): Add the folder's dependencies, False when they're known to
+                be unchanged since the previous analysis, their files are kept as is.
+        """
+
+        files = self.collect_files(path, files, ignore, dependencies=dependencies)
+
+        # A file node is written ahead of its entities, files of an interrupted
+        # job are only complete once checkpointed
+        resumed = self.checkpoint and get_ingestion(graph.name) == 'resumed'
+        if resumed:
+            indexed = get_checkpoints(graph.name, 'indexed')
+            resolved = get_checkpoints(graph.name, 'resolved')
+
+        changed = []
+        unresolved = []
+        for file_path in files:
+            if manifest.get(str(file_path)) != content_hash(file_path.read_bytes()) or \
+               (resumed and str(file_path) not in indexed):
+                changed.append(file_path)
+            elif resumed and str(file_path) not in resolved:
+                # Indexed by the interrupted job, resolved from its existing nodes
+                self.files.defer(file_path, partial(self.load_file, graph, symbols=True))
+                unresolved.append(file_path)
+            else:
+                # Unchanged files are only loaded if a symbol resolves into them
+                self.files.defer(file_path, partial(self.load_file, graph))
+
+        # Dependencies added to the graph by a previous analysis aren't stale
+        present = set(str(file_path) for file_path in files + list(self.dependencies.deferred))
+        stale = [Path(p) for p in manifest if p not in present]
+        if not dependencies:
+            stale = [file_path for file_path in stale
+                     if file_path.suffix not in analyzers or not analyzers[file_path.suffix].is_dependency(str(file_path))]
+
+        logging.info(f"Re-analyzing {len(changed)} changed files, removing {len(stale)} stale files, skipping {len(files) - len(changed)} unchanged files")
+
+        if len(stale) > 0:
+            self.delete_files(stale, path, graph)
+
+        # Changed files are diffed against their previous version
+        self.forget_files(changed)
+
+        if len(unresolved) > 0:
+            logging.info(f"Resolving {len(unresolved)} files indexed by the interrupted ingestion")
+
+        self.index_files(changed, graph, diff=True)
+        self.index_libraries()
+        dependents = self.load_dependents(graph, changed + unresolved)
+        self.second_pass(graph, changed + unresolved + dependents, path)
+        remove_queued_dependents(graph.name, [str(file_path) for file_path in changed + unresolved + dependents])
+
+    def load_file(self, graph: Graph, file_path: Path, symbols: bool = False) -> File:
+        """
+        Load an already indexed file as a resolution target,
+        its entities get the IDs of their nodes in the graph.
+
+        Args:
+            graph (Graph): The graph the file was indexed into.
+            file_path (Path): The file's path.
+            symbols (bool): Also load the symbols of the file's entities, to resolve them.
+
+        Returns:
+            File: The file.
+        """
 
-        # Second pass analysis of the source code
+        analyzer = analyzers[file_path.suffix]
+        source = file_path.read_bytes()
+        file = File(file_path, None)
+        file.hash = content_hash(source)
+
+        # Degraded files are never resolved
+        if self.budget.inspect(source) is not None:
+            symbols = False
+
+        records = self.store.get(file.hash, records_version(analyzer, file_path)) if self.store is not None else None
+        if records is not None:
+            load_entities(file, records, symbols=symbols)
+        else:
+            records = self.parse_file(analyzer, file, symbols=symbols)
+
+        # Entities of files exceeding the budget weren't added to the graph
+        if records is None or not self.budget.within_entities(records):
+            empty = File(file_path, None)
+            empty.hash = file.hash
+            return empty
+
+        ids = graph.get_file_entities(str(file_path))
+        for entity in file.entities:
+            entity.id = ids.get((entity.label, entity.name, entity.start_point[0], entity.end_point[0]))
+
+        return file
+
+    def analyze_pipelined(self, path: Path, files: list[Path], ignore: list[str], graph: Graph) -> None:
+        """
+        Analyze a repository with its stages overlapping, see PipelinedAnalysis.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to analyze.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The graph to populate.
+        """
+
+        PipelinedAnalysis(self).run(path, files, ignore, graph)
+
+    def analyze_progressively(self, path: Path, files: list[Path], ignore: list[str], graph: Graph) -> None:
+        """
+        Publish the repository's skeleton, its files and the entities they define,
+        and resolve symbols in a background thread, see ProgressiveAnalysis and wait.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to analyze.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The graph to populate.
+        """
+
+        self.progressive = ProgressiveAnalysis(self)
+        self.progressive.start(path, files, ignore, graph)
+
+    def wait(self) -> None:
+        """
+        Wait for the background resolution of a progressive analysis to complete.
+
+        Raises:
+            Exception: The error the background resolution failed with.
+        """
+
+        if self.progressive is not None:
+            self.progressive.wait()
+
+    def analyze_sources(self, path: Path, ignore: list[str], graph: Graph, progressive: bool = False,
+                        dependencies: bool = True) -> None:
+        """
+        Analyze a folder's sources, a previously analyzed folder only has its changes analyzed.
+
+        Args:
+            path (Path): The folder.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The folder's graph.
+            progressive (bool): Publish the skeleton graph first, resolving symbols in the background.
+            dependencies (bool): Add the dependencies of a previously analyzed folder, False
+                when they're known to be unchanged, e.g. when re-scanning a watched folder.
+        """
+
+        path = path.resolve()
+        sources = discover_files(path, self.supported_types(), ignore)
+        files = [file_path for ext_files in sources.values() for file_path in ext_files]
+
+        # Previously analyzed, only process changes
+        manifest = graph.get_file_hashes()
+        if len(manifest) > 0:
+            self.analyze_changes(path, files, ignore, graph, manifest, dependencies)
+            return
+
+        # Repositories which don't fit in memory are analyzed shard by shard
+        if self.memory_budget > 0 and estimate_memory(files) > self.memory_budget:
+            self.analyze_sharded(path, files, ignore, graph)
+            return
+
+        # Publish the skeleton first, resolving symbols in the background
+        if progressive:
+            self.analyze_progressively(path, files, ignore, graph)
+            return
+
+        # First and second pass analysis of the source code, optionally overlapped
+        if self.pipelined:
+            self.analyze_pipelined(path, files, ignore, graph)
+            return
+
+        files = self.first_pass(path, files, ignore, graph)
         self.second_pass(graph, files, path)
 
-    def analyze_local_folder(self, path: str, g: Graph, ignore: Optional[list[str]] = []) -> None:
+    def load_shard_file(self, shards: ShardStore, shard: int, file_path: Path) -> File:
+        """
+        Load a file's entities, without their symbols, from its shard's table.
+
+        Args:
+            shards (ShardStore): The shard tables.
+            shard (int): The file's shard.
+            file_path (Path): The file's path.
+
+        Returns:
+            File: The file, its entities carry their graph IDs.
+        """
+
+        entry = shards.get(shard, file_path)
+        file = File(file_path, None)
+        file.hash = entry["hash"]
+        load_entities(file, entry["records"], symbols=False)
+        for entity, entity_id in zip(file.entities, entry["ids"]):
+            entity.id = entity_id
+        return file
+
+    def analyze_sharded(self, path: Path, files: list[Path], ignore: list[str], graph: Graph) -> None:
+        """
+        Analyze a repository in directory based shards sized to the memory budget.
+
+        The first pass indexes one shard at a time, persisting each shard's
+        compact symbol table to local disk and releasing its files. The second
+        pass then resolves one shard at a time, loading the shard's symbols and,
+        for references into other shards, only the tables of the shards they
+        resolve into. Static and hybrid resolution keep every shard's entities,
+        without their symbols, loaded for the repository wide symbol table.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to analyze.
+            ignore (list(str)): List of paths to ignore
+            graph (Graph): The graph to populate.
+        """
+
+        files = self.collect_files(path, files, ignore)
+        shards = plan_shards(files, self.memory_budget)
+        logging.info(f"Analyzing {len(files)} files in {len(shards)} shards")
+
+        with tempfile.TemporaryDirectory(prefix="code-graph-shards-") as tables:
+            store = ShardStore(Path(tables))
+            loaders = {}
+
+            # First pass, shard by shard
+            for i, shard in enumerate(shards):
+                logging.info(f"Indexing shard {i + 1}/{len(shards)} ({len(shard)} files)")
+                self.index_files(shard, graph)
+
+                table = {}
+                for file_path in shard:
+                    file = self.files[file_path]
+                    table[str(file_path)] = {"hash": file.hash, "records": file_records(file),
+                                             "ids": [entity.id for entity in file.entities]}
+                store.put(i, table)
+
+                for file_path in shard:
+                    loaders[file_path] = partial(self.load_shard_file, store, i)
+                    self.files.unload(file_path, loaders[file_path])
+
+            self.index_libraries()
+
+            # Second pass, shard by shard
+            resolution = self.symbol_resolution
+            symbol_table = resolution.symbol_table()
+            with resolution.language_servers(path, files) as lsps:
+                for i, shard in enumerate(shards):
+                    logging.info(f"Resolving shard {i + 1}/{len(shards)} ({len(shard)} files)")
+                    for file_path in shard:
+                        load_symbols(self.files[file_path], store.get(i, file_path)["records"])
+
+                    with graph.writer() as writer:
+                        self.resolve_files(shard, path, lsps, symbol_table, writer)
+
+                    # Definition lookups are keyed by the requesting file, they aren't
+                    # shared across shards
+                    resolution.clear()
+
+                    for file_path in shard:
+                        for entity in self.files[file_path].entities:
+                            entity.symbols = {}
+
+                    if symbol_table is None:
+                        for file_path in list(self.files.keys()):
+                            # Dependencies aren't sharded, the referenced ones stay loaded
+                            if file_path in loaders:
+                                self.files.unload(file_path, loaders[file_path])
+
+        resolution.log_stats()
+
+    def analyze_local_folder(self, path: str, g: Graph, ignore: Optional[list[str]] = [], progressive: bool = False) -> None:
         """
         Analyze path.
 
         Args:
             path (str): Path to a local folder containing source files to process
             ignore (List(str)): List of paths to skip
+            progressive (bool): Return once the skeleton graph is published, symbols
+                of a new repository are then resolved in the background, see wait.
         """
 
         logging.info(f"Analyzing local folder {path}")
 
         # Analyze source files
-        self.analyze_sources(Path(path), ignore, g)
+        self.analyze_sources(Path(path), ignore, g, progressive)
+
+        summary = self.summary()
+        logging.info(f"Analysis summary: {len(summary['degraded'])} files degraded, {len(summary['skipped'])} skipped")
 
         logging.info("Done analyzing path")
 
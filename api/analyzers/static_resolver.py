@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import Optional
+
+from api.entities.entity import Entity, Symbol
+from api.entities.file import File
+from .analyzer import AbstractAnalyzer
+
+# Confidence of a static resolution, by how the definition was found
+IN_SCOPE  = 0.9  # defined by an enclosing entity, in languages with an implicit receiver
+QUALIFIED = 0.8  # a member of the qualifying type / module or of the scope's receiver
+SAME_FILE = 0.75 # defined in the same file, below HYBRID_CONFIDENCE
+IMPORTED  = 0.7  # the name, its type or its module is imported by the file
+GLOBAL    = 0.5  # anywhere in the repository
+
+def _parse_reference(text: str) -> Optional[tuple[Optional[str], str]]:
+    # 'a.b.c<T>' -> ('b', 'c'), qualifiers which aren't plain names,
+    # e.g. super().f, are reported as ''
+    parts = [part.strip() for part in text.split('<')[0].split('[')[0].split('.')]
+    name = parts[-1]
+    if not name.isidentifier():
+        return None
+    if len(parts) == 1:
+        return (None, name)
+    return (parts[-2] if parts[-2].isidentifier() else '', name)
+
+class SymbolTable():
+    """
+    Repository wide table of the entities found by the first pass, resolving
+    symbols by scoped name lookup instead of asking a language server.
+
+    Each resolution comes with a confidence score, lookups closer to the
+    symbol's scope are more reliable than repository wide ones, and a name
+    matching several definitions resolves to each of them, splitting the
+    confidence between them.
+    """
+
+    def __init__(self, files: dict[Path, File]) -> None:
+        """
+        Args:
+            files (dict[Path, File]): Every file of the repository.
+        """
+
+        self.names: dict[str, list[tuple[File, Entity]]] = {}
+        self.imports: dict[Path, set[str]] = {}
+        self.kinds: dict[tuple[str, Entity], bool] = {}
+
+        # In path order, the order files are discovered in, so ambiguous names
+        # resolve the same whichever order files were loaded in
+        for file_path, file in sorted(files.items(), key=lambda item: item[0]):
+            self.imports[file_path] = set(file.imports)
+            for entity in file.entities:
+                self.names.setdefault(entity.name, []).append((file, entity))
+
+    def _owner(self, entity: Entity) -> Optional[str]:
+        # Name of the entity defining an entity, None for top level entities
+        return entity.parent.name if isinstance(entity.parent, Entity) else None
+
+    def _accepts(self, analyzer: AbstractAnalyzer, key: str, file: File, entity: Entity) -> bool:
+        # Whether an entity is of the kind a symbol refers to, e.g. a type for base_class
+        if (key, entity) not in self.kinds:
+            self.kinds[(key, entity)] = analyzer.resolve_definition(key, file, entity.start_point) is entity
+        return self.kinds[(key, entity)]
+
+    def _references(self, symbol: Symbol) -> list[tuple[Optional[str], str]]:
+        reference = _parse_reference(symbol.reference)
+        if reference is not None:
+            return [reference]
+
+        # Parameter lists, resolve each parameter's type
+        references = [_parse_reference(type_name) for type_name in symbol.types]
+        return [reference for reference in references if reference is not None]
+
+    def resolve(self, analyzer: AbstractAnalyzer, file: File, entity: Entity, key: str, symbol: Symbol) -> list[tuple[Entity, float]]:
+        """
+        Resolve a symbol to the entities it refers to.
+
+        Args:
+            analyzer (AbstractAnalyzer): The analyzer of the symbol's language.
+            file (File): The file containing the symbol.
+            entity (Entity): The entity the symbol belongs to.
+            key (str): The symbol key.
+            symbol (Symbol): The symbol.
+
+        Returns:
+            list[tuple[Entity, float]]: The resolved entities and the confidence in each.
+        """
+
+        res = []
+        for qualifier, name in self._references(symbol):
+            # Symbols only refer to entities of their own language
+            candidates = [(f, e) for f, e in self.names.get(name, [])
+                          if f.path.suffix == file.path.suffix and self._accepts(analyzer, key, f, e)]
+            if len(candidates) == 0:
+                continue
+
+            tiers = []
+            if qualifier is None or qualifier in analyzer.scope_receivers:
+                scope = []
+                parent = entity
+                while isinstance(parent, Entity):
+                    scope.append(parent)
+                    parent = parent.parent
+                # Unqualified names only refer to members of enclosing entities
+                # in languages with an implicit receiver, e.g. Java's this
+                if analyzer.implicit_receiver:
+                    tiers.append((IN_SCOPE, [e for _, e in candidates if e.parent in scope]))
+                elif qualifier is not None:
+                    tiers.append((QUALIFIED, [e for _, e in candidates if e.parent in scope]))
+                # Without an implicit receiver methods are only reached through one
+                tiers.append((SAME_FILE, [e for f, e in candidates if f is file and
+                                          (analyzer.implicit_receiver or self._owner(e) is None)]))
+            else:
+                tiers.append((QUALIFIED, [e for f, e in candidates
+                                          if self._owner(e) == qualifier or f.path.stem == qualifier]))
+
+            imports = self.imports.get(file.path, set())
+            tiers.append((IMPORTED, [e for f, e in candidates if f is not file and
+                                     (name in imports or f.path.stem in imports or self._owner(e) in imports)]))
+            tiers.append((GLOBAL, [e for _, e in candidates]))
+
+            for confidence, matches in tiers:
+                if len(matches) > 0:
+                    res.extend((match, confidence / len(matches)) for match in matches)
+                    break
+
+        return res
@@ -0,0 +1,212 @@
+import logging
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional
+
+from api.entities.entity import Entity, Symbol
+from api.entities.file import File
+from multilspy import SyncLanguageServer
+
+from .analyzer import AbstractAnalyzer
+from .lsp_pool import lsp_pool
+from .records import LazyFiles
+from .resolver import DefinitionCache, DefinitionResolver
+from .static_resolver import SymbolTable
+
+# Number of files whose definition requests are pipelined together
+RESOLVE_CHUNK = 64
+
+# Symbol resolution modes:
+# lsp    - ask the language servers
+# static - look names up in the repository's symbol table, no language server
+# hybrid - static lookup first, the language servers only resolve symbols
+#          which aren't found with at least HYBRID_CONFIDENCE
+RESOLUTION_MODES = ['lsp', 'static', 'hybrid']
+HYBRID_CONFIDENCE = 0.8
+
+# Relationships created by resolving an entity's symbols
+RESOLVED_RELATIONS = ['CALLS', 'EXTENDS', 'IMPLEMENTS', 'PARAMETERS', 'RETURNS']
+
+class SymbolResolution():
+    """
+    Resolves the symbols of indexed files to the entities they refer to, in
+    one of RESOLUTION_MODES.
+
+    Definition lookups are memoized across resolutions, symbols whose
+    definition requests fail, e.g. as their language server is unavailable,
+    are resolved statically instead.
+    """
+
+    def __init__(self, analyzers: dict[str, AbstractAnalyzer], files: LazyFiles, mode: str,
+                 lsp_deadline: float, degraded: dict[Path, str], exclude: set[Path]) -> None:
+        """
+        Args:
+            analyzers (dict[str, AbstractAnalyzer]): Analyzers by extension.
+            files (LazyFiles): The analysis' files.
+            mode (str): The resolution mode, one of RESOLUTION_MODES.
+            lsp_deadline (float): Time in seconds the definition requests of a file may
+                take in a resolution batch, 0 for unbounded.
+            degraded (dict[Path, str]): Files exceeding the budget, and why.
+            exclude (set[Path]): Files left out of symbol tables, lazy dependencies
+                are only reached through language servers.
+        """
+
+        self.analyzers   = analyzers
+        self.files       = files
+        self.mode        = mode
+        self.degraded    = degraded
+        self.exclude     = exclude
+        self.resolver    = DefinitionResolver(deadline=lsp_deadline, restart=lsp_pool.restart)
+        self.definitions = DefinitionCache()
+
+        # Symbol table resolving symbols whose definition requests failed, built on demand
+        self.fallback: Optional[SymbolTable] = None
+        self.fallbacks = 0
+
+    def symbol_table(self) -> Optional[SymbolTable]:
+        """
+        Build the repository's symbol table, for static and hybrid resolution.
+
+        Returns:
+            Optional[SymbolTable]: The table, None when resolving through language servers only.
+        """
+
+        if self.mode == 'lsp':
+            return None
+
+        # Static lookups need every file of the repository
+        self.files.load_all(exclude=self.exclude)
+        return SymbolTable(self.files)
+
+    def language_servers(self, path: Path, files: list[Path]):
+        """
+        Acquire the language servers resolving files.
+
+        Args:
+            path (Path): The root of the analyzed folder.
+            files (list[Path]): The files to resolve.
+
+        Returns:
+            A context manager yielding the language server replicas by extension.
+        """
+
+        if self.mode == 'static':
+            return nullcontext({})
+
+        # Servers kept warm from a previous analysis need to re-read changed files
+        lsp_pool.notify(path, changed=files)
+
+        exts = sorted(set(file_path.suffix for file_path in files))
+        return lsp_pool.acquire(path, exts)
+
+    def resolve_symbols(self, files: list[Path], path: Path, lsps: dict[str, list[SyncLanguageServer]],
+                        symbol_table: Optional[SymbolTable] = None) -> None:
+        """
+        Resolve the symbols of files, pipelining the definition requests of
+        all the files to their language servers.
+
+        Args:
+            files (list[Path]): The files to resolve.
+            path (Path): The root of the analyzed folder.
+            lsps (dict[str, list[SyncLanguageServer]]): Language server replicas by extension.
+            symbol_table (SymbolTable, optional): The repository's symbol table, for static and hybrid resolution.
+        """
+
+        # Collect the symbols per language, requesting each definition lookup
+        # which isn't memoized yet once
+        pending: dict[str, list[tuple[File, Entity, str, Symbol, tuple, Optional[list]]]] = {}
+        requests: dict[str, dict[tuple, tuple[str, int, int]]] = {}
+        for file_path in files:
+            ext = file_path.suffix
+            analyzer = self.analyzers[ext]
+            ext_requests = requests.setdefault(ext, {})
+            file = self.files[file_path]
+            for entity in file.entities:
+                for key, symbols in entity.symbols.items():
+                    for symbol in symbols:
+                        resolved = None
+                        if symbol_table is not None:
+                            resolved = symbol_table.resolve(analyzer, file, entity, key, symbol)
+                            if self.mode == 'static' or \
+                               (len(resolved) > 0 and all(confidence >= HYBRID_CONFIDENCE for _, confidence in resolved)):
+                                for resolved_symbol, confidence in resolved:
+                                    symbol.add_resolve_symbol(resolved_symbol, confidence)
+                                continue
+
+                        definition_key = analyzer.get_definition_key(file_path, entity, key, symbol)
+                        pending.setdefault(ext, []).append((file, entity, key, symbol, definition_key, resolved))
+                        if definition_key in self.definitions or definition_key in ext_requests:
+                            self.definitions.hits += 1
+                            continue
+                        self.definitions.misses += 1
+                        ext_requests[definition_key] = (str(file_path), *symbol.point)
+
+        for ext, symbols in pending.items():
+            analyzer = self.analyzers[ext]
+            ext_requests = requests[ext]
+            locations = self.resolver.request_definitions(lsps[ext], list(ext_requests.values()))
+            # Failed requests aren't memoized, they're retried by later lookups
+            failed = set()
+            for definition_key, definition_locations in zip(ext_requests, locations):
+                if definition_locations is None:
+                    failed.add(definition_key)
+                else:
+                    self.definitions[definition_key] = definition_locations
+
+            for file_path in self.resolver.expired:
+                logging.warning(f"Definition requests of {file_path} exceeded their deadline")
+                self.degraded[Path(file_path)] = 'lsp deadline'
+            self.resolver.expired.clear()
+
+            for file, entity, key, symbol, definition_key, resolved in symbols:
+                if definition_key in failed:
+                    # The language server is unavailable, settle for a static resolution
+                    if resolved is None:
+                        resolved = self.fallback_table().resolve(analyzer, file, entity, key, symbol)
+                    for resolved_symbol, confidence in resolved:
+                        symbol.add_resolve_symbol(resolved_symbol, confidence)
+                    self.fallbacks += 1
+                    continue
+
+                for resolved_symbol in analyzer.resolve_locations(self.files, path, key, self.definitions[definition_key]):
+                    symbol.add_resolve_symbol(resolved_symbol)
+
+    def fallback_table(self) -> SymbolTable:
+        """
+        Get the symbol table resolving symbols whose definition requests failed,
+        building it on first use.
+
+        Returns:
+            SymbolTable: The table.
+        """
+
+        if self.fallback is None:
+            logging.warning("Language server unavailable, falling back to static resolution")
+            self.files.load_all(exclude=self.exclude)
+            self.fallback = SymbolTable(self.files)
+        return self.fallback
+
+    def invalidate(self, files: list[Path]) -> None:
+        """
+        Drop the definition lookups made from files, and the fallback table,
+        e.g. once the files are modified.
+
+        Args:
+            files (list[Path]): The files.
+        """
+
+        self.definitions.invalidate(files)
+        self.fallback = None
+
+    def clear(self) -> None:
+        """
+        Drop every definition lookup and the fallback table.
+        """
+
+        self.definitions.clear()
+        self.fallback = None
+
+    def log_stats(self) -> None:
+        logging.info(f'Definition lookups: {self.definitions.hits} hits, {self.definitions.misses} misses')
+        logging.info(f'Definition requests: {self.resolver.timeouts} timeouts, {self.resolver.failures} failures, '
+                     f'{self.resolver.restarts} server restarts, {self.fallbacks} static fallbacks')
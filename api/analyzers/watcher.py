@@ -0,0 +1,335 @@
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+from contextlib import ExitStack
+
+from ..graph import Graph
+from .discovery import SKIPPED_DIRS, is_source_file, open_repository
+from .lsp_pool import lsp_pool
+from .source_analyzer import SourceAnalyzer
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR       = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+             IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct('iIII')
+
+# A burst of changes lasting longer than MAX_DELAY seconds is applied in parts
+MAX_DELAY = 2
+
+# How often, in seconds, an idle watch checks whether it was stopped
+POLL_INTERVAL = 0.5
+
+_libc = None
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("Watching folders requires inotify")
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _libc = libc
+    return _libc
+
+class FolderWatcher():
+    """
+    Keeps the graph of an analyzed local folder current as its files change.
+
+    Every directory of the folder is watched through inotify. Bursts of
+    changes are debounced, once the folder has been quiet for `debounce`
+    seconds deleted files are removed from the graph and the entities of
+    changed ones are diffed against it. The folder's language servers are held
+    for as long as the watch runs so they're kept warm.
+    """
+
+    def __init__(self, path: Path, graph: Graph, analyzer: SourceAnalyzer,
+                 ignore: list[str] = [], debounce: Optional[float] = None) -> None:
+        """
+        Args:
+            path (Path): The folder's root, already analyzed into graph.
+            graph (Graph): The folder's graph.
+            analyzer (SourceAnalyzer): The analyzer which analyzed the folder.
+            ignore (list[str]): Paths to skip, as passed to the analysis.
+            debounce (float, optional): Quiet period in seconds before changes are applied,
+                defaults to the CODE_GRAPH_WATCH_DEBOUNCE environment variable (0.2).
+        """
+
+        self.path     = path.resolve()
+        self.graph    = graph
+        self.analyzer = analyzer
+        self.ignore   = ignore
+        self.repo     = open_repository(self.path)
+        self.debounce = debounce if debounce is not None else float(os.getenv('CODE_GRAPH_WATCH_DEBOUNCE', 0.2))
+
+        self.fd = _inotify().inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Failed initializing inotify")
+
+        # Watched directories by watch descriptor
+        self.watches: dict[int, Path] = {}
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start watching, in a background thread.
+        """
+
+        self.add_watches(self.path)
+        self.thread = threading.Thread(target=self._run, name=f"watch {self.path.name}", daemon=True)
+        self.thread.start()
+
+        logging.info(f"Watching {len(self.watches)} directories of {self.path}")
+
+    def stop(self) -> None:
+        """
+        Stop watching, changes pending when stopped are dropped.
+        """
+
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def _is_skipped_dir(self, directory: Path) -> bool:
+        if directory.name in SKIPPED_DIRS or directory.name.endswith('.egg-info'):
+            return True
+        if (directory / 'pyvenv.cfg').is_file():
+            return True
+        return any(i in str(directory) + '/' for i in self.ignore)
+
+    def add_watches(self, directory: Path) -> list[Path]:
+        """
+        Watch a directory and its sub directories.
+
+        Args:
+            directory (Path): The directory.
+
+        Returns:
+            list[Path]: The files found in the newly watched directories.
+        """
+
+        files = []
+        libc = _inotify()
+        for root, dirs, names in os.walk(directory):
+            root_path = Path(root)
+            if root_path != self.path and self._is_skipped_dir(root_path):
+                dirs[:] = []
+                continue
+
+            wd = libc.inotify_add_watch(self.fd, root.encode('utf-8'), WATCH_MASK)
+            if wd < 0:
+                logging.warning(f"Failed watching {root}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self.watches[wd] = root_path
+            files += [root_path / name for name in names]
+        return files
+
+    def remove_watches(self, directory: Path) -> None:
+        """
+        Stop watching a directory and its sub directories, e.g. once moved out of the folder.
+        """
+
+        libc = _inotify()
+        for wd, watched in list(self.watches.items()):
+            if watched == directory or directory in watched.parents:
+                libc.inotify_rm_watch(self.fd, wd)
+                self.watches.pop(wd, None)
+
+    def read_events(self) -> list[tuple[Path, int]]:
+        """
+        Read the pending events.
+
+        Returns:
+            list[tuple[Path, int]]: The path of each event and its mask.
+        """
+
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='surrogateescape')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append((self.path, mask))
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            events.append((directory / name if name else directory, mask))
+        return events
+
+    def apply(self, changed: set[Path], removed: set[Path]) -> None:
+        """
+        Bring the graph up to date with changed files.
+
+        Args:
+            changed (set[Path]): Created, modified and deleted files.
+            removed (set[Path]): Deleted directories, or directories moved out of the folder.
+        """
+
+        start = time.monotonic()
+
+        # Files of removed directories only show up in the graph
+        if len(removed) > 0:
+            for file_path in self.graph.get_file_hashes():
+                file_path = Path(file_path)
+                if any(directory in file_path.parents for directory in removed) and not file_path.exists():
+                    changed.add(file_path)
+
+        exts = self.analyzer.supported_types()
+        files = sorted(file_path for file_path in changed if is_source_file(self.path, self.repo, file_path, exts, self.ignore))
+        if len(files) == 0:
+            return
+
+        existing = [file_path for file_path in files if file_path.is_file()]
+        deleted = [file_path for file_path in files if not file_path.is_file()]
+        if len(deleted) > 0:
+            self.analyzer.delete_files(deleted, self.path, self.graph)
+        # Modified files are diffed against the graph, keeping their unchanged
+        # entities, files depending on changed entities are resolved again
+        self.analyzer.analyze_files(existing, self.path, self.graph)
+
+        logging.info(f"Updated {len(existing)} and removed {len(files) - len(existing)} files "
+                     f"of {self.path} in {time.monotonic() - start:.2f}s")
+
+    def _run(self) -> None:
+        try:
+            # Symbols of a progressive analysis are resolved before applying changes
+            self.analyzer.wait()
+
+            with ExitStack() as stack:
+                # Keep the folder's language servers from going idle
+                if self.analyzer.resolution != 'static':
+                    exts = sorted(set(Path(file_path).suffix for file_path in self.graph.get_file_hashes()))
+                    stack.enter_context(lsp_pool.acquire(self.path, exts))
+
+                self._watch()
+        except Exception as e:
+            logging.error(f"Watching {self.path} failed: {e}")
+        finally:
+            os.close(self.fd)
+
+    def _watch(self) -> None:
+        changed: set[Path] = set()
+        removed: set[Path] = set()
+        overflow = False
+        first = last = 0.0
+
+        while not self.stopped.is_set():
+            timeout = POLL_INTERVAL
+            if len(changed) > 0 or len(removed) > 0 or overflow:
+                timeout = max(0, min(last + self.debounce, first + MAX_DELAY) - time.monotonic())
+
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if len(ready) > 0:
+                now = time.monotonic()
+                for event_path, mask in self.read_events():
+                    if mask & IN_Q_OVERFLOW:
+                        overflow = True
+                    elif mask & IN_DELETE_SELF:
+                        if event_path == self.path:
+                            logging.warning(f"Watched folder {self.path} was removed")
+                            return
+                    elif mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            changed.update(self.add_watches(event_path))
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            self.remove_watches(event_path)
+                            removed.add(event_path)
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM):
+                        changed.add(event_path)
+                    else:
+                        continue
+                    if first == 0:
+                        first = now
+                    last = now
+                continue
+
+            if len(changed) == 0 and len(removed) == 0 and not overflow:
+                continue
+
+            try:
+                if overflow:
+                    # Events were lost, compare the whole folder against the graph,
+                    # the folder's dependencies were loaded by its analysis
+                    logging.warning(f"Watch of {self.path} overflowed, re-analyzing changes")
+                    self.analyzer.analyze_sources(self.path, self.ignore, self.graph, dependencies=False)
+                else:
+                    self.apply(changed, removed)
+            except Exception as e:
+                logging.error(f"Failed updating the graph of {self.path}: {e}")
+
+            changed, removed, overflow = set(), set(), False
+            first = last = 0.0
+
+# Running watches by folder
+watchers: dict[str, FolderWatcher] = {}
+watchers_lock = threading.Lock()
+
+def watch_folder(path: Path, graph: Graph, analyzer: SourceAnalyzer, ignore: list[str] = []) -> FolderWatcher:
+    """
+    Start watching an analyzed folder, replacing a previous watch of it.
+
+    Args:
+        path (Path): The folder's root.
+        graph (Graph): The folder's graph.
+        analyzer (SourceAnalyzer): The analyzer which analyzed the folder.
+        ignore (list[str]): Paths to skip, as passed to the analysis.
+
+    Returns:
+        FolderWatcher: The running watch.
+    """
+
+    unwatch_folder(path)
+
+    watcher = FolderWatcher(path, graph, analyzer, ignore)
+    with watchers_lock:
+        watchers[str(watcher.path)] = watcher
+    watcher.start()
+    return watcher
+
+def unwatch_folder(path: Path) -> bool:
+    """
+    Stop watching a folder.
+
+    Args:
+        path (Path): The folder's root.
+
+    Returns:
+        bool: True if the folder was watched.
+    """
+
+    with watchers_lock:
+        watcher = watchers.pop(str(path.resolve()), None)
+    if watcher is None:
+        return False
+    watcher.stop()
+    return True
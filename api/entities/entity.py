@@ -1,31 +1,76 @@
-from typing import Callable, Self
-from tree_sitter import Node
+from typing import Optional, Self
 
 class Symbol:
-    def __init__(self, symbol: Node):
-        self.symbol = symbol
+    """
+    A reference made by an entity, e.g. a call or a base class.
+
+    Holds plain values only, so a file's AST can be released once its
+    symbols are extracted.
+    """
+
+    __slots__ = ('line', 'text', 'point', 'reference', 'types', 'resolved_symbol', 'confidence')
+
+    def __init__(self, line: int, text: str, point: tuple[int, int], reference: str, types: list[str]):
+        """
+        Args:
+            line (int): The symbol's first row.
+            text (str): The symbol's source text.
+            point (tuple[int, int]): Position of the referenced name, where its definition is looked up.
+            reference (str): Source text up to the end of the referenced name, e.g. 'self.log'.
+            types (list[str]): Types of the parameters, for parameter lists.
+        """
+
+        self.line = line
+        self.text = text
+        self.point = point
+        self.reference = reference
+        self.types = types
         self.resolved_symbol = set()
+        self.confidence: Optional[float] = None
 
-    def add_resolve_symbol(self, resolved_symbol):
+    def add_resolve_symbol(self, resolved_symbol, confidence: Optional[float] = None):
         self.resolved_symbol.add(resolved_symbol)
+        if confidence is not None:
+            self.confidence = confidence if self.confidence is None else min(self.confidence, confidence)
 
 class Entity:
-    def __init__(self, node: Node):
-        self.node = node
+    """
+    A declaration, e.g. a class or a function, its span and the symbols it references.
+    """
+
+    __slots__ = ('type', 'label', 'name', 'start_byte', 'end_byte', 'start_point', 'end_point',
+                 'parent', 'children', 'symbols', 'id')
+
+    def __init__(self, type: str, label: str, name: str, start_byte: int, end_byte: int,
+                 start_point: tuple[int, int], end_point: tuple[int, int]):
+        """
+        Args:
+            type (str): The declaration's node type.
+            label (str): The entity's graph label.
+            name (str): The entity's name.
+            start_byte (int): Start of the declaration.
+            end_byte (int): End of the declaration.
+            start_point (tuple[int, int]): (row, column) start of the declaration.
+            end_point (tuple[int, int]): (row, column) end of the declaration.
+        """
+
+        self.type = type
+        self.label = label
+        self.name = name
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.start_point = start_point
+        self.end_point = end_point
+        self.parent = None
+        self.children: list[Self] = []
         self.symbols: dict[str, list[Symbol]] = {}
-        self.children: dict[Node, Self] = {}
+        self.id: Optional[int] = None
 
-    def add_symbol(self, key: str, symbol: Node):
+    def add_symbol(self, key: str, symbol: Symbol):
         if key not in self.symbols:
             self.symbols[key] = []
-        self.symbols[key].append(Symbol(symbol))
+        self.symbols[key].append(symbol)
 
     def add_child(self, child: Self):
         child.parent = self
-        self.children[child.node] = child
-
-    def resolved_symbol(self, f: Callable[[str, Node], list[Self]]):
-        for key, symbols in self.symbols.items():
-            for symbol in symbols:
-                for resolved_symbol in f(key, symbol.symbol):
-                    symbol.add_resolve_symbol(resolved_symbol)
\ No newline at end of file
+        self.children.append(child)
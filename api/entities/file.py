@@ -1,30 +1,93 @@
+from bisect import bisect_right
 from pathlib import Path
-from tree_sitter import Node, Tree
+from typing import Optional
+from tree_sitter import Tree
 
 from api.entities.entity import Entity
 
 
+class EntityIndex:
+    """
+    Sorted interval index over a file's entities.
+
+    Entities are ordered by their start position, a position maps to its
+    innermost enclosing entity by binary search followed by a walk up the
+    (few) entities enclosing the candidate.
+    """
+
+    def __init__(self, entities: list[Entity]) -> None:
+        """
+        Args:
+            entities (list[Entity]): The file's entities.
+        """
+
+        # Enclosing entities come before the ones they contain
+        self.entities = sorted(entities, key=lambda entity: (entity.start_byte, -entity.end_byte))
+
+        positions    = {id(entity): i for i, entity in enumerate(self.entities)}
+        self.starts  = [entity.start_point for entity in self.entities]
+        self.ends    = [entity.end_point for entity in self.entities]
+        self.types   = [entity.type for entity in self.entities]
+        self.parents = [positions.get(id(entity.parent), -1) for entity in self.entities]
+
+    def find_entity(self, point: tuple[int, int], types: list[str]) -> Optional[Entity]:
+        """
+        Find the innermost entity of the given types enclosing a position.
+
+        Args:
+            point (tuple[int, int]): The (row, column) position.
+            types (list[str]): The accepted entity node types.
+
+        Returns:
+            Optional[Entity]: The entity, None if no such entity encloses the position.
+        """
+
+        i = bisect_right(self.starts, tuple(point)) - 1
+        while i != -1:
+            if point < self.ends[i] and self.types[i] in types:
+                return self.entities[i]
+            i = self.parents[i]
+        return None
+
+
 class File:
     """
     Represents a file with basic properties like path, name, and extension.
+
+    The file's AST is only kept while its entities are extracted.
     """
 
-    def __init__(self, path: Path, tree: Tree) -> None:
+    __slots__ = ('path', 'tree', 'hash', 'entities', 'imports', 'index', 'id')
+
+    def __init__(self, path: Path, tree: Optional[Tree]) -> None:
         """
         Initialize a File object.
 
         Args:
             path (Path): The full path to the file.
-            tree (Tree): The parsed AST of the file content.
+            tree (Tree, optional): The parsed AST of the file content.
         """
 
         self.path = path
         self.tree = tree
-        self.entities: dict[Node, Entity] = {}
+        self.hash: Optional[str] = None
+        self.entities: list[Entity] = []
+        self.imports: list[str] = []
+        self.id: Optional[int] = None
+
+        # Files which are never indexed, e.g. degraded ones, resolve nothing
+        self.index = EntityIndex(self.entities)
 
     def add_entity(self, entity: Entity):
         entity.parent = self
-        self.entities[entity.node] = entity
+        self.entities.append(entity)
+
+    def index_entities(self) -> None:
+        """
+        Build the file's entity index, once all its entities were added.
+        """
+
+        self.index = EntityIndex(self.entities)
 
     def __str__(self) -> str:
         return f"path: {self.path}"
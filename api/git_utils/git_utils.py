@@ -6,7 +6,7 @@ from ..info import *
 from pygit2.repository import Repository
 from pygit2.enums import DeltaStatus, CheckoutStrategy
 from pathlib import Path
-from ..graph import Graph
+from ..graph import Graph, graph_exists
 from .git_graph import GitGraph
 from typing import List, Optional
 from ..analyzers import SourceAnalyzer
@@ -70,7 +70,8 @@ def classify_changes(
     return added, deleted, modified
 
 # build a graph capturing the git commit history
-def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, ignore_list: Optional[List[str]] = None) -> GitGraph:
+def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, ignore_list: Optional[List[str]] = None,
+                       checkpoint: bool = False) -> GitGraph:
     """
     Builds a graph representation of the git commit history.
 
@@ -78,6 +79,8 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
         path (str): Path to the git repository.
         repo_name (str): Name of the repository.
         ignore_list (List[str], optional): List of file patterns to ignore.
+        checkpoint (bool): Checkpoint processed commits in the repository's ingestion job,
+            a resumed job continues from the temporary graph left by the interrupted one.
 
     Returns:
         GitGraph: Graph object representing the commit history.
@@ -86,10 +89,21 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
     if ignore_list is None:
         ignore_list = []
 
-    # Copy the graph into a temporary graph
-    logging.info("Cloning source graph %s -> %s_tmp", repo_name, repo_name)
-    # Will be deleted at the end of this function
-    g = Graph(repo_name).clone(repo_name + "_tmp")
+    # Transitions computed by an interrupted job, the temporary graph
+    # holds the state it reached
+    processed = get_checkpoints(repo_name, 'commits') if checkpoint else set()
+    if len(processed) > 0 and graph_exists(repo_name + "_tmp"):
+        logging.info("Resuming from %d processed commits", len(processed))
+        g = Graph(repo_name + "_tmp")
+    else:
+        processed = set()
+        if checkpoint and graph_exists(repo_name + "_tmp"):
+            Graph(repo_name + "_tmp").delete()
+
+        # Copy the graph into a temporary graph
+        logging.info("Cloning source graph %s -> %s_tmp", repo_name, repo_name)
+        # Will be deleted at the end of this function
+        g = Graph(repo_name).clone(repo_name + "_tmp")
     g.enable_backlog()
 
     git_graph       = GitGraph(GitRepoName(repo_name))
@@ -97,7 +111,7 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
 
     # Initialize with the current commit
     # Save current git for later restoration
-    repo = Repository('.')
+    repo = Repository(str(path))
     current_commit = repo.walk(repo.head.target).__next__()
     current_commit_hexsha = current_commit.short_id
 
@@ -110,10 +124,22 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
 
     logging.info("Computing transition queries moving backwards")
 
+    # Files changed by the steps of an interrupted job, the analyzer
+    # only knows their version at the current commit
+    skipped = set()
+
     child_commit = current_commit
     while len(child_commit.parents) > 0:
         parent_commit = child_commit.parents[0]
 
+        # Already processed by an interrupted job
+        if f"parent:{parent_commit.short_id}" in processed:
+            diff = repo.diff(child_commit, parent_commit)
+            for files in classify_changes(diff, repo, supported_types, ignore_list):
+                skipped.update(files)
+            child_commit = parent_commit
+            continue
+
         # add commit to the git graph
         git_graph.add_commit(parent_commit)
 
@@ -140,20 +166,27 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
         logging.info(f"Checking out commit: {parent_commit.short_id}")
         repo.checkout_tree(parent_commit.tree, strategy=CheckoutStrategy.FORCE)
 
+        # The temporary graph is at the commit the interrupted job reached
+        if len(skipped) > 0:
+            analyzer.reload_files(g, sorted(skipped))
+            skipped = set()
+
         #-----------------------------------------------------------------------
         # Apply changes going backwards
         #-----------------------------------------------------------------------
 
         # apply deletions
 
-        # reating modified files as both deleted and added
         # remove deleted files from the graph
-        if len(deleted + modified) > 0:
-            logging.info(f"Removing deleted files: {deleted + modified}")
-            g.delete_files(deleted + modified)
-
-        if len(added + modified) > 0:
-            logging.info(f"Introducing a new filed: {added + modified}")
+        if len(deleted) > 0:
+            logging.info(f"Removing deleted files: {deleted}")
+            analyzer.delete_files(deleted, Path(path), g)
+
+        # modified files are diffed against the graph, only their changed
+        # entities are deleted, updated or created, and files depending on
+        # changed entities are resolved again
+        if len(added + deleted + modified) > 0:
+            logging.info(f"Introducing new and modified files: {added + modified}")
             analyzer.analyze_files(added + modified, Path(path), g)
 
         queries, params = g.clear_backlog()
@@ -176,6 +209,12 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
 
             git_graph.set_parent_transition(child_commit.short_id,
                                             parent_commit.short_id, queries, params)
+
+        # A step interrupted midway is redone from scratch, its deletions
+        # and additions are idempotent
+        if checkpoint:
+            add_checkpoints(repo_name, 'commits', [f"parent:{parent_commit.short_id}"])
+
         # advance to the next commit
         child_commit = parent_commit
 
@@ -189,6 +228,14 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
         child_commit = git_graph.get_child_commit(parent_commit.short_id)
         child_commit = repo.walk(child_commit['hash']).__next__()
 
+        # Already processed by an interrupted job
+        if f"child:{child_commit.short_id}" in processed:
+            diff = repo.diff(parent_commit, child_commit)
+            for files in classify_changes(diff, repo, supported_types, ignore_list):
+                skipped.update(files)
+            parent_commit = child_commit
+            continue
+
         # Represents the changes going forward
         # e.g. which files need to be deleted when moving forward one commit
 
@@ -204,20 +251,26 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
         logging.info(f"Checking out commit: {child_commit.short_id}")
         repo.checkout_tree(child_commit.tree, strategy=CheckoutStrategy.FORCE)
 
+        if len(skipped) > 0:
+            analyzer.reload_files(g, sorted(skipped))
+            skipped = set()
+
         #-----------------------------------------------------------------------
         # Apply changes going forward
         #-----------------------------------------------------------------------
 
         # apply deletions
 
-        # reating modified files as both deleted and added
         # remove deleted files from the graph
-        if len(deleted + modified) > 0:
-            logging.info(f"Removing deleted files: {deleted + modified}")
-            g.delete_files(deleted + modified)
-
-        if len(added + modified) > 0:
-            logging.info(f"Introducing a new files: {added + modified}")
+        if len(deleted) > 0:
+            logging.info(f"Removing deleted files: {deleted}")
+            analyzer.delete_files(deleted, Path(path), g)
+
+        # modified files are diffed against the graph, only their changed
+        # entities are deleted, updated or created, and files depending on
+        # changed entities are resolved again
+        if len(added + deleted + modified) > 0:
+            logging.info(f"Introducing new and modified files: {added + modified}")
             analyzer.analyze_files(added + modified, Path(path), g)
 
         queries, params = g.clear_backlog()
@@ -240,6 +293,10 @@ def build_commit_graph(path: str, analyzer: SourceAnalyzer, repo_name: str, igno
 
             git_graph.set_child_transition(child_commit.short_id,
                                             parent_commit.short_id, queries, params)
+
+        if checkpoint:
+            add_checkpoints(repo_name, 'commits', [f"child:{child_commit.short_id}"])
+
         # advance to the child_commit
         parent_commit = child_commit
 
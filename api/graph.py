@@ -1,7 +1,10 @@
 import os
 import time
+import queue
+import threading
 from .entities import *
-from typing import Optional
+from .info import add_checkpoints
+from typing import Any, Optional
 from falkordb import FalkorDB, Path, Node, QueryResult
 
 # Configure the logger
@@ -9,6 +12,16 @@ import logging
 logging.basicConfig(level=logging.DEBUG,
                     format='%(filename)s - %(asctime)s - %(levelname)s - %(message)s')
 
+# Shared dependency library graphs are named LIBRARY_PREFIX + library,
+# e.g. 'lib:python:requests-2.32.3'
+LIBRARY_PREFIX = 'lib:'
+
+# Maximum number of stubs find_paths follows into their library graphs
+STUB_EXPANSION_LIMIT = 1000
+
+def library_graph_name(library: str) -> str:
+    return f"{LIBRARY_PREFIX}{library}"
+
 def graph_exists(name: str):
     db = FalkorDB(host=os.getenv('FALKORDB_HOST', 'localhost'),
                   port=os.getenv('FALKORDB_PORT', 6379),
@@ -28,7 +41,7 @@ def get_repos() -> list[str]:
                   password=os.getenv('FALKORDB_PASSWORD', None))
 
     graphs = db.list_graphs()
-    graphs = [g for g in graphs if not (g.endswith('_git') or g.endswith('_schema'))]
+    graphs = [g for g in graphs if not (g.endswith('_git') or g.endswith('_schema') or g.startswith(LIBRARY_PREFIX))]
     return graphs
 
 class Graph():
@@ -61,6 +74,24 @@ class Graph():
         except Exception:
             pass
 
+    def writer(self, batch_size: Optional[int] = None, background: bool = False) -> "GraphWriter":
+        """
+        Create a buffered writer for bulk ingestion into this graph.
+
+        Args:
+            batch_size (int, optional): Number of pending writes which triggers a flush,
+                defaults to the CODE_GRAPH_BATCH_SIZE environment variable (1000).
+            background (bool): Write batches from a dedicated thread.
+
+        Returns:
+            GraphWriter: A writer, use it as a context manager to flush on exit.
+        """
+
+        if batch_size is None:
+            batch_size = int(os.getenv('CODE_GRAPH_BATCH_SIZE', 1000))
+
+        return GraphWriter(self, batch_size, background)
+
     def clone(self, clone: str) -> "Graph":
         """
         Create a copy of the graph under the name clone
@@ -234,12 +265,179 @@ class Graph():
                 neighbors['nodes'].append(encode_node(destination_node))
                 neighbors['edges'].append(encode_edge(edge))
 
+            # Neighbors of stubs live in their library graphs
+            nodes, edges = self.expand_stubs(node_ids, rel, lbl)
+            neighbors['nodes'] += nodes
+            neighbors['edges'] += edges
+
             return neighbors
 
         except Exception as e:
             logging.error(f"Error fetching neighbors for node {node_ids}: {e}")
             return {'nodes': [], 'edges': []}
 
+    def get_node_paths(self, node_ids: list[int]) -> list[str]:
+        """
+        Get the paths of the files defining the given nodes.
+
+        Args:
+            node_ids (List[int]): The IDs of the nodes.
+
+        Returns:
+            list[str]: The distinct paths.
+        """
+
+        q = """MATCH (n)
+               WHERE ID(n) IN $node_ids AND n.path IS NOT NULL
+               RETURN DISTINCT n.path"""
+
+        res = self._query(q, {'node_ids': node_ids}).result_set
+        return [row[0] for row in res]
+
+    def encode_library_nodes(self, library: str, nodes: list[Node]) -> dict[int, dict]:
+        """
+        Encode nodes read from a shared library graph.
+
+        Nodes which have a stub in this graph are encoded as their stub, others
+        keep their ID in the library graph and carry the library graph's name
+        (library), their neighbors are fetched from that graph.
+
+        Args:
+            library (str): The library graph's name.
+            nodes (list[Node]): The library graph's nodes.
+
+        Returns:
+            dict[int, dict]: The encoded nodes by their library graph ID.
+        """
+
+        q = """MATCH (s:Stub)
+               WHERE s.library = $library AND s.ref_id IN $ref_ids
+               RETURN s"""
+
+        ref_ids = list({node.id for node in nodes})
+        stubs = {row[0].properties['ref_id']: row[0] for row in self._query(q, {'library': library, 'ref_ids': ref_ids}).result_set}
+
+        res = {}
+        for node in nodes:
+            if node.id in res:
+                continue
+            if node.id in stubs:
+                res[node.id] = encode_node(stubs[node.id])
+            else:
+                node.properties['library'] = library
+                res[node.id] = encode_node(node)
+        return res
+
+    def expand_stubs(self, node_ids: list[int], rel: Optional[str] = None, lbl: Optional[str] = None) -> tuple[list[dict], list[dict]]:
+        """
+        Read the neighbors of stub nodes from their shared library graphs,
+        neither graph is modified.
+
+        Stubs stand for entities of a shared library graph, they hold the
+        library graph's name (library) and the entity's ID in it (ref_id).
+
+        Args:
+            node_ids (List[int]): The IDs of the nodes to expand, nodes which aren't stubs are ignored.
+            rel (str, optional): The type of relationship to follow. Defaults to None.
+            lbl (str, optional): The label of the neighbors to read. Defaults to None.
+
+        Returns:
+            tuple[list[dict], list[dict]]: The encoded neighbors, see encode_library_nodes,
+                and the edges connecting the stubs to them.
+        """
+
+        q = """MATCH (s:Stub)
+               WHERE ID(s) IN $node_ids
+               RETURN ID(s), s.library, s.ref_id"""
+
+        libraries: dict[str, dict[int, int]] = {}
+        for stub_id, library, ref_id in self._query(q, {'node_ids': node_ids}).result_set:
+            libraries.setdefault(library, {})[ref_id] = stub_id
+
+        rel_query = f":{rel}" if rel else ""
+        lbl_query = f":{lbl}" if lbl else ""
+
+        nodes, edges = [], []
+        for library, stubs in libraries.items():
+            q = f"""MATCH (n)-[e{rel_query}]->(dest{lbl_query})
+                    WHERE ID(n) IN $ref_ids AND NOT dest:File
+                    RETURN ID(n), e, dest"""
+
+            result_set = self.db.select_graph(library).ro_query(q, {'ref_ids': list(stubs)}).result_set
+            encoded = self.encode_library_nodes(library, [dest for _, _, dest in result_set])
+
+            for ref_id, edge, dest in result_set:
+                node = encoded[dest.id]
+                edge = encode_edge(edge)
+                edge['src_node'] = stubs[ref_id]
+                edge['dest_node'] = node['id']
+                nodes.append(node)
+                edges.append(edge)
+
+        return nodes, edges
+
+    def find_library_paths(self, src: int, dest: int) -> list[list[dict]]:
+        """
+        Find the CALLS paths from src into a library entity, dest, which go
+        through the library's graph: a path to one of the library's stubs in
+        this graph followed by a path within the library graph.
+
+        Args:
+            src (int): The ID of the source node.
+            dest (int): The ID of the destination stub.
+
+        Returns:
+            list[list[dict]]: The encoded paths.
+        """
+
+        q = """MATCH (dest:Stub)
+               WHERE ID(dest) = $dest_id
+               RETURN dest.library, dest.ref_id"""
+
+        result_set = self._query(q, {'dest_id': dest}).result_set
+        if len(result_set) == 0:
+            return []
+        library, dest_ref = result_set[0]
+
+        # Stubs of the library reachable from src, within STUB_EXPANSION_LIMIT
+        q = """MATCH (src)-[:CALLS*]->(s:Stub)
+               WHERE ID(src) = $src_id AND s.library = $library AND ID(s) <> $dest_id
+               RETURN DISTINCT ID(s), s.ref_id
+               LIMIT $limit"""
+
+        params = {'src_id': src, 'dest_id': dest, 'library': library, 'limit': STUB_EXPANSION_LIMIT}
+        stubs = {ref_id: stub_id for stub_id, ref_id in self._query(q, params).result_set}
+        if len(stubs) == 0:
+            return []
+
+        q = """MATCH p = (n)-[:CALLS*]->(dest)
+               WHERE ID(n) IN $ref_ids AND ID(dest) = $dest_ref
+               RETURN p"""
+
+        library_paths = self.db.select_graph(library).ro_query(q, {'ref_ids': list(stubs), 'dest_ref': dest_ref}).result_set
+        if len(library_paths) == 0:
+            return []
+
+        encoded = self.encode_library_nodes(library, [n for row in library_paths for n in row[0].nodes()])
+
+        paths = []
+        for row in library_paths:
+            p = row[0]
+            nodes = p.nodes()
+
+            # Continue each path leading to the library path's first stub
+            tail = []
+            for prev, n, e in zip(nodes, nodes[1:], p.edges()):
+                edge = encode_edge(e)
+                edge['src_node'] = encoded[prev.id]['id']
+                edge['dest_node'] = encoded[n.id]['id']
+                tail.append(edge)
+                tail.append(encoded[n.id])
+            for head in self.find_paths(src, stubs[nodes[0].id], libraries=False):
+                paths.append(head + tail)
+
+        return paths
+
     def add_entity(self, label: str, name: str, doc: str, path: str, src_start: int, src_end: int, props: dict) -> int:
         """
         Adds a node to the graph database.
@@ -425,6 +623,125 @@ class Graph():
 
         return None
 
+    def get_file_hashes(self) -> dict[str, Optional[str]]:
+        """
+        Get the manifest of analyzed files.
+
+        Returns:
+            dict[str, Optional[str]]: The content hash of every file by path,
+            None for files indexed without a hash.
+        """
+
+        q = """MATCH (f:File)
+               RETURN f.path, f.hash"""
+
+        return {path: hash for path, hash in self._query(q).result_set}
+
+    def get_file_entities(self, path: str) -> dict[tuple[str, str, int, int], int]:
+        """
+        Get the IDs of the entities defined by a file.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            dict[tuple[str, str, int, int]: int]: Entity IDs keyed by
+            (label, name, src_start, src_end).
+        """
+
+        q = """MATCH (f:File {path: $path})-[:DEFINES*]->(e)
+               RETURN [l IN labels(e) WHERE l <> 'Searchable'][0], e.name, e.src_start, e.src_end, ID(e)"""
+
+        res = self._query(q, {'path': path}).result_set
+        return {(label, name, src_start, src_end): id for label, name, src_start, src_end, id in res}
+
+    def get_file_definitions(self, path: str) -> list[tuple[int, str, list[str], Optional[str], int, int, Optional[str]]]:
+        """
+        Get the entities defined by a file, to match them against
+        the entities of the file's new version.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            list[tuple[int, str, list[str], Optional[str], int, int, Optional[str]]]:
+            The ID, label, qualified name, signature, src_start, src_end and doc of
+            each entity, ordered by position. The qualified name lists the names of
+            the entity's enclosing entities followed by its own.
+        """
+
+        q = """MATCH p = (f:File {path: $path})-[:DEFINES*]->(e)
+               RETURN ID(e), [l IN labels(e) WHERE l <> 'Searchable'][0], [n IN tail(nodes(p)) | n.name],
+                      e.signature, e.src_start, e.src_end, e.doc
+               ORDER BY e.src_start, length(p)"""
+
+        return [tuple(row) for row in self._query(q, {'path': path}).result_set]
+
+    def update_entities(self, entities: list[dict]) -> None:
+        """
+        Update the position, docstring and signature of existing entities.
+
+        Args:
+            entities (list[dict]): The 'id', 'src_start', 'src_end', 'doc' and 'signature' of each entity.
+        """
+
+        q = """UNWIND $entities AS entity
+               MATCH (e) WHERE ID(e) = entity['id']
+               SET e.src_start = entity['src_start'], e.src_end = entity['src_end'],
+                   e.doc = entity['doc'], e.signature = entity['signature']"""
+
+        self._query(q, {'entities': entities})
+
+    def delete_entities(self, ids: list[int]) -> None:
+        """
+        Delete entities along with their relationships.
+
+        Args:
+            ids (list[int]): The entities' IDs.
+        """
+
+        q = """UNWIND $ids AS id
+               MATCH (e) WHERE ID(e) = id
+               DELETE e"""
+
+        self._query(q, {'ids': ids})
+
+    def disconnect_entities(self, ids: list[int], relations: list[str]) -> None:
+        """
+        Delete the outgoing relationships of entities.
+
+        Args:
+            ids (list[int]): The entities' IDs.
+            relations (list[str]): The types of the relationships to delete.
+        """
+
+        q = """MATCH (e)-[r]->()
+               WHERE ID(e) IN $ids AND type(r) IN $relations
+               DELETE r"""
+
+        self._query(q, {'ids': ids, 'relations': relations})
+
+    def get_dependent_files(self, ids: list[int], relations: list[str]) -> list[str]:
+        """
+        Get the files defining entities with relationships into the given entities,
+        e.g. the files calling a function. The relationships created by resolving
+        symbols serve as the reverse dependency index of the graph's entities.
+
+        Args:
+            ids (list[int]): The entities' IDs.
+            relations (list[str]): The types of the relationships to follow.
+
+        Returns:
+            list[str]: The files' paths.
+        """
+
+        q = """UNWIND $ids AS id
+               MATCH (f:File)-[:DEFINES*]->(s)-[r]->(e)
+               WHERE ID(e) = id AND type(r) IN $relations
+               RETURN DISTINCT f.path"""
+
+        return [row[0] for row in self._query(q, {'ids': ids, 'relations': relations}).result_set]
+
     def get_file(self, path: str, name: str, ext: str) -> Optional[File]:
         """
         Retrieves a File entity from the graph database based on its path, name, and extension.
@@ -544,13 +861,15 @@ class Graph():
 
         return self._query(q, params)
 
-    def find_paths(self, src: int, dest: int) -> list[Path]:
+    def find_paths(self, src: int, dest: int, libraries: bool = True) -> list[Path]:
         """
         Find all paths between the source (src) and destination (dest) nodes.
 
         Args:
             src (int): The ID of the source node.
             dest (int): The ID of the destination node.
+            libraries (bool): Follow calls made within a library when dest is a
+                library entity's stub, see find_library_paths.
 
         Returns:
             List[Optional[Path]]: A list of paths found between the src and dest nodes.
@@ -588,6 +907,10 @@ class Graph():
             path.append(encode_node(nodes[-1]))
             paths.append(path)
 
+        # Calls made within libraries only show up in their library graphs
+        if libraries:
+            paths += self.find_library_paths(src, dest)
+
         return paths
 
     def stats(self) -> dict:
@@ -627,3 +950,204 @@ class Graph():
 
         return unreachables
 
+
+class GraphWriter():
+    """
+    Buffers file, entity and relationship writes and flushes them
+    as batched UNWIND queries, one per label / relationship type.
+
+    Written objects (File, Entity) get their `id` attribute assigned
+    once the batch containing them is flushed, relationships refer to
+    these objects and are always flushed after the nodes they connect.
+    All queries go through Graph._query so they're recorded in the
+    graph's backlog when it is enabled.
+
+    The writer can be shared by several threads. In background mode
+    batches are written by a dedicated thread, in order, through a
+    bounded queue so producers are held back when writes fall behind.
+
+    Checkpoints are recorded in the repository's info once everything
+    queued before them is written.
+    """
+
+    # Maximum number of batches waiting for the background thread
+    QUEUE_SIZE = 4
+
+    def __init__(self, graph: Graph, batch_size: int = 1000, background: bool = False) -> None:
+        self.graph      = graph
+        self.batch_size = max(1, batch_size)
+        self.pending    = 0
+        self.lock       = threading.RLock()
+
+        self.files: list[tuple[File, dict]]                  = []
+        self.entities: dict[str, list[tuple[Any, dict]]]     = {}
+        self.edges: dict[str, list[tuple[Any, Any, dict]]]   = {}
+        self.checkpoints: dict[str, list[str]]               = {}
+
+        self.queue: Optional[queue.Queue] = None
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None
+        if background:
+            self.queue  = queue.Queue(maxsize=self.QUEUE_SIZE)
+            self.thread = threading.Thread(target=self._run, name="graph-writer", daemon=True)
+            self.thread.start()
+
+    def __enter__(self) -> "GraphWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _added(self) -> None:
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def _run(self) -> None:
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            # Keep draining after a failure so producers aren't blocked
+            if self.error is not None:
+                continue
+            try:
+                self._write(*batch)
+            except Exception as e:
+                logging.error(f"Failed writing batch: {e}")
+                self.error = e
+
+    def close(self) -> None:
+        """
+        Flush pending writes and wait for them to complete.
+        """
+
+        self.flush()
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            raise self.error
+
+    def add_file(self, file: File) -> None:
+        """
+        Queue a file node, sets file.id once flushed.
+
+        Args:
+            file (File): The file.
+        """
+
+        row = {'path': str(file.path), 'name': file.path.name, 'ext': file.path.suffix, 'hash': file.hash}
+        with self.lock:
+            self.files.append((file, row))
+            self._added()
+
+    def add_entity(self, entity: Any, label: str, name: str, doc: str, path: str, src_start: int, src_end: int, props: dict) -> None:
+        """
+        Queue an entity node, sets entity.id once flushed.
+
+        Args:
+            entity (Any): The object representing the node, receives its ID.
+        """
+
+        row = {'name': name, 'doc': doc, 'path': path, 'src_start': src_start,
+               'src_end': src_end, 'props': props}
+        with self.lock:
+            self.entities.setdefault(label, []).append((entity, row))
+            self._added()
+
+    def connect_entities(self, relation: str, src: Any, dest: Any, properties: dict = {}) -> None:
+        """
+        Queue a relationship between src and dest
+
+        Args:
+            relation (str): The relationship type.
+            src (Any): The source object, either a File or an Entity.
+            dest (Any): The destination object, either a File or an Entity.
+            properties (dict): Relationship properties.
+        """
+
+        with self.lock:
+            self.edges.setdefault(relation, []).append((src, dest, properties))
+            self._added()
+
+    def add_checkpoint(self, stage: str, item: str) -> None:
+        """
+        Queue an ingestion checkpoint, recorded once the writes queued so far are written.
+
+        Args:
+            stage (str): The ingestion stage, see info.CHECKPOINT_STAGES.
+            item (str): The completed item, e.g. a file path.
+        """
+
+        with self.lock:
+            self.checkpoints.setdefault(stage, []).append(item)
+
+    def flush(self) -> None:
+        """
+        Write all pending nodes and then all pending relationships,
+        in background mode the writes are only queued.
+        """
+
+        with self.lock:
+            if self.pending == 0 and len(self.checkpoints) == 0:
+                return
+
+            batch = (self.files, self.entities, self.edges, self.checkpoints)
+            self.files       = []
+            self.entities    = {}
+            self.edges       = {}
+            self.checkpoints = {}
+            self.pending     = 0
+
+            if self.queue is None:
+                self._write(*batch)
+            else:
+                if self.error is not None:
+                    raise self.error
+                # Blocks while the queue is full, holding other producers back too
+                self.queue.put(batch)
+
+    def _write(self, files: list[tuple[File, dict]], entities: dict[str, list[tuple[Any, dict]]],
+               edges: dict[str, list[tuple[Any, Any, dict]]], checkpoints: dict[str, list[str]]) -> None:
+        if len(files) > 0:
+            q = """UNWIND $files AS file
+                   MERGE (f:File:Searchable {path: file['path'], name: file['name'], ext: file['ext']})
+                   SET f.hash = file['hash']
+                   RETURN ID(f)"""
+
+            self._write_nodes(q, 'files', files)
+
+        for label, label_entities in entities.items():
+            q = f"""UNWIND $entities AS entity
+                    MERGE (c:{label}:Searchable {{name: entity['name'], path: entity['path'],
+                                                  src_start: entity['src_start'], src_end: entity['src_end']}})
+                    SET c.doc = entity['doc']
+                    SET c += entity['props']
+                    RETURN ID(c)"""
+
+            self._write_nodes(q, 'entities', label_entities)
+
+        for relation, relation_edges in edges.items():
+            q = f"""UNWIND $edges AS edge
+                    MATCH (src), (dest)
+                    WHERE ID(src) = edge['src_id'] AND ID(dest) = edge['dest_id']
+                    MERGE (src)-[e:{relation}]->(dest)
+                    SET e += edge['properties']"""
+
+            rows = [{'src_id': src.id, 'dest_id': dest.id, 'properties': properties}
+                    for src, dest, properties in relation_edges]
+            self.graph._query(q, {'edges': rows})
+
+        for stage, items in checkpoints.items():
+            add_checkpoints(self.graph.name, stage, items)
+
+    def _write_nodes(self, q: str, param: str, nodes: list[tuple[Any, dict]]) -> None:
+        res = self.graph._query(q, {param: [row for _, row in nodes]})
+
+        # UNWIND preserves order, IDs are returned in the order rows were queued
+        if len(res.result_set) != len(nodes):
+            raise RuntimeError(f"Expected {len(nodes)} node IDs, got {len(res.result_set)}")
+        for (obj, _), row in zip(nodes, res.result_set):
+            obj.id = row[0]
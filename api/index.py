@@ -5,11 +5,12 @@ from functools import wraps
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify
 
-from api.analyzers.source_analyzer import SourceAnalyzer
+from api.analyzers.source_analyzer import SourceAnalyzer, RESOLUTION_MODES
+from api.analyzers.watcher import unwatch_folder, watch_folder
 from api.git_utils import git_utils
 from api.git_utils.git_graph import GitGraph
 from api.graph import Graph, get_repos, graph_exists
-from api.info import get_repo_info
+from api.info import get_repo_info, get_repo_status, prioritize_files
 from api.llm import ask
 from api.project import Project
 from .auto_complete import prefix_search
@@ -133,6 +134,10 @@ def get_neighbors():
     # Fetch the neighbors of the specified node
     neighbors = g.get_neighbors(node_ids)
 
+    # While symbols are being resolved, resolve the requested files first
+    if get_repo_status(repo).get('status') in ('skeleton', 'resolving'):
+        prioritize_files(repo, g.get_node_paths(node_ids))
+
     # Log and return the neighbors
     logging.info("Successfully retrieved neighbors for node IDs %s in repo '%s'.", node_ids, repo)
 
@@ -237,7 +242,7 @@ def repo_info():
     if stats is None or info is None:
         return jsonify({'status': f'Missing repository "{repo}"'}), 400
 
-    stats |= info
+    stats |= info | get_repo_status(repo)
 
     # Create a response
     response = {
@@ -332,7 +337,11 @@ def chat():
 def analyze_folder():
     """
     Endpoint to analyze local source code
-    Expects 'path' and optionally an ignore list.
+    Expects 'path' and optionally an ignore list, a symbol resolution
+    mode ('lsp', 'static' or 'hybrid') and 'progressive', to return once
+    the skeleton graph is published while symbols are resolved in the background.
+    With 'watch' the folder is watched once analyzed, keeping its graph current
+    as files change, until the folder is analyzed again or /unwatch_folder is called.
 
     Returns:
         JSON response with status and error message if applicable
@@ -346,8 +355,11 @@ def analyze_folder():
     data = request.get_json()
 
     # Get query parameters
-    path      = data.get('path')
-    ignore    = data.get('ignore', [])
+    path       = data.get('path')
+    ignore     = data.get('ignore', [])
+    resolution = data.get('resolution')
+    progressive = data.get('progressive', False)
+    watch      = data.get('watch', False)
 
     # Validate input parameters
     if not path:
@@ -364,22 +376,64 @@ def analyze_folder():
         logging.error("'ignore' must be a list of paths")
         return jsonify({"status": "'ignore' must be a list of paths"}), 400
 
+    if resolution is not None and resolution not in RESOLUTION_MODES:
+        logging.error("Unknown resolution mode '%s'", resolution)
+        return jsonify({"status": f"'resolution' must be one of {RESOLUTION_MODES}"}), 400
+
     proj_name = Path(path).name
 
     # Initialize the graph with the provided project name
     g = Graph(proj_name)
 
+    # A running watch would update the graph while it's analyzed
+    unwatch_folder(Path(path))
+
     # Analyze source code within given folder
-    analyzer = SourceAnalyzer()
-    analyzer.analyze_local_folder(path, g, ignore)
+    analyzer = SourceAnalyzer(resolution=resolution)
+    analyzer.analyze_local_folder(path, g, ignore, progressive)
+
+    if watch:
+        try:
+            watch_folder(Path(path), g, analyzer, ignore)
+        except OSError as e:
+            logging.error("Failed watching '%s': %s", path, e)
+            return jsonify({"status": f"Failed watching folder: {e}"}), 500
 
     # Return response
     response = {
             'status': 'success',
-            'project': proj_name
+            'project': proj_name,
+            'summary': analyzer.summary(),
+            'watching': watch
         }
     return jsonify(response), 200
 
+@app.route('/unwatch_folder', methods=['POST'])
+@token_required  # Apply token authentication decorator
+def unwatch_folder_route():
+    """
+    Endpoint to stop watching a local folder analyzed with 'watch'.
+    Expects 'path'.
+
+    Returns:
+        JSON response with status
+        Status codes:
+            200: Success
+            400: Invalid input
+            404: The folder isn't watched
+    """
+
+    data = request.get_json()
+    path = data.get('path')
+    if not path:
+        logging.error("'path' is missing from the request.")
+        return jsonify({"status": "'path' is required."}), 400
+
+    if not unwatch_folder(Path(path)):
+        return jsonify({"status": f"'{path}' isn't watched"}), 404
+
+    return jsonify({'status': 'success'}), 200
+
 @app.route('/analyze_repo', methods=['POST'])
 @public_access  # Apply public access decorator
 @token_required  # Apply token authentication decorator
@@ -390,7 +444,9 @@ def analyze_repo():
     Expected JSON payload:
     {
         "repo_url": "string",
-        "ignore": ["string"]  # optional
+        "ignore": ["string"],  # optional
+        "resolution": "lsp" | "static" | "hybrid",  # optional
+        "progressive": bool  # optional, return once the skeleton graph is published
     }
 
     Returns:
@@ -405,13 +461,20 @@ def analyze_repo():
 
     ignore = data.get('ignore', [])
 
-    proj = Project.from_git_repository(url)
-    proj.analyze_sources(ignore)
-    proj.process_git_history(ignore)
+    resolution = data.get('resolution')
+    if resolution is not None and resolution not in RESOLUTION_MODES:
+        return jsonify({'status': f'"resolution" must be one of {RESOLUTION_MODES}'}), 400
+
+    progressive = data.get('progressive', False)
+
+    # An interrupted analysis of the repository resumes where it stopped
+    proj = Project.from_git_repository(url, resume=True)
+    proj.ingest(ignore, resolution, progressive)
 
     # Create a response
     response = {
         'status': 'success',
+        'summary': proj.analyzer.summary()
     }
 
     return jsonify(response), 200
@@ -1,4 +1,5 @@
 import os
+import time
 import redis
 import logging
 from typing import Optional, Dict
@@ -118,3 +119,318 @@ def get_repo_info(repo_name: str) -> Optional[Dict[str, str]]:
         logging.error(f"Error retrieving repo info for '{repo_name}': {e}")
         raise
 
+
+def set_library_indexed(graph_name: str) -> None:
+    """Mark a shared dependency library graph as fully indexed"""
+
+    try:
+        r = get_redis_connection()
+        key = _repo_info_key(graph_name)
+
+        r.hset(key, 'indexed', 1)
+        logging.info(f"Library graph {graph_name} indexed")
+
+    except Exception as e:
+        logging.error(f"Error saving library info for '{graph_name}': {e}")
+        raise
+
+
+def is_library_indexed(graph_name: str) -> bool:
+    """Check if a shared dependency library graph was fully indexed"""
+
+    try:
+        r = get_redis_connection()
+        return r.hget(_repo_info_key(graph_name), 'indexed') is not None
+
+    except Exception as e:
+        logging.error(f"Error retrieving library info for '{graph_name}': {e}")
+        raise
+
+
+def _repo_priority_key(repo_name: str) -> str:
+    return f"{{{repo_name}}}_priority"
+
+
+def set_repo_status(repo_name: str, status: str, resolved: Optional[int] = None, total: Optional[int] = None) -> None:
+    """
+    Save the analysis status of a repository and its resolution progress.
+
+    Args:
+        repo_name (str): The name of the repository.
+        status (str): 'skeleton', 'resolving', 'complete' or 'failed'.
+        resolved (int, optional): Number of files whose symbols are resolved.
+        total (int, optional): Number of files to resolve.
+    """
+
+    try:
+        r = get_redis_connection()
+        key = _repo_info_key(repo_name)
+
+        mapping = {'status': status}
+        if resolved is not None:
+            mapping['resolved_files'] = resolved
+        if total is not None:
+            mapping['total_files'] = total
+
+        r.hset(key, mapping=mapping)
+        logging.info(f"Repository {repo_name} status: {status}")
+
+    except Exception as e:
+        logging.error(f"Error saving repo status for '{repo_name}': {e}")
+        raise
+
+
+def get_repo_status(repo_name: str) -> Dict[str, str]:
+    """
+    Retrieves the analysis status of a repository and its resolution progress.
+
+    Args:
+        repo_name (str): The name of the repository.
+
+    Returns:
+        Dict[str, str]: The status, resolved_files and total_files fields which are set.
+    """
+
+    try:
+        r = get_redis_connection()
+        fields = ['status', 'resolved_files', 'total_files']
+        values = r.hmget(_repo_info_key(repo_name), fields)
+        return {field: value for field, value in zip(fields, values) if value is not None}
+
+    except Exception as e:
+        logging.error(f"Error retrieving repo status for '{repo_name}': {e}")
+        raise
+
+
+def prioritize_files(repo_name: str, paths: list[str]) -> None:
+    """
+    Ask for files to be resolved first, e.g. files the frontend looks at
+    while the repository's symbols are resolved in the background.
+
+    Args:
+        repo_name (str): The name of the repository.
+        paths (list[str]): The files' paths.
+    """
+
+    if len(paths) == 0:
+        return
+
+    try:
+        r = get_redis_connection()
+        r.zadd(_repo_priority_key(repo_name), {path: time.time() for path in paths})
+
+    except Exception as e:
+        logging.error(f"Error prioritizing files of '{repo_name}': {e}")
+        raise
+
+
+def pop_prioritized_files(repo_name: str) -> list[str]:
+    """
+    Retrieves and clears the files asked to be resolved first.
+
+    Args:
+        repo_name (str): The name of the repository.
+
+    Returns:
+        list[str]: The files' paths, most recently requested first.
+    """
+
+    try:
+        r = get_redis_connection()
+        key = _repo_priority_key(repo_name)
+
+        pipe = r.pipeline()
+        pipe.zrange(key, 0, -1, desc=True)
+        pipe.delete(key)
+        paths, _ = pipe.execute()
+        return paths
+
+    except Exception as e:
+        logging.error(f"Error retrieving prioritized files of '{repo_name}': {e}")
+        raise
+
+
+def _repo_dependents_key(repo_name: str) -> str:
+    return f"{{{repo_name}}}_dependents"
+
+
+def queue_dependents(repo_name: str, paths: list[str]) -> None:
+    """
+    Queue files for re-resolution, e.g. files whose symbols resolved
+    to entities which changed or were deleted.
+
+    Args:
+        repo_name (str): The name of the repository.
+        paths (list[str]): The files' paths.
+    """
+
+    if len(paths) == 0:
+        return
+
+    try:
+        r = get_redis_connection()
+        r.sadd(_repo_dependents_key(repo_name), *paths)
+
+    except Exception as e:
+        logging.error(f"Error queuing dependent files of '{repo_name}': {e}")
+        raise
+
+
+def get_queued_dependents(repo_name: str) -> set[str]:
+    """
+    Retrieves the files queued for re-resolution.
+
+    Args:
+        repo_name (str): The name of the repository.
+
+    Returns:
+        set[str]: The files' paths.
+    """
+
+    try:
+        r = get_redis_connection()
+        return r.smembers(_repo_dependents_key(repo_name))
+
+    except Exception as e:
+        logging.error(f"Error retrieving dependent files of '{repo_name}': {e}")
+        raise
+
+
+def remove_queued_dependents(repo_name: str, paths: list[str]) -> None:
+    """
+    Remove files from the re-resolution queue, once resolved.
+
+    Args:
+        repo_name (str): The name of the repository.
+        paths (list[str]): The files' paths.
+    """
+
+    if len(paths) == 0:
+        return
+
+    try:
+        r = get_redis_connection()
+        r.srem(_repo_dependents_key(repo_name), *paths)
+
+    except Exception as e:
+        logging.error(f"Error removing dependent files of '{repo_name}': {e}")
+        raise
+
+
+# Stages of an ingestion job whose progress is checkpointed
+CHECKPOINT_STAGES = ['indexed', 'resolved', 'commits']
+
+def _repo_checkpoint_key(repo_name: str, stage: str) -> str:
+    return f"{{{repo_name}}}_checkpoint_{stage}"
+
+
+def start_ingestion(repo_name: str) -> bool:
+    """
+    Mark the start of an ingestion job of a repository, the job's progress is
+    checkpointed until finish_ingestion. Starting a job of a repository whose
+    previous job didn't finish resumes it.
+
+    Args:
+        repo_name (str): The name of the repository.
+
+    Returns:
+        bool: Whether an interrupted job is resumed.
+    """
+
+    try:
+        r = get_redis_connection()
+        key = _repo_info_key(repo_name)
+
+        resumed = r.hget(key, 'ingestion') is not None
+        if not resumed:
+            r.delete(*[_repo_checkpoint_key(repo_name, stage) for stage in CHECKPOINT_STAGES])
+
+        r.hset(key, 'ingestion', 'resumed' if resumed else 'running')
+        logging.info(f"{'Resuming' if resumed else 'Starting'} ingestion of {repo_name}")
+        return resumed
+
+    except Exception as e:
+        logging.error(f"Error starting ingestion of '{repo_name}': {e}")
+        raise
+
+
+def get_ingestion(repo_name: str) -> Optional[str]:
+    """
+    Get the state of a repository's unfinished ingestion job.
+
+    Args:
+        repo_name (str): The name of the repository.
+
+    Returns:
+        Optional[str]: 'running' or 'resumed', None if no job is unfinished.
+    """
+
+    try:
+        r = get_redis_connection()
+        return r.hget(_repo_info_key(repo_name), 'ingestion')
+
+    except Exception as e:
+        logging.error(f"Error retrieving ingestion of '{repo_name}': {e}")
+        raise
+
+
+def finish_ingestion(repo_name: str) -> None:
+    """
+    Mark the ingestion job of a repository as finished, dropping its checkpoints.
+
+    Args:
+        repo_name (str): The name of the repository.
+    """
+
+    try:
+        r = get_redis_connection()
+        r.hdel(_repo_info_key(repo_name), 'ingestion')
+        r.delete(*[_repo_checkpoint_key(repo_name, stage) for stage in CHECKPOINT_STAGES])
+        logging.info(f"Finished ingestion of {repo_name}")
+
+    except Exception as e:
+        logging.error(f"Error finishing ingestion of '{repo_name}': {e}")
+        raise
+
+
+def add_checkpoints(repo_name: str, stage: str, items: list[str]) -> None:
+    """
+    Record completed items of an ingestion job's stage.
+
+    Args:
+        repo_name (str): The name of the repository.
+        stage (str): One of CHECKPOINT_STAGES.
+        items (list[str]): The completed items, e.g. file paths.
+    """
+
+    if len(items) == 0:
+        return
+
+    try:
+        r = get_redis_connection()
+        r.sadd(_repo_checkpoint_key(repo_name, stage), *items)
+
+    except Exception as e:
+        logging.error(f"Error saving {stage} checkpoints of '{repo_name}': {e}")
+        raise
+
+
+def get_checkpoints(repo_name: str, stage: str) -> set[str]:
+    """
+    Retrieves the completed items of an ingestion job's stage.
+
+    Args:
+        repo_name (str): The name of the repository.
+        stage (str): One of CHECKPOINT_STAGES.
+
+    Returns:
+        set[str]: The completed items.
+    """
+
+    try:
+        r = get_redis_connection()
+        return r.smembers(_repo_checkpoint_key(repo_name, stage))
+
+    except Exception as e:
+        logging.error(f"Error retrieving {stage} checkpoints of '{repo_name}': {e}")
+        raise
@@ -1,8 +1,9 @@
-import os
 import shutil
 import logging
+import threading
 import validators
 import subprocess
+from pygit2.enums import CheckoutStrategy
 from pygit2.repository import Repository
 from .info import *
 from shlex import quote
@@ -16,9 +17,20 @@ from .git_utils import build_commit_graph, GitGraph
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def _clone_source(url: str, name: str) -> Path:
+def _clone_source(url: str, name: str, resume: bool = False) -> Path:
     # path to local repositories
     path = Path.cwd() / "repositories" / name
+
+    # Resume an interrupted ingestion from its clone
+    if resume and (path / ".git").is_dir():
+        try:
+            # History processing may have left an older commit checked out
+            Repository(path).checkout_head(strategy=CheckoutStrategy.FORCE)
+            logging.info(f"Reusing repository clone: {path}")
+            return path
+        except Exception as e:
+            logging.warning(f"Failed reusing repository clone {path}: {e}")
+
     print(f"Cloning repository to: {path}")
 
     # Delete local repository if exists
@@ -48,7 +60,7 @@ class Project():
             save_repo_info(name, url)
 
     @classmethod
-    def from_git_repository(cls, url: str):
+    def from_git_repository(cls, url: str, resume: bool = False):
         # Validate url
         if not validators.url(url):
             raise Exception(f"invalid url: {url}")
@@ -56,7 +68,9 @@ class Project():
         # Extract project name from URL
         parsed_url = urlparse(url)
         name = parsed_url.path.split('/')[-1]
-        path = _clone_source(url, name)
+
+        # An unfinished ingestion job is resumed from its clone, see ingest
+        path = _clone_source(url, name, resume and get_ingestion(name) is not None)
 
         return cls(name, path, url)
 
@@ -77,11 +91,12 @@ class Project():
 
         return cls(name, path, url)
 
-    def analyze_sources(self, ignore: Optional[List[str]] = None) -> Graph:
+    def analyze_sources(self, ignore: Optional[List[str]] = None, resolution: Optional[str] = None,
+                        progressive: bool = False, checkpoint: bool = False) -> Graph:
         if ignore is None:
             ignore = []
-        self.analyzer = SourceAnalyzer()
-        self.analyzer.analyze_local_folder(self.path, self.graph, ignore)
+        self.analyzer = SourceAnalyzer(resolution=resolution, checkpoint=checkpoint)
+        self.analyzer.analyze_local_folder(self.path, self.graph, ignore, progressive)
 
         try:
             # Save processed commit hash to the DB
@@ -94,20 +109,56 @@ class Project():
 
         return self.graph
 
-    def process_git_history(self, ignore: Optional[List[str]] = []) -> GitGraph:
-        logging.info(f"processing {self.name} git commit history")
+    def ingest(self, ignore: Optional[List[str]] = None, resolution: Optional[str] = None,
+               progressive: bool = False) -> None:
+        """
+        Analyze the repository's sources and git history as a resumable job.
+
+        The job's progress, indexed and resolved files and processed commits,
+        is checkpointed in the repository's info until the job finishes. Running
+        the job again after it was interrupted resumes from its checkpoints.
+
+        Args:
+            ignore (List[str], optional): List of paths to skip.
+            resolution (str, optional): Symbol resolution mode.
+            progressive (bool): Return once the skeleton graph is published, the rest
+                of the job runs in the background.
+        """
 
-        # Save original working directory for later restore
-        original_dir = Path.cwd()
+        if ignore is None:
+            ignore = []
+
+        start_ingestion(self.name)
+        self.analyze_sources(ignore, resolution, progressive, checkpoint=True)
+
+        def complete() -> None:
+            self.process_git_history(ignore, checkpoint=True)
+            finish_ingestion(self.name)
 
-        # change working directory to local repository
-        logging.info(f"Switching current working directory to: {self.path}")
-        os.chdir(self.path)
+        def complete_in_background() -> None:
+            try:
+                complete()
+            except Exception as e:
+                # Nothing waits for the background job, report its failure through
+                # the repository's status, running the job again resumes it
+                logging.error(f"Failed ingesting {self.name}: {e}")
+                set_repo_status(self.name, 'failed')
 
-        git_graph = build_commit_graph(self.path, self.analyzer, self.name, ignore)
+        if progressive:
+            # Symbols are resolved in the background, followed by the git history
+            threading.Thread(target=complete_in_background, name=f"ingest-{self.name}", daemon=True).start()
+        else:
+            complete()
 
-        # Restore original working directory
-        logging.info(f"Restoring current working directory to: {original_dir}")
-        os.chdir(original_dir)
+    def process_git_history(self, ignore: Optional[List[str]] = [], checkpoint: bool = False) -> GitGraph:
+        # History processing checks out other commits, wait for the sources' analysis
+        self.analyzer.wait()
+
+        # Transitions are checkpointed by commit
+        self.analyzer.checkpoint = False
+
+        logging.info(f"processing {self.name} git commit history")
 
-        return git_graph
+        # The working directory is left as is, history may be processed in
+        # a background thread while other requests are served
+        return build_commit_graph(self.path, self.analyzer, self.name, ignore, checkpoint)
@@ -0,0 +1,136 @@
+import threading
+from contextlib import ExitStack
+from typing import Optional
+from unittest import mock
+
+from api.graph import GraphWriter
+
+
+class MemoryGraph():
+    """
+    Stands in for a Graph, keeps the nodes and edges written to it in memory
+    and answers the queries incremental analyses make.
+
+    Like the graph's MERGE, nodes are matched by their label, path, name and
+    lines, new nodes get IDs which were never used before.
+    """
+
+    def __init__(self, name: str = 'test_graph'):
+        self.name    = name
+        self.nodes   = {}
+        self.edges   = {}
+        self.queued  = set()
+        self.next_id = 0
+        self.lock    = threading.Lock()
+
+    def writer(self, batch_size: Optional[int] = None, background: bool = False) -> "MemoryWriter":
+        return MemoryWriter(self, batch_size or 1000, background)
+
+    def key(self, id: int) -> tuple:
+        node = self.nodes[id]
+        if node['label'] == 'File':
+            return ('File', node['path'])
+        return (node['label'], node['path'], node['name'], node['src_start'], node['src_end'])
+
+    def merge(self, node: dict) -> int:
+        with self.lock:
+            key = ('File', node['path']) if node['label'] == 'File' else \
+                  (node['label'], node['path'], node['name'], node['src_start'], node['src_end'])
+            for id in self.nodes:
+                if self.key(id) == key:
+                    self.nodes[id].update(node)
+                    return id
+
+            id = self.next_id
+            self.next_id += 1
+            self.nodes[id] = node
+            return id
+
+    def snapshot(self) -> tuple[list[tuple], set[tuple]]:
+        """The keys of the graph's nodes, in creation order, and its edges between keys."""
+
+        nodes = [self.key(id) for id in sorted(self.nodes)]
+        edges = {(self.key(src), relation, self.key(dest), tuple(sorted(properties.items())))
+                 for (src, relation, dest), properties in self.edges.items()}
+        return nodes, edges
+
+    def defined(self, path: str) -> list[tuple[int, list[str]]]:
+        # Entities a file defines, directly or not, with their qualified names
+        res = []
+        stack = [(id, []) for id, node in self.nodes.items() if node['label'] == 'File' and node['path'] == path]
+        while len(stack) > 0:
+            id, names = stack.pop()
+            for src, relation, dest in self.edges:
+                if src == id and relation == 'DEFINES':
+                    res.append((dest, names + [self.nodes[dest]['name']]))
+                    stack.append(res[-1])
+        return res
+
+    def delete(self, ids: set[int]) -> None:
+        for id in ids:
+            self.nodes.pop(id, None)
+        for edge in [edge for edge in self.edges if edge[0] in ids or edge[2] in ids]:
+            del self.edges[edge]
+
+    def get_file_hashes(self) -> dict[str, Optional[str]]:
+        return {node['path']: node.get('hash') for node in self.nodes.values() if node['label'] == 'File'}
+
+    def get_file_entities(self, path: str) -> dict[tuple[str, str, int, int], int]:
+        return {(self.nodes[id]['label'], self.nodes[id]['name'], self.nodes[id]['src_start'], self.nodes[id]['src_end']): id
+                for id, _ in self.defined(path)}
+
+    def get_file_definitions(self, path: str) -> list[tuple[int, str, list[str], Optional[str], int, int, Optional[str]]]:
+        rows = [(id, self.nodes[id]['label'], names, self.nodes[id].get('signature'),
+                 self.nodes[id]['src_start'], self.nodes[id]['src_end'], self.nodes[id].get('doc'))
+                for id, names in self.defined(path)]
+        return sorted(rows, key=lambda row: (row[4], len(row[2])))
+
+    def update_entities(self, entities: list[dict]) -> None:
+        for entity in entities:
+            self.nodes[entity['id']].update({key: value for key, value in entity.items() if key != 'id'})
+
+    def delete_entities(self, ids: list[int]) -> None:
+        self.delete(set(ids))
+
+    def disconnect_entities(self, ids: list[int], relations: list[str]) -> None:
+        for edge in [edge for edge in self.edges if edge[0] in ids and edge[1] in relations]:
+            del self.edges[edge]
+
+    def get_dependent_files(self, ids: list[int], relations: list[str]) -> list[str]:
+        sources = {src for src, relation, dest in self.edges if dest in ids and relation in relations}
+        return sorted(set(node['path'] for node in self.nodes.values() if node['label'] == 'File' and
+                          any(id in sources for id, _ in self.defined(node['path']))))
+
+    def delete_files(self, files: list) -> None:
+        for file_path in files:
+            nodes = {id for id, node in self.nodes.items() if node['label'] == 'File' and node['path'] == str(file_path)}
+            self.delete(nodes | {id for id, _ in self.defined(str(file_path))})
+
+    def patch_info(self) -> ExitStack:
+        """Keep the files queued for re-resolution in the graph instead of the repository's info."""
+
+        module = 'api.analyzers.source_analyzer'
+        stack = ExitStack()
+        stack.enter_context(mock.patch(f'{module}.queue_dependents', lambda name, paths: self.queued.update(paths)))
+        stack.enter_context(mock.patch(f'{module}.get_queued_dependents', lambda name: set(self.queued)))
+        stack.enter_context(mock.patch(f'{module}.remove_queued_dependents',
+                                       lambda name, paths: self.queued.difference_update(paths)))
+        return stack
+
+
+class MemoryWriter(GraphWriter):
+    """Writes batches to a MemoryGraph instead of the database."""
+
+    def _write(self, files, entities, edges, checkpoints) -> None:
+        for file, row in files:
+            file.id = self.graph.merge({'label': 'File', **row})
+
+        for label, rows in entities.items():
+            for entity, row in rows:
+                node = {'label': label, **{key: value for key, value in row.items() if key != 'props'}, **row['props']}
+                entity.id = self.graph.merge(node)
+
+        for relation, rows in edges.items():
+            for src, dest, properties in rows:
+                if src.id in self.graph.nodes and dest.id in self.graph.nodes:
+                    self.graph.edges.setdefault((src.id, relation, dest.id), {}).update(properties)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from api.analyzers.blob_store import BlobStore, cache_dir
+from api.analyzers.python.analyzer import PythonAnalyzer
+from api.analyzers.records import records_version
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_version_keying(self):
+        store = BlobStore(self.path, 1 << 20)
+        oid = 'a' * 40
+
+        store.put(oid, '1-x', {'entities': [1]})
+        self.assertTrue(store.contains(oid, '1-x'))
+        self.assertEqual(store.get(oid, '1-x'), {'entities': [1]})
+
+        # Records of another analyzer version are a different blob
+        self.assertIsNone(store.get(oid, '2-x'))
+        store.put(oid, '2-x', {'entities': [2]})
+        self.assertEqual(store.get(oid, '1-x'), {'entities': [1]})
+        self.assertEqual(store.get(oid, '2-x'), {'entities': [2]})
+
+        # Dependencies are cached without their symbols
+        analyzer = PythonAnalyzer()
+        self.assertNotEqual(records_version(analyzer, Path('/repo/app.py')),
+                            records_version(analyzer, Path('/repo/venv/lib/python3.12/site-packages/lib.py')))
+
+    def test_lru_eviction(self):
+        records = {'entities': [os.urandom(256).hex()]}
+        oids = [str(i) * 40 for i in range(4)]
+
+        store = BlobStore(self.path, 1 << 20)
+        for i, oid in enumerate(oids):
+            store.put(oid, 'v', records)
+            os.utime(store._blob_path(oid, 'v'), (i, i))
+        blob_size = store._blob_path(oids[0], 'v').stat().st_size
+
+        # Reading a blob makes it the most recently used
+        self.assertIsNotNone(store.get(oids[0], 'v'))
+
+        # Room for 4 blobs, evicting down to 90% of it leaves 3
+        store = BlobStore(self.path, blob_size * 4 + blob_size // 4)
+        store.put('f' * 40, 'v', records)
+
+        self.assertFalse(store.contains(oids[1], 'v'))
+        self.assertFalse(store.contains(oids[2], 'v'))
+        for oid in [oids[0], oids[3], 'f' * 40]:
+            self.assertTrue(store.contains(oid, 'v'), oid)
+        self.assertLessEqual(store.size, store.max_size * 0.9)
+
+    def test_from_env(self):
+        with mock.patch.dict('os.environ', {'CODE_GRAPH_BLOB_STORE_SIZE': '0'}):
+            self.assertIsNone(BlobStore.from_env())
+
+        with mock.patch.dict('os.environ', {'XDG_CACHE_HOME': str(self.path)}):
+            os.environ.pop('CODE_GRAPH_BLOB_STORE', None)
+            os.environ.pop('CODE_GRAPH_BLOB_STORE_SIZE', None)
+            self.assertEqual(cache_dir(), self.path / 'code-graph')
+            self.assertEqual(BlobStore.from_env().path, (self.path / 'code-graph' / 'blobs').resolve())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from pathlib import Path
+
+from api import File
+from api.analyzers.budget import MINIFIED_MIN_SIZE, FileBudget
+from api.analyzers.python.analyzer import PythonAnalyzer
+
+
+class TestFileBudget(unittest.TestCase):
+    def test_inspect(self):
+        budget = FileBudget(max_size=1 << 20, parse_timeout=10, max_entities=10, lsp_deadline=0)
+
+        self.assertIsNone(budget.inspect(b"def f():\n    pass\n"))
+        self.assertEqual(budget.inspect(b"x = 1\n" * (1 << 18)), 'size')
+        self.assertEqual(budget.inspect(b"# Code generated by protoc. DO NOT EDIT.\nx = 1\n"), 'generated')
+        self.assertEqual(budget.inspect(b"var a=1;" * MINIFIED_MIN_SIZE), 'minified')
+
+        # Markers are only looked up in the comments heading the file
+        self.assertEqual(budget.inspect(b"#!/usr/bin/env python\n\n# @generated\nx = 1\n"), 'generated')
+        self.assertEqual(budget.inspect(b"/*\n * Copyright FalkorDB\n *\n * Auto-generated by a tool\n */\nclass A {}\n"), 'generated')
+        self.assertEqual(budget.inspect(b"// <auto-generated/>\nnamespace App {}\n"), 'generated')
+        self.assertIsNone(budget.inspect(b'"""\nAuto-generated clients are wrapped here.\n"""\nx = 1\n'))
+        self.assertIsNone(budget.inspect(b'WARNING = "Do not edit this file"\n'))
+        self.assertIsNone(budget.inspect(b"x = 1\n# @generated\n"))
+        self.assertIsNone(budget.inspect(b"/* Utilities */\nclass A { String s = \"autogenerated\"; }\n"))
+
+        # Long files of short lines aren't minified
+        self.assertIsNone(budget.inspect(b"x = 1\n" * MINIFIED_MIN_SIZE))
+
+        # 0 leaves the size unbounded
+        unbounded = FileBudget(max_size=0, parse_timeout=10, max_entities=10, lsp_deadline=0)
+        self.assertIsNone(unbounded.inspect(b"x = 1\n" * (1 << 18)))
+
+    def test_within_entities(self):
+        records = {"entities": [None] * 3}
+
+        self.assertTrue(FileBudget(0, 10, 3, 0).within_entities(records))
+        self.assertFalse(FileBudget(0, 10, 2, 0).within_entities(records))
+        self.assertTrue(FileBudget(0, 10, 0, 0).within_entities(records))
+
+    def test_parse_timeout(self):
+        analyzer = PythonAnalyzer()
+        source = b"def f(x):\n    return [x for x in range(10)]\n" * 20000
+
+        self.assertIsNone(FileBudget(0, 0.000001, 0, 0).parse(analyzer, source))
+
+        # The timed out parse isn't resumed by the next one
+        tree = FileBudget(0, 10, 0, 0).parse(analyzer, b"def f():\n    pass\n")
+        self.assertEqual(tree.root_node.end_point, (2, 0))
+        self.assertFalse(tree.root_node.has_error)
+
+    def test_mode(self):
+        self.assertFalse(FileBudget(0, 10, 0, 0).skip)
+        self.assertTrue(FileBudget(0, 10, 0, 0, mode='skip').skip)
+        with self.assertRaises(ValueError):
+            FileBudget(0, 10, 0, 0, mode='drop')
+
+
+class TestDegradedFiles(unittest.TestCase):
+    def test_resolve_into_degraded_file(self):
+        # Degraded files only keep their file node, they're never indexed
+        analyzer = PythonAnalyzer()
+        file = File(Path('/repo/generated.py'), None)
+        files = {file.path: file}
+
+        locations = [{'absolutePath': '/repo/generated.py',
+                      'range': {'start': {'line': 3, 'character': 4}, 'end': {'line': 3, 'character': 8}}}]
+
+        self.assertEqual(analyzer.resolve_locations(files, Path('/repo'), 'call', locations), [])
+        self.assertEqual(analyzer.resolve_locations(files, Path('/repo'), 'base_class', locations), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from api import File
+from api.analyzers.budget import FileBudget
+from api.analyzers.dependencies import DependencyLoader
+from api.analyzers.python.analyzer import PythonAnalyzer
+from api.analyzers.records import LazyFiles
+
+from tests.memory_graph import MemoryGraph
+
+
+class TestLazyDependencies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.lib = self.tmp / 'venv' / 'lib' / 'python3.12' / 'site-packages' / 'lib' / 'core.py'
+        self.lib.parent.mkdir(parents=True)
+        self.lib.write_text('class Client():\n    """A client."""\n\n    def send(self):\n        pass\n')
+
+        self.files = LazyFiles()
+        self.loader = DependencyLoader({'.py': PythonAnalyzer()}, self.files, None,
+                                       FileBudget(0, 10, 0, 0), {}, lazy=True)
+        self.assertTrue(self.loader.collect(self.lib))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def entity(self, name: str):
+        return next(e for e in self.files[self.lib].entities if e.name == name)
+
+    def test_materialize(self):
+        graph = MemoryGraph()
+        with graph.writer() as writer:
+            send = self.entity('send')
+            self.assertIs(self.loader.graph_node(send, writer), send)
+            self.assertIs(self.loader.graph_node(send, writer), send)
+
+        # The referenced entity, the class enclosing it and their file
+        nodes, edges = graph.snapshot()
+        self.assertEqual(sorted(key[0] for key in nodes), ['Class', 'File', 'Function'])
+        self.assertEqual(len(edges), 2)
+        self.assertIsNotNone(send.parent.parent.id)
+
+        # Docs are only kept until their entity is added
+        self.assertNotIn(send, self.loader.docs)
+        self.assertNotIn(send.parent, self.loader.docs)
+
+    def test_reloaded_file(self):
+        graph = MemoryGraph()
+        with graph.writer() as writer:
+            self.loader.graph_node(self.entity('send'), writer)
+
+        # The file is released and loaded again, as a new object
+        self.files.unload(self.lib, self.loader.load)
+        with graph.writer() as writer:
+            client = self.entity('Client')
+            self.assertIs(self.loader.graph_node(client, writer), client)
+
+        file = client.parent
+        self.assertIsInstance(file, File)
+        self.assertEqual(graph.key(file.id), ('File', str(self.lib)))
+        self.assertEqual(len(graph.nodes), 3)
+
+if __name__ == '__main__':
+    unittest.main()
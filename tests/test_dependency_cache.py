@@ -0,0 +1,109 @@
+import os
+import time
+import fcntl
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from api.analyzers.dependency_cache import COMPLETE, DependencyCache, hash_files, link
+
+
+class TestDependencyCache(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp())
+        self.cache = DependencyCache(self.path / 'deps', 1 << 20)
+        self.builds = []
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def build(self, size: int = 16):
+        def build(path: Path) -> None:
+            self.builds.append(path)
+            time.sleep(0.1)
+            (path / 'lib.py').write_bytes(b'x' * size)
+        return build
+
+    def test_reuse(self):
+        entry = self.cache.entry('python', 'abc', self.build())
+        self.assertEqual(entry, self.path / 'deps' / 'python' / 'abc')
+        self.assertTrue((entry / COMPLETE).is_file())
+
+        self.assertEqual(self.cache.entry('python', 'abc', self.build()), entry)
+        self.assertEqual(self.cache.entry('python', 'def', self.build()), self.path / 'deps' / 'python' / 'def')
+        self.assertEqual(len(self.builds), 2)
+
+    def test_concurrent_builds(self):
+        # Analyses needing the same entry wait for a single build
+        entries = []
+        threads = [threading.Thread(target=lambda: entries.append(self.cache.entry('python', 'abc', self.build())))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(set(entries), {self.path / 'deps' / 'python' / 'abc'})
+
+    def test_failed_and_interrupted_builds(self):
+        def fail(path: Path) -> None:
+            (path / 'partial').write_text('')
+            raise OSError('no network')
+
+        self.assertIsNone(self.cache.entry('python', 'abc', fail))
+        self.assertFalse((self.path / 'deps' / 'python' / 'abc').exists())
+
+        # An entry left without its marker is rebuilt from scratch
+        leftover = self.path / 'deps' / 'python' / 'abc'
+        leftover.mkdir(parents=True)
+        (leftover / 'partial').write_text('')
+
+        entry = self.cache.entry('python', 'abc', self.build())
+        self.assertEqual(len(self.builds), 1)
+        self.assertFalse((entry / 'partial').exists())
+
+    def test_eviction(self):
+        cache = DependencyCache(self.path / 'deps', 350)
+        for i, key in enumerate(['a', 'b', 'c']):
+            entry = cache.entry('python', key, self.build(100))
+            os.utime(entry / COMPLETE, (i, i))
+
+        # Using an entry makes it the most recently used
+        cache.entry('python', 'a', self.build())
+
+        # Entries being built aren't evicted
+        with open(self.path / 'deps' / 'python' / 'b.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            cache.entry('python', 'd', self.build(100))
+
+        self.assertTrue((self.path / 'deps' / 'python' / 'a' / COMPLETE).is_file())
+        self.assertTrue((self.path / 'deps' / 'python' / 'b' / COMPLETE).is_file())
+        self.assertFalse((self.path / 'deps' / 'python' / 'c').exists())
+        self.assertTrue((self.path / 'deps' / 'python' / 'd' / COMPLETE).is_file())
+
+    def test_hash_files(self):
+        lockfile = self.path / 'poetry.lock'
+        lockfile.write_text('toml = "0.10.2"')
+        missing = self.path / 'requirements.txt'
+
+        key = hash_files([lockfile, missing], '3.12.1')
+        self.assertEqual(hash_files([lockfile], '3.12.1'), key)
+        self.assertNotEqual(hash_files([lockfile], '3.11.0'), key)
+
+        lockfile.write_text('toml = "0.10.1"')
+        self.assertNotEqual(hash_files([lockfile], '3.12.1'), key)
+
+    def test_link(self):
+        first = self.cache.entry('python', 'a', self.build())
+        second = self.cache.entry('python', 'b', self.build())
+        venv = self.path / 'project' / 'venv'
+
+        link(first, venv)
+        link(second, venv)
+        self.assertEqual(venv.resolve(), second.resolve())
+
+if __name__ == '__main__':
+    unittest.main()
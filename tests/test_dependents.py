@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from api.analyzers.blob_store import BlobStore
+from api.analyzers.source_analyzer import SourceAnalyzer
+
+from tests.memory_graph import MemoryGraph
+
+SOURCES = {
+    'lib.py': "def helper():\n    pass\n\ndef other():\n    pass\n",
+    'app.py': "from lib import helper\n\ndef main():\n    helper()\n",
+    'util.py': "from lib import other\n\ndef run():\n    other()\n",
+    'plain.py': "def alone():\n    pass\n",
+}
+
+
+class TestDependents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'project'
+        self.path.mkdir()
+
+        # An existing venv keeps the python analyzer from installing dependencies
+        (self.path / 'venv').mkdir()
+        for name, source in SOURCES.items():
+            (self.path / name).write_text(source)
+
+        self.graph = MemoryGraph('test_dependents')
+        self.analyzer = SourceAnalyzer(store=BlobStore(self.tmp / 'blobs', 1 << 20), resolution='static')
+        files = self.analyzer.first_pass(self.path, sorted(self.path.glob('*.py')), [], self.graph)
+        self.analyzer.second_pass(self.graph, files, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def calls(self) -> set[tuple[str, str, str]]:
+        # Calls by caller, callee and the callee's file
+        return {(self.graph.nodes[src]['name'], self.graph.nodes[dest]['name'], Path(self.graph.nodes[dest]['path']).name)
+                for src, relation, dest in self.graph.edges if relation == 'CALLS'}
+
+    def apply(self, changed: list[str], deleted: list[str]) -> list[Path]:
+        # Applies changes the way the folder watcher does, returns the resolved files
+        with self.graph.patch_info(), mock.patch.object(self.analyzer, 'second_pass', wraps=self.analyzer.second_pass) as second_pass:
+            if len(deleted) > 0:
+                self.analyzer.delete_files([self.path / name for name in deleted], self.path, self.graph)
+            self.analyzer.analyze_files([self.path / name for name in changed], self.path, self.graph)
+        return sorted(file_path for call in second_pass.call_args_list for file_path in call.args[1])
+
+    def test_deleted_file(self):
+        self.assertEqual(self.calls(), {('main', 'helper', 'lib.py'), ('run', 'other', 'lib.py')})
+
+        # The definitions move to another file
+        (self.path / 'lib.py').unlink()
+        (self.path / 'core.py').write_text(SOURCES['lib.py'])
+
+        resolved = self.apply(['core.py'], ['lib.py'])
+
+        # Files calling into the removed file are resolved again, found through their edges
+        self.assertEqual(resolved, [self.path / name for name in ['app.py', 'core.py', 'util.py']])
+        self.assertEqual(self.calls(), {('main', 'helper', 'core.py'), ('run', 'other', 'core.py')})
+        self.assertEqual(self.graph.queued, set())
+
+    def test_modified_file(self):
+        # helper moves to another file, other is kept
+        (self.path / 'lib.py').write_text("def other():\n    pass\n")
+        (self.path / 'core.py').write_text("def helper():\n    pass\n")
+
+        resolved = self.apply(['lib.py', 'core.py'], [])
+
+        # Only the files depending on changed entities are resolved again
+        self.assertEqual(resolved, [self.path / name for name in ['app.py', 'core.py', 'lib.py']])
+        self.assertEqual(self.calls(), {('main', 'helper', 'core.py'), ('run', 'other', 'lib.py')})
+        self.assertEqual(self.graph.queued, set())
+
+    def test_get_dependent_files(self):
+        entities = self.graph.get_file_entities(str(self.path / 'lib.py'))
+        helper = entities[('Function', 'helper', 0, 1)]
+
+        self.assertEqual(self.graph.get_dependent_files([helper], ['CALLS']), [str(self.path / 'app.py')])
+        self.assertEqual(sorted(self.graph.get_dependent_files(list(entities.values()), ['CALLS'])),
+                         [str(self.path / 'app.py'), str(self.path / 'util.py')])
+        self.assertEqual(self.graph.get_dependent_files([helper], ['EXTENDS']), [])
+
+    def test_load_dependents(self):
+        (self.path / 'plain.py').unlink()
+        self.graph.queued = {str(self.path / name) for name in ['app.py', 'lib.py', 'plain.py']}
+
+        with self.graph.patch_info():
+            dependents = self.analyzer.load_dependents(self.graph, [self.path / 'lib.py'])
+
+        # Files resolved anyway are skipped, removed files are dropped from the queue
+        self.assertEqual(dependents, [self.path / 'app.py'])
+        self.assertEqual(self.graph.queued, {str(self.path / 'app.py'), str(self.path / 'lib.py')})
+
+        # Until resolved, the dependents have no outgoing resolution edges
+        self.assertNotIn(('main', 'helper', 'lib.py'), self.calls())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pygit2 import init_repository
+
+from api.analyzers.discovery import discover_files, is_source_file, open_repository
+
+
+class TestDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()).resolve()
+
+        for name in ['main.py', 'pkg/util.py', 'pkg/Util.java', 'README.md',
+                     'node_modules/lib/index.py', 'venv/lib/site.py', 'env/lib/site.py',
+                     'pkg.egg-info/setup.py', 'build/gen.py', 'generated/out.py', 'logs/debug.py']:
+            file_path = self.path / name
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_text('')
+
+        # A virtual environment under a name of its own
+        (self.path / 'env' / 'pyvenv.cfg').write_text('')
+
+        init_repository(str(self.path))
+        (self.path / '.gitignore').write_text('generated/\n*.log.py\n')
+        (self.path / 'trace.log.py').write_text('')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def relative(self, files: list[Path]) -> list[str]:
+        return [file_path.relative_to(self.path).as_posix() for file_path in files]
+
+    def test_discover_files(self):
+        files = discover_files(self.path, ['.py', '.java'], ignore=['./build', str(self.path / 'logs')])
+
+        self.assertEqual(self.relative(files['.py']), ['main.py', 'pkg/util.py'])
+        self.assertEqual(self.relative(files['.java']), ['pkg/Util.java'])
+
+    def test_is_source_file(self):
+        exts = ['.py', '.java']
+        ignore = ['./build', str(self.path / 'logs')]
+        repo = open_repository(self.path)
+        self.assertIsNotNone(repo)
+
+        discovered = {file_path for ext_files in discover_files(self.path, exts, ignore).values() for file_path in ext_files}
+        for file_path in self.path.rglob('*'):
+            if file_path.is_file() and '.git' not in file_path.parts:
+                self.assertEqual(is_source_file(self.path, repo, file_path, exts, ignore),
+                                 file_path in discovered, file_path)
+
+        # Files outside the project, removed files are judged by their path
+        self.assertFalse(is_source_file(self.path, repo, self.path.parent / 'other.py', exts))
+        self.assertTrue(is_source_file(self.path, repo, self.path / 'removed.py', exts))
+
+    def test_enclosing_repository(self):
+        # Only the ignore rules of the project's own repository apply
+        (self.path / '.gitignore').write_text('pkg/\n')
+        project = self.path / 'pkg'
+        self.assertIsNone(open_repository(project))
+
+        files = discover_files(project, ['.py'])
+        self.assertEqual(self.relative(files['.py']), ['pkg/util.py'])
+        self.assertTrue(is_source_file(project, None, project / 'util.py', ['.py']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from pathlib import Path
+
+from api import Entity, File
+
+
+def entity(type: str, name: str, start: tuple[int, int], end: tuple[int, int]) -> Entity:
+    # Byte offsets of a file whose lines are 100 bytes long
+    return Entity(type, 'Function' if type == 'function_definition' else 'Class', name,
+                  start[0] * 100 + start[1], end[0] * 100 + end[1], start, end)
+
+
+class TestEntityIndex(unittest.TestCase):
+    def setUp(self):
+        self.file = File(Path('/repo/src.py'), None)
+
+        # class A:            0-10
+        #     def f():        1-3
+        #     def g():        5-8
+        #         def h():    6-7
+        # def top():          12-14
+        self.a   = entity('class_definition', 'A', (0, 0), (10, 0))
+        self.f   = entity('function_definition', 'f', (1, 4), (3, 0))
+        self.g   = entity('function_definition', 'g', (5, 4), (8, 0))
+        self.h   = entity('function_definition', 'h', (6, 8), (7, 0))
+        self.top = entity('function_definition', 'top', (12, 0), (14, 0))
+
+        # Entities are added in extraction order, not by position
+        for e in [self.top, self.a, self.g, self.f, self.h]:
+            self.file.add_entity(e)
+        self.a.add_child(self.f)
+        self.a.add_child(self.g)
+        self.g.add_child(self.h)
+
+        self.file.index_entities()
+
+    def test_find_entity(self):
+        functions = ['function_definition']
+        both = ['function_definition', 'class_definition']
+        index = self.file.index
+
+        self.assertIs(index.find_entity((2, 8), both), self.f)
+        self.assertIs(index.find_entity((6, 10), both), self.h)
+        self.assertIs(index.find_entity((7, 4), both), self.g)
+        self.assertIs(index.find_entity((13, 4), both), self.top)
+
+        # Between the class' methods
+        self.assertIs(index.find_entity((4, 0), both), self.a)
+        self.assertIsNone(index.find_entity((4, 0), functions))
+
+        # The innermost entity of the requested types
+        self.assertIs(index.find_entity((6, 10), ['class_definition']), self.a)
+
+        # End positions are exclusive, positions outside of any entity
+        self.assertIs(index.find_entity((3, 0), both), self.a)
+        self.assertIsNone(index.find_entity((10, 0), both))
+        self.assertIsNone(index.find_entity((11, 0), both))
+
+    def test_matches_linear_scan(self):
+        entities = self.file.entities
+        for types in [['function_definition'], ['class_definition'], ['function_definition', 'class_definition']]:
+            for row in range(16):
+                for column in range(0, 12, 2):
+                    point = (row, column)
+                    enclosing = [e for e in entities if e.start_point <= point < e.end_point and e.type in types]
+                    expected = max(enclosing, key=lambda e: e.start_byte) if len(enclosing) > 0 else None
+                    self.assertIs(self.file.index.find_entity(point, types), expected, (point, types))
+
+    def test_unindexed_file(self):
+        # Files which are never indexed, e.g. degraded ones, resolve nothing
+        file = File(Path('/repo/generated.py'), None)
+        self.assertIsNone(file.index.find_entity((0, 0), ['function_definition']))
+
+if __name__ == '__main__':
+    unittest.main()
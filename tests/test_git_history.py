@@ -1,11 +1,21 @@
 import os
+import shutil
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 from git import Repo
+from pygit2 import Repository, Signature, init_repository
+from pygit2.enums import CheckoutStrategy
 from api import (
     Graph,
+    GitGraph,
+    GitRepoName,
     Project,
+    finish_ingestion,
     switch_commit
 )
+from api.git_utils import git_utils
 
 repo      = None  # repository
 graph     = None  # code graph
@@ -224,3 +234,116 @@ class Test_Git_History(unittest.TestCase):
 
         # b.py should NOT exists
         self.assert_file_not_exists("", "b.py", ".py")
+
+# Versions of the resumed history's repository, oldest first
+HISTORY = [
+    {'a.py': "def f():\n    pass\n",
+     'b.py': "from a import f\n\ndef run():\n    f()\n"},
+    {'a.py': "def g():\n    pass\n\ndef f():\n    g()\n",
+     'b.py': "from a import f\n\ndef run():\n    f()\n"},
+    {'a.py': "def g():\n    pass\n\ndef f():\n    g()\n",
+     'b.py': "from a import f\n\ndef run():\n    f()\n",
+     'c.py': "from a import g\n\ndef use():\n    g()\n"},
+    {'a.py': "def g():\n    pass\n",
+     'b.py': "from a import g\n\ndef run():\n    g()\n",
+     'c.py': "from a import g\n\ndef use():\n    g()\n"},
+    {'a.py': "def g():\n    pass\n",
+     'b.py': "from a import g\n\ndef run():\n    g()\n    g()\n"},
+]
+
+class Test_Resumed_History(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.names = []
+
+    def tearDown(self):
+        for name in self.names:
+            finish_ingestion(name)
+            Graph(name).delete()
+            GitGraph(GitRepoName(name)).g.delete()
+        shutil.rmtree(self.tmp)
+
+    def create_repo(self, name: str) -> Path:
+        path = self.tmp / name
+        repo = init_repository(str(path))
+        repo.remotes.create('origin', f'https://github.com/FalkorDB/{name}')
+        self.names.append(name)
+
+        parents = []
+        for i, files in enumerate(HISTORY):
+            for file_path in path.glob('*.py'):
+                file_path.unlink()
+            for file_name, source in files.items():
+                (path / file_name).write_text(source)
+
+            repo.index.clear()
+            for file_name in files:
+                repo.index.add(file_name)
+            repo.index.write()
+
+            # Commits of both repositories are identical, dated in order
+            signature = Signature('test', 'test@falkordb.com', 1700000000 + i * 60, 0)
+            commit = repo.create_commit('HEAD', signature, signature, f'version {i}',
+                                        repo.index.write_tree(), parents)
+            parents = [commit]
+
+        # An existing venv keeps the python analyzer from installing dependencies
+        (path / 'venv').mkdir()
+        return path
+
+    def snapshot(self, path: Path) -> tuple[set, set]:
+        # The graph's nodes and edges, keyed by their properties relative to the repository
+        graph = Graph(path.name)
+        root = str(path)
+        nodes = graph._query("""MATCH (n)
+                                RETURN labels(n)[0], n.path, n.name, n.src_start, n.src_end""").result_set
+        edges = graph._query("""MATCH (s)-[e]->(d)
+                                RETURN s.path, s.name, type(e), d.path, d.name""").result_set
+        def relative(row: list) -> tuple:
+            return tuple(v.replace(root, '') if isinstance(v, str) else v for v in row)
+
+        return {relative(row) for row in nodes}, {relative(row) for row in edges}
+
+    def history(self, path: Path) -> list[tuple[set, set]]:
+        # The graph at every commit, from the oldest to HEAD and back
+        repo = Repository(str(path))
+        commits = [commit.short_id for commit in repo.walk(repo.head.target)][::-1]
+
+        snapshots = []
+        for commit in commits + commits[-2::-1]:
+            switch_commit(path.name, commit)
+            snapshots.append(self.snapshot(path))
+        return snapshots
+
+    def test_resumed_history(self):
+        path = self.create_repo('resume_full')
+        Project.from_local_repository(path).ingest(resolution='static')
+        expected = self.history(path)
+
+        # Interrupted going backwards, and going forwards
+        for steps in [2, 6]:
+            with self.subTest(steps=steps):
+                path = self.create_repo(f'resume_{steps}')
+
+                # Fails once the given number of commits were processed
+                calls = []
+                classify_changes = git_utils.classify_changes
+                def interrupt(*args):
+                    calls.append(args)
+                    if len(calls) > steps:
+                        raise RuntimeError('interrupted')
+                    return classify_changes(*args)
+
+                with mock.patch('api.git_utils.git_utils.classify_changes', side_effect=interrupt):
+                    with self.assertRaises(RuntimeError):
+                        Project.from_local_repository(path).ingest(resolution='static')
+
+                # The interrupted job left an older commit checked out
+                repo = Repository(str(path))
+                repo.checkout_tree(repo.head.peel().tree, strategy=CheckoutStrategy.FORCE)
+
+                Project.from_local_repository(path).ingest(resolution='static')
+                self.assertEqual(self.history(path), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from pathlib import Path
+
+from api import Graph, Entity, File
+
+
+class TestGraphWriter(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph(name='test_graph_writer')
+
+    def tearDown(self):
+        self.graph.delete()
+
+    def test_batched_writes(self):
+        file = File(Path('/path/to/file.py'), None)
+        cls  = Entity('class_definition', 'Class', 'A', 0, 10, (0, 0), (1, 0))
+        func = Entity('function_definition', 'Function', 'f', 1, 2, (1, 0), (1, 1))
+
+        # a batch size of 2 forces flushes in the middle of the hierarchy
+        with self.graph.writer(batch_size=2) as writer:
+            writer.add_file(file)
+            writer.add_entity(cls, 'Class', 'A', None, '/path/to/file.py', 0, 10, {})
+            writer.connect_entities('DEFINES', file, cls)
+            writer.add_entity(func, 'Function', 'f', 'doc', '/path/to/file.py', 1, 2, {})
+            writer.connect_entities('DEFINES', cls, func)
+            writer.connect_entities('CALLS', func, func, {'line': 2, 'text': 'f()'})
+
+        query = """MATCH (f:File)-[:DEFINES]->(c:Class)-[:DEFINES]->(func:Function)-[e:CALLS]->(func)
+                   WHERE ID(f) = $file_id AND ID(c) = $cls_id AND ID(func) = $func_id
+                   RETURN func.doc, e.line"""
+
+        params = {'file_id': file.id, 'cls_id': cls.id, 'func_id': func.id}
+        res = self.graph._query(query, params).result_set
+        self.assertEqual(res, [['doc', 2]])
+
+    def test_backlog(self):
+        self.graph.enable_backlog()
+
+        file = File(Path('/path/to/file.py'), None)
+        with self.graph.writer() as writer:
+            writer.add_file(file)
+
+        queries, params = self.graph.clear_backlog()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(params[0]['files'], [{'path': '/path/to/file.py', 'name': 'file.py', 'ext': '.py', 'hash': None}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from pathlib import Path
+
+from api import File
+from api.analyzers.budget import FileBudget
+from api.analyzers.incremental import EntityReuse, apply_edits, diff_edits
+from api.analyzers.python.analyzer import PythonAnalyzer
+from api.analyzers.records import extract_entities
+
+SOURCE = b"""import os
+
+def first(a: int) -> int:
+    return a + 1
+
+class Task():
+    def run(self):
+        first(1)
+
+    def stop(self):
+        pass
+
+def last():
+    Task().run()
+"""
+
+# Versions of SOURCE, each replacing a snippet of it
+EDITS = {
+    'insert before': (b"import os\n", b"import os\nimport sys\n\ndef zero():\n    pass\n"),
+    'change a body': (b"        first(1)\n", b"        first(2)\n        last()\n"),
+    'delete an entity': (b"    def stop(self):\n        pass\n\n", b""),
+    'rename': (b"class Task():", b"class Job():"),
+    'append': (b"    Task().run()\n", b"    Task().run()\n\ndef after():\n    last()\n"),
+    'no final newline': (b"    Task().run()\n", b"    Task().run()"),
+    'everything': (SOURCE, b"def other():\n    pass\n"),
+}
+
+
+class TestIncrementalReparse(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = PythonAnalyzer()
+        self.budget = FileBudget(0, 10, 0, 0)
+
+    def records(self, source: bytes, old_source: bytes = None) -> dict:
+        # Records of source, reparsed incrementally from old_source if given
+        file = File(Path('/repo/src.py'), None)
+        if old_source is None:
+            file.tree = self.budget.parse(self.analyzer, source)
+            return extract_entities(self.analyzer, file)
+
+        old = File(Path('/repo/src.py'), self.budget.parse(self.analyzer, old_source))
+        old_tree = old.tree
+        old_records = extract_entities(self.analyzer, old)
+
+        edits = diff_edits(old_source, source)
+        apply_edits(old_tree, edits)
+        file.tree = self.budget.parse(self.analyzer, source, old_tree)
+        self.assertEqual(str(file.tree.root_node), str(self.budget.parse(self.analyzer, source).root_node))
+
+        dirty = [(r.start_byte, r.end_byte) for r in old_tree.changed_ranges(file.tree)]
+        return extract_entities(self.analyzer, file, reuse=EntityReuse(old_records, edits, dirty))
+
+    def test_same_as_full_reparse(self):
+        for name, (old, new) in EDITS.items():
+            with self.subTest(name):
+                self.assertIn(old, SOURCE)
+                source = SOURCE.replace(old, new)
+
+                self.assertEqual(self.records(source, SOURCE), self.records(source))
+                # And back
+                self.assertEqual(self.records(SOURCE, source), self.records(SOURCE))
+
+    def test_diff_edits(self):
+        old = b"a\nb\nc\n"
+        new = b"a\nx\ny\nc\n"
+
+        # Line b replaced by lines x and y
+        self.assertEqual(diff_edits(old, new), [(2, 4, 6, (1, 0), (2, 0), (3, 0))])
+        self.assertEqual(diff_edits(old, old), [])
+        self.assertIsNone(diff_edits(old, b"a\x00b"))
+
+    def test_reused_entities(self):
+        source = SOURCE.replace(b"        first(1)\n", b"        first(2)\n")
+        old = File(Path('/repo/src.py'), self.budget.parse(self.analyzer, SOURCE))
+        old_tree = old.tree
+        old_records = extract_entities(self.analyzer, old)
+
+        edits = diff_edits(SOURCE, source)
+        apply_edits(old_tree, edits)
+        tree = self.budget.parse(self.analyzer, source, old_tree)
+        dirty = [(r.start_byte, r.end_byte) for r in old_tree.changed_ranges(tree)]
+        reuse = EntityReuse(old_records, edits, dirty)
+
+        # Only the edited class is extracted again
+        top = {node.child_by_field_name('name').text: node for node in tree.root_node.children
+               if node.type in ['function_definition', 'class_definition']}
+        self.assertIsNotNone(reuse.entity_records(top[b'first']))
+        self.assertIsNone(reuse.entity_records(top[b'Task']))
+        self.assertIsNotNone(reuse.entity_records(top[b'last']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from api.analyzers.blob_store import BlobStore
+from api.analyzers.source_analyzer import SourceAnalyzer
+
+from tests.memory_graph import MemoryGraph
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'project'
+        self.path.mkdir()
+
+        # An existing venv keeps the python analyzer from installing dependencies
+        (self.path / 'venv').mkdir()
+
+        source_files = Path(__file__).parent / 'source_files'
+        shutil.copy(source_files / 'py' / 'src.py', self.path / 'src.py')
+        shutil.copy(source_files / 'csharp' / 'Program.cs', self.path / 'Program.cs')
+        for i in range(5):
+            (self.path / f'app{i}.py').write_text(
+                "from src import Task, log\n"
+                "\n"
+                f"def run{i}(name: str) -> Task:\n"
+                "    log(name)\n"
+                "    return Task(name, 1).abort(0.5)\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def analyze(self, pipelined: bool, workers: int = 1) -> MemoryGraph:
+        graph = MemoryGraph('test_pipeline')
+        store = BlobStore(self.tmp / f'blobs-{pipelined}-{workers}', 1 << 20)
+        analyzer = SourceAnalyzer(workers=workers, store=store, resolution='static', pipelined=pipelined)
+        files = sorted(self.path.glob('*.py')) + [self.path / 'Program.cs']
+
+        if pipelined:
+            analyzer.analyze_pipelined(self.path, files, [], graph)
+        else:
+            files = analyzer.first_pass(self.path, files, [], graph)
+            analyzer.second_pass(graph, files, self.path)
+
+        return graph
+
+    def test_sequential_by_default(self):
+        with mock.patch.dict('os.environ'):
+            os.environ.pop('CODE_GRAPH_PIPELINED', None)
+            analyzer = SourceAnalyzer(store=BlobStore(self.tmp / 'blobs', 1 << 20), resolution='static')
+        self.assertFalse(analyzer.pipelined)
+
+    def test_same_graph(self):
+        sequential = self.analyze(pipelined=False)
+
+        # Small chunks so the resolver receives the files in several chunks
+        with mock.patch('api.analyzers.pipeline.RESOLVE_CHUNK', 2):
+            pipelined = self.analyze(pipelined=True)
+
+        sequential_nodes, sequential_edges = sequential.snapshot()
+        pipelined_nodes, pipelined_edges = pipelined.snapshot()
+        self.assertEqual(set(pipelined_nodes), set(sequential_nodes))
+        self.assertEqual(pipelined_edges, sequential_edges)
+
+        # The project's calls are resolved
+        calls = {(src[2], dest[2]) for src, relation, dest, _ in sequential_edges if relation == 'CALLS'}
+        for i in range(5):
+            self.assertIn((f'run{i}', 'log'), calls)
+            self.assertIn((f'run{i}', 'abort'), calls)
+
+    def test_parallel_first_pass(self):
+        serial = self.analyze(pipelined=False)
+
+        # Files are parsed by worker processes, merged back in input order
+        parallel = self.analyze(pipelined=False, workers=3)
+
+        self.assertEqual(parallel.snapshot(), serial.snapshot())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import unittest
+
+from multilspy.lsp_protocol_handler.server import Error as ResponseError
+
+from api.analyzers.resolver import CircuitBreaker, DefinitionResolver
+
+
+class FakeServer():
+    """
+    Stands in for a SyncLanguageServer, runs its event loop on a thread and
+    answers definition requests by the mode of the requested file:
+    'ok', 'slow', 'hang', 'raise' (a crash) or 'error' (an error response).
+    """
+
+    def __init__(self, mode: str = 'ok', modes: dict[str, str] = {}):
+        self.mode = mode
+        self.modes = modes
+        self.requests = []
+        self.language_server = self
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def request_definition(self, file_path: str, line: int, column: int) -> list[dict]:
+        self.requests.append((file_path, line, column))
+        mode = self.modes.get(file_path, self.mode)
+        if mode == 'slow':
+            await asyncio.sleep(0.3)
+        elif mode == 'hang':
+            await asyncio.Event().wait()
+        elif mode == 'raise':
+            raise ConnectionResetError('server exited')
+        elif mode == 'error':
+            raise ResponseError(-32603, 'internal error')
+        return [location(file_path, line)]
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def location(file_path: str, line: int) -> dict:
+    return {'absolutePath': file_path, 'range': {'start': {'line': line, 'character': 0}}}
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_closed_and_open(self):
+        breaker = CircuitBreaker(2)
+        self.assertFalse(breaker.open)
+        self.assertFalse(breaker.half_open)
+
+        # Only consecutive failures open the circuit
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        self.assertFalse(breaker.open)
+        breaker.failure()
+        self.assertTrue(breaker.open)
+
+    def test_half_open(self):
+        # A restarted server's first failure opens the circuit again
+        breaker = CircuitBreaker(2, restarts=1)
+        self.assertTrue(breaker.half_open)
+        self.assertFalse(breaker.open)
+        breaker.failure()
+        self.assertTrue(breaker.open)
+        self.assertFalse(breaker.half_open)
+
+        # While its first success closes it
+        breaker = CircuitBreaker(2, restarts=1)
+        breaker.success()
+        self.assertFalse(breaker.half_open)
+        breaker.failure()
+        self.assertFalse(breaker.open)
+
+
+class TestDefinitionResolver(unittest.TestCase):
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def server(self, mode: str = 'ok', modes: dict[str, str] = {}) -> FakeServer:
+        self.servers.append(FakeServer(mode, modes))
+        return self.servers[-1]
+
+    def test_closed(self):
+        server = self.server()
+        resolver = DefinitionResolver(window=4, timeout=1, failure_threshold=2, max_restarts=0)
+        requests = [('/src/a.py', line, 4) for line in range(3)]
+
+        self.assertEqual(resolver.request_definitions([server], requests),
+                         [[location('/src/a.py', line)] for line in range(3)])
+        self.assertFalse(resolver.breakers[id(server)].open)
+        self.assertEqual((resolver.timeouts, resolver.failures, resolver.restarts), (0, 0, 0))
+
+    def test_error_responses(self):
+        # The server answered, an error response isn't a failure
+        server = self.server('error')
+        resolver = DefinitionResolver(window=1, timeout=1, failure_threshold=2, max_restarts=0)
+
+        self.assertEqual(resolver.request_definitions([server], [('/src/a.py', line, 4) for line in range(3)]), [[], [], []])
+        self.assertFalse(resolver.breakers[id(server)].open)
+        self.assertEqual(resolver.failures, 0)
+
+    def test_open(self):
+        server = self.server('raise')
+        resolver = DefinitionResolver(window=1, timeout=1, failure_threshold=2, max_restarts=0)
+        requests = [('/src/a.py', line, 4) for line in range(4)]
+
+        # Once the circuit opens requests fail fast, without reaching the server
+        self.assertEqual(resolver.request_definitions([server], requests), [None] * 4)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(resolver.failures, 2)
+        self.assertTrue(resolver.breakers[id(server)].open)
+
+        self.assertEqual(resolver.request_definitions([server], requests[:1]), [None])
+        self.assertEqual(len(server.requests), 2)
+
+    def test_timeouts(self):
+        server = self.server('hang')
+        resolver = DefinitionResolver(window=1, timeout=0.05, failure_threshold=2, max_restarts=0)
+
+        self.assertEqual(resolver.request_definitions([server], [('/src/a.py', line, 4) for line in range(3)]), [None] * 3)
+        self.assertEqual(resolver.timeouts, 2)
+        self.assertTrue(resolver.breakers[id(server)].open)
+
+    def test_deadline(self):
+        server = self.server(modes={'/src/a.py': 'slow'})
+        resolver = DefinitionResolver(window=1, deadline=0.5, timeout=0, failure_threshold=1, max_restarts=0)
+        requests = [('/src/a.py', 0, 4), ('/src/a.py', 1, 4), ('/src/a.py', 2, 4), ('/src/b.py', 0, 4)]
+
+        # The second request runs out of a.py's budget, the third isn't sent,
+        # b.py's budget starts with its own first request
+        self.assertEqual(resolver.request_definitions([server], requests),
+                         [[location('/src/a.py', 0)], [], [], [location('/src/b.py', 0)]])
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(resolver.expired, {'/src/a.py'})
+
+        # Running out of a file's budget isn't the server's failure
+        self.assertEqual(resolver.timeouts, 0)
+        self.assertFalse(resolver.breakers[id(server)].open)
+
+    def test_restart(self):
+        resolver = DefinitionResolver(window=1, timeout=1, failure_threshold=2, max_restarts=1,
+                                      restart=lambda server: self.server())
+        servers = [self.server('raise')]
+        requests = [('/src/a.py', line, 4) for line in range(4)]
+
+        # Requests failed by the crashed server are retried on its replacement
+        self.assertEqual(resolver.request_definitions(servers, requests),
+                         [[location('/src/a.py', line)] for line in range(4)])
+        self.assertIs(servers[0], self.servers[1])
+        self.assertEqual(len(servers[0].requests), 4)
+        self.assertEqual(resolver.restarts, 1)
+
+        # Whose circuit closed with its first success
+        breaker = resolver.breakers[id(servers[0])]
+        self.assertEqual(breaker.restarts, 1)
+        self.assertFalse(breaker.half_open)
+        self.assertFalse(breaker.open)
+
+    def test_restart_half_open(self):
+        resolver = DefinitionResolver(window=1, timeout=1, failure_threshold=3, max_restarts=2,
+                                      restart=lambda server: self.server('raise'))
+        servers = [self.server('raise')]
+
+        # The replacements are given up on after a single failure each
+        self.assertEqual(resolver.request_definitions(servers, [('/src/a.py', line, 4) for line in range(4)]), [None] * 4)
+        self.assertEqual([len(server.requests) for server in self.servers], [3, 1, 1])
+        self.assertEqual(resolver.restarts, 2)
+        self.assertEqual(resolver.failures, 5)
+        self.assertTrue(resolver.breakers[id(servers[0])].open)
+
+    def test_failed_restart(self):
+        def restart(server):
+            raise RuntimeError('failed starting server')
+
+        server = self.server('raise')
+        resolver = DefinitionResolver(window=1, timeout=1, failure_threshold=1, max_restarts=2, restart=restart)
+        servers = [server]
+
+        self.assertEqual(resolver.request_definitions(servers, [('/src/a.py', 0, 4), ('/src/a.py', 1, 4)]), [None, None])
+        self.assertIs(servers[0], server)
+        self.assertEqual(resolver.restarts, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from api.analyzers import source_analyzer
+from api.analyzers.blob_store import BlobStore
+from api.analyzers.shards import estimate_memory, plan_shards
+from api.analyzers.source_analyzer import SourceAnalyzer
+
+from tests.memory_graph import MemoryGraph
+
+# Each package is its own shard, references cross them
+SOURCES = {
+    'models/base.py': ("class Base():\n"
+                       "    def save(self):\n"
+                       "        pass\n"
+                       "\n"
+                       "def connect():\n"
+                       "    pass\n"),
+    'models/user.py': ("from models.base import Base, connect\n"
+                       "\n"
+                       "class User(Base):\n"
+                       "    def login(self):\n"
+                       "        connect()\n"),
+    'services/auth.py': ("from models.user import User\n"
+                         "from models.base import connect\n"
+                         "\n"
+                         "def authenticate():\n"
+                         "    connect()\n"
+                         "    audit()\n"
+                         "\n"
+                         "def audit():\n"
+                         "    pass\n"),
+    'web/app.py': ("from services.auth import authenticate\n"
+                   "\n"
+                   "def handle():\n"
+                   "    authenticate()\n"),
+}
+
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'project'
+
+        # An existing venv keeps the python analyzer from installing dependencies
+        (self.path / 'venv').mkdir(parents=True)
+        for name, source in SOURCES.items():
+            (self.path / name).parent.mkdir(exist_ok=True)
+            (self.path / name).write_text(source)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def analyze(self, memory_budget: int) -> tuple[MemoryGraph, list[list[Path]]]:
+        # Returns the graph and the shards it was analyzed in
+        shards = []
+
+        def plan(files: list[Path], budget: int) -> list[list[Path]]:
+            shards.extend(plan_shards(files, budget))
+            return shards
+
+        graph = MemoryGraph(f'test_shards_{memory_budget}')
+        analyzer = SourceAnalyzer(store=BlobStore(self.tmp / f'blobs_{memory_budget}', 1 << 20),
+                                  resolution='static', memory_budget=memory_budget)
+        with mock.patch.object(source_analyzer, 'plan_shards', plan):
+            analyzer.analyze_sources(self.path, [], graph)
+        return graph, shards
+
+    def calls(self, graph: MemoryGraph) -> set[tuple[str, str, str]]:
+        # Resolution edges by source, relation and destination
+        return {(graph.nodes[src]['name'], relation, graph.nodes[dest]['name'])
+                for src, relation, dest in graph.edges if relation in ['CALLS', 'EXTENDS']}
+
+    def test_matches_unsharded(self):
+        graph, shards = self.analyze(0)
+        self.assertEqual(shards, [])
+
+        # The largest package fits the budget, the repository doesn't
+        budget = max(estimate_memory(list((self.path / package).glob('*.py'))) for package in ['models', 'services', 'web'])
+        sharded, shards = self.analyze(budget)
+        self.assertEqual([len(shard) for shard in shards], [2, 1, 1])
+
+        # The same nodes, in whichever order the shards created them, and edges
+        nodes, edges = graph.snapshot()
+        sharded_nodes, sharded_edges = sharded.snapshot()
+        self.assertEqual(sorted(sharded_nodes), sorted(nodes))
+        self.assertEqual(sharded_edges, edges)
+
+        # Including the references across shards
+        self.assertEqual(self.calls(sharded), {('User', 'EXTENDS', 'Base'),
+                                               ('login', 'CALLS', 'connect'),
+                                               ('authenticate', 'CALLS', 'connect'),
+                                               ('authenticate', 'CALLS', 'audit'),
+                                               ('handle', 'CALLS', 'authenticate')})
+
+if __name__ == '__main__':
+    unittest.main()
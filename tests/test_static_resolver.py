@@ -0,0 +1,125 @@
+import unittest
+from pathlib import Path
+
+from api import File
+from api.analyzers.budget import FileBudget
+from api.analyzers.java.analyzer import JavaAnalyzer
+from api.analyzers.python.analyzer import PythonAnalyzer
+from api.analyzers.records import extract_entities
+from api.analyzers.static_resolver import GLOBAL, IMPORTED, IN_SCOPE, QUALIFIED, SAME_FILE, SymbolTable
+
+SOURCES = {
+    'util.py': "def helper():\n    pass\n\ndef shared():\n    pass\n\ndef stop():\n    pass\n",
+    'other.py': "def shared():\n    pass\n\ndef lonely():\n    pass\n",
+    'more.py': "def lonely():\n    pass\n",
+    'app.py': ("from util import helper, stop\n"
+               "\n"
+               "def local():\n"
+               "    pass\n"
+               "\n"
+               "def main():\n"
+               "    stop()\n"
+               "\n"
+               "class Service():\n"
+               "    def run(self):\n"
+               "        self.stop()\n"
+               "        local()\n"
+               "        helper()\n"
+               "        util.helper()\n"
+               "        shared()\n"
+               "        lonely()\n"
+               "\n"
+               "    def stop(self):\n"
+               "        pass\n"),
+    'Service.java': ("package app;\n"
+                     "\n"
+                     "class Service {\n"
+                     "    void run() {\n"
+                     "        stop();\n"
+                     "        this.stop();\n"
+                     "    }\n"
+                     "\n"
+                     "    void stop() {\n"
+                     "    }\n"
+                     "}\n"),
+}
+
+
+class TestSymbolTable(unittest.TestCase):
+    def setUp(self):
+        self.analyzers = {'.py': PythonAnalyzer(), '.java': JavaAnalyzer()}
+        budget = FileBudget(0, 10, 0, 0)
+
+        self.files = {}
+        for name, source in SOURCES.items():
+            file_path = Path('/repo') / name
+            analyzer = self.analyzers[file_path.suffix]
+            file = File(file_path, budget.parse(analyzer, source.encode()))
+            extract_entities(analyzer, file)
+            self.files[file_path] = file
+
+        self.table = SymbolTable(self.files)
+
+    def resolve(self, name: str, entity_name: str) -> dict[str, list[tuple[str, str, float]]]:
+        # The resolutions of an entity's calls, by call text
+        file_path = Path('/repo') / name
+        file = self.files[file_path]
+        entity = next(e for e in file.entities if e.name == entity_name)
+
+        res = {}
+        for symbol in entity.symbols['call']:
+            resolved = self.table.resolve(self.analyzers[file_path.suffix], file, entity, 'call', symbol)
+            res[symbol.text] = [(e.name, self.owner(e), confidence) for e, confidence in resolved]
+        return res
+
+    def owner(self, entity) -> str:
+        parent = entity.parent
+        return parent.path.name if isinstance(parent, File) else parent.name
+
+    def test_python_tiers(self):
+        calls = self.resolve('app.py', 'run')
+
+        # Members of the scope's receiver
+        self.assertEqual(calls['self.stop()'], [('stop', 'Service', QUALIFIED)])
+
+        # No implicit receiver, unqualified names are looked up in the file
+        self.assertEqual(calls['local()'], [('local', 'app.py', SAME_FILE)])
+
+        # Imported names, and members of a qualifying module
+        self.assertEqual(calls['helper()'], [('helper', 'util.py', IMPORTED)])
+        self.assertEqual(calls['util.helper()'], [('helper', 'util.py', QUALIFIED)])
+
+        # The imported module's definition wins over the others
+        self.assertEqual(calls['shared()'], [('shared', 'util.py', IMPORTED)])
+
+        # Ambiguous names resolve to every definition, splitting the confidence
+        self.assertEqual(calls['lonely()'], [('lonely', 'more.py', GLOBAL / 2), ('lonely', 'other.py', GLOBAL / 2)])
+
+        # Unqualified names don't refer to methods of the same file
+        self.assertEqual(self.resolve('app.py', 'main')['stop()'], [('stop', 'util.py', IMPORTED)])
+
+    def test_implicit_receiver(self):
+        # Python lookups of the same names come first
+        self.resolve('app.py', 'run')
+
+        calls = self.resolve('Service.java', 'run')
+        self.assertEqual(calls['stop()'], [('stop', 'Service', IN_SCOPE)])
+        self.assertEqual(calls['this.stop()'], [('stop', 'Service', IN_SCOPE)])
+
+        # Resolved to the Java method, not to app.py's method of the same class and name
+        file = self.files[Path('/repo/Service.java')]
+        run = next(e for e in file.entities if e.name == 'run')
+        stop = next(e for e in file.entities if e.name == 'stop')
+        for symbol in run.symbols['call']:
+            resolved = self.table.resolve(self.analyzers['.java'], file, run, 'call', symbol)
+            self.assertIs(resolved[0][0], stop)
+
+    def test_unresolved(self):
+        file = self.files[Path('/repo/app.py')]
+        entity = next(e for e in file.entities if e.name == 'run')
+        symbol = entity.symbols['call'][0]
+        symbol.reference = 'missing'
+        self.assertEqual(self.table.resolve(self.analyzers['.py'], file, entity, 'call', symbol), [])
+
+if __name__ == '__main__':
+    unittest.main()
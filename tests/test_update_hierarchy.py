@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from api.analyzers.blob_store import BlobStore
+from api.analyzers.source_analyzer import SourceAnalyzer
+
+from tests.memory_graph import MemoryGraph
+
+LIB = ("def keep():\n"
+       "    pass\n"
+       "\n"
+       "def rename_me():\n"
+       "    pass\n"
+       "\n"
+       "def remove_me():\n"
+       "    pass\n"
+       "\n"
+       "class Box():\n"
+       "    def open(self):\n"
+       "        pass\n")
+
+APP = ("from lib import keep, Box\n"
+       "\n"
+       "def main():\n"
+       "    keep()\n"
+       "    Box().open()\n")
+
+
+class TestUpdateHierarchy(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.path = self.tmp / 'project'
+        self.path.mkdir()
+
+        # An existing venv keeps the python analyzer from installing dependencies
+        (self.path / 'venv').mkdir()
+        (self.path / 'lib.py').write_text(LIB)
+        (self.path / 'app.py').write_text(APP)
+
+        self.graph = MemoryGraph('test_update_hierarchy')
+        self.analyzer = SourceAnalyzer(store=BlobStore(self.tmp / 'blobs', 1 << 20), resolution='static')
+        files = self.analyzer.first_pass(self.path, [self.path / 'app.py', self.path / 'lib.py'], [], self.graph)
+        self.analyzer.second_pass(self.graph, files, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def nodes(self) -> dict[str, int]:
+        # Entity IDs by name
+        return {node['name']: id for id, node in self.graph.nodes.items() if node['label'] != 'File'}
+
+    def calls(self) -> set[tuple[str, str]]:
+        return {(self.graph.nodes[src]['name'], self.graph.nodes[dest]['name'])
+                for src, relation, dest in self.graph.edges if relation == 'CALLS'}
+
+    def modify(self, source: str) -> None:
+        (self.path / 'lib.py').write_text(source)
+        with self.graph.patch_info():
+            self.analyzer.analyze_files([self.path / 'lib.py'], self.path, self.graph)
+
+    def test_kept_entities(self):
+        before = self.nodes()
+        self.assertEqual(self.calls(), {('main', 'keep'), ('main', 'Box'), ('main', 'open')})
+
+        # Entities move down, keep's body changes
+        self.modify("import os\n\n\n" + LIB.replace("def keep():\n    pass\n", "def keep():\n    return os.sep\n"))
+
+        # Nodes are kept, along with the edges into them
+        self.assertEqual(self.nodes(), before)
+        self.assertEqual(self.calls(), {('main', 'keep'), ('main', 'Box'), ('main', 'open')})
+
+        # Their lines are updated
+        keep = self.graph.nodes[before['keep']]
+        self.assertEqual((keep['src_start'], keep['src_end']), (3, 4))
+        box = self.graph.nodes[before['Box']]
+        self.assertEqual((box['src_start'], box['src_end']), (12, 14))
+        self.assertEqual(self.graph.get_file_definitions(str(self.path / 'lib.py'))[-1][2], ['Box', 'open'])
+
+        # Nothing depended on a changed entity
+        self.assertEqual(self.graph.queued, set())
+
+    def test_renamed_and_removed_entities(self):
+        before = self.nodes()
+
+        self.modify(LIB.replace("def rename_me", "def renamed").replace("def remove_me():\n    pass\n\n", ""))
+
+        after = self.nodes()
+        self.assertNotIn('rename_me', after)
+        self.assertNotIn('remove_me', after)
+        self.assertNotIn(before['rename_me'], self.graph.nodes)
+        self.assertNotIn(before['remove_me'], self.graph.nodes)
+
+        # The renamed entity is a new node, the others are kept
+        self.assertNotIn(after['renamed'], before.values())
+        for name in ['keep', 'Box', 'open']:
+            self.assertEqual(after[name], before[name])
+
+        # Every entity is defined by the file
+        defined = {names[-1] for _, _, names, _, _, _, _ in self.graph.get_file_definitions(str(self.path / 'lib.py'))}
+        self.assertEqual(defined, {'keep', 'renamed', 'Box', 'open'})
+        self.assertEqual(self.calls(), {('main', 'keep'), ('main', 'Box'), ('main', 'open')})
+
+    def test_class_renamed(self):
+        before = self.nodes()
+
+        self.modify(LIB.replace("class Box", "class Crate"))
+
+        # The method's qualified name changed with its class
+        after = self.nodes()
+        self.assertNotIn('Box', after)
+        self.assertNotEqual(after['open'], before['open'])
+        self.assertEqual(after['keep'], before['keep'])
+
+        # Callers of the removed entities are resolved again, into the new method
+        self.assertEqual(self.graph.queued, set())
+        self.assertEqual(self.calls(), {('main', 'keep'), ('main', 'open')})
+        self.assertIn((self.nodes()['main'], 'CALLS', after['open']), self.graph.edges)
+
+if __name__ == '__main__':
+    unittest.main()
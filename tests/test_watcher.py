@@ -0,0 +1,119 @@
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from api.analyzers.watcher import IN_Q_OVERFLOW, FolderWatcher
+
+
+class StubGraph():
+    def __init__(self, files: list[Path]):
+        self.name = 'test_watcher'
+        self.files = files
+
+    def get_file_hashes(self) -> dict:
+        return {str(file_path): None for file_path in self.files}
+
+
+class StubAnalyzer():
+    """Records the files the watcher asks to delete and to analyze."""
+
+    resolution = 'static'
+
+    def __init__(self):
+        self.deleted  = set()
+        self.analyzed = set()
+        self.rescans  = []
+        self.updated  = threading.Condition()
+
+    def supported_types(self) -> list[str]:
+        return ['.py', '.java', '.cs']
+
+    def wait(self) -> None:
+        pass
+
+    def delete_files(self, files: list[Path], path: Path, graph: StubGraph) -> None:
+        with self.updated:
+            self.deleted.update(files)
+            self.updated.notify_all()
+
+    def analyze_files(self, files: list[Path], path: Path, graph: StubGraph) -> None:
+        with self.updated:
+            self.analyzed.update(files)
+            self.updated.notify_all()
+
+    def analyze_sources(self, path: Path, ignore: list[str], graph: StubGraph, progressive: bool = False,
+                        dependencies: bool = True) -> None:
+        with self.updated:
+            self.rescans.append(dependencies)
+            self.updated.notify_all()
+
+    def wait_for(self, deleted: set[Path], analyzed: set[Path], timeout: float = 10) -> bool:
+        with self.updated:
+            return self.updated.wait_for(lambda: self.deleted >= deleted and self.analyzed >= analyzed, timeout)
+
+
+class TestFolderWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp  = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name).resolve()
+
+        (self.path / 'pkg').mkdir()
+        for name in ['a.py', 'c.py', 'pkg/d.py', 'README.md']:
+            (self.path / name).write_text('x = 1\n')
+
+        self.graph    = StubGraph([self.path / name for name in ['a.py', 'c.py', 'pkg/d.py']])
+        self.analyzer = StubAnalyzer()
+        self.watcher  = FolderWatcher(self.path, self.graph, self.analyzer, debounce=0.1)
+        self.watcher.start()
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.tmp.cleanup()
+
+    def test_changed_files(self):
+        (self.path / 'a.py').write_text('x = 2\n')
+        (self.path / 'b.py').write_text('y = 1\n')
+        (self.path / 'c.py').unlink()
+        (self.path / 'README.md').write_text('docs\n')
+
+        self.assertTrue(self.analyzer.wait_for({self.path / 'c.py'}, {self.path / 'a.py', self.path / 'b.py'}))
+
+        # Unsupported files are never reported
+        time.sleep(0.3)
+        self.assertEqual(self.analyzer.deleted, {self.path / 'c.py'})
+        self.assertEqual(self.analyzer.analyzed, {self.path / 'a.py', self.path / 'b.py'})
+
+    def test_removed_directory(self):
+        shutil.rmtree(self.path / 'pkg')
+
+        self.assertTrue(self.analyzer.wait_for({self.path / 'pkg/d.py'}, set()))
+        self.assertEqual(self.analyzer.analyzed, set())
+
+    def test_created_directory(self):
+        (self.path / 'new').mkdir()
+        (self.path / 'new/e.py').write_text('z = 1\n')
+
+        self.assertTrue(self.analyzer.wait_for(set(), {self.path / 'new/e.py'}))
+        self.assertEqual(self.analyzer.deleted, set())
+
+    def test_overflow(self):
+        # The kernel's queue overflows, the events it held are lost
+        read_events = self.watcher.read_events
+        def overflowed() -> list[tuple[Path, int]]:
+            read_events()
+            return [(self.path, IN_Q_OVERFLOW)]
+        self.watcher.read_events = overflowed
+
+        (self.path / 'a.py').write_text('x = 2\n')
+
+        # The folder is re-scanned, without adding its dependencies again
+        with self.analyzer.updated:
+            self.assertTrue(self.analyzer.updated.wait_for(lambda: len(self.analyzer.rescans) > 0, 10))
+        self.assertNotIn(True, self.analyzer.rescans)
+        self.assertEqual(self.analyzer.analyzed, set())
+
+if __name__ == '__main__':
+    unittest.main()